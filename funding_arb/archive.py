@@ -0,0 +1,164 @@
+# funding_arb/archive.py
+"""
+Tiered retention. Rows older than ARCHIVE_AFTER_DAYS are moved out of the hot
+SQLite tables into one compressed .npz per (table, symbol, UTC day) under
+ARCHIVE_DIR, registered in `archive_files`, and deleted from SQLite.
+`read_range` serves a time range from archive files and hot rows together.
+    python -m funding_arb.archive [days]
+Freed SQLite pages are reused by new inserts; run `python -m funding_arb.migrations`
+(which VACUUMs) if the file itself should shrink.
+"""
+import os
+import re
+import sys
+import time
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import Table, delete, func, select
+
+from .db import engine as default_engine, read_engine as default_read_engine
+from .models import ArchiveFile, FundingTick, LOBSnapshot, PositionSnap, SignalTick
+from .persist import lob_columns
+from .query import concat_columns, range_select, to_columns
+
+ARCHIVE_DIR        = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", 7))
+
+DAY_MS = 86_400_000
+TABLES: Dict[str, Table] = {m.__tablename__: m.__table__
+                            for m in (LOBSnapshot, FundingTick, SignalTick, PositionSnap)}
+
+
+def _load_hot(conn, table: Table, symbol: str, t0: Optional[int], t1: Optional[int]) -> dict:
+    """Hot rows for one symbol as NumPy columns ordered by ts_ms (lob: load_lob_arrays layout)."""
+    q = range_select(table, symbol, t0, t1)
+    rows = conn.execute(q).all()
+    return lob_columns(rows) if table is LOBSnapshot.__table__ else to_columns(q.selected_columns, rows)
+
+
+def _day(day_idx: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(day_idx * DAY_MS / 1000))
+
+
+def _rel_path(table_name: str, symbol: str, day: str, created_ms: int) -> str:
+    # a fresh name per write: the catalog only ever points at fully written files
+    return os.path.join(table_name, re.sub(r"[^A-Za-z0-9]+", "_", symbol), f"{day}.{created_ms}.npz")
+
+
+def _load_file(archive_dir: str, rel_path: str) -> dict:
+    with np.load(os.path.join(archive_dir, rel_path)) as z:
+        return {k: z[k] for k in z.files}
+
+
+def _write_file(archive_dir: str, rel_path: str, cols: dict):
+    path = os.path.join(archive_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **cols)
+    os.replace(tmp, path)
+
+
+def compact(engine=default_engine, older_than_days: float = ARCHIVE_AFTER_DAYS,
+            archive_dir: str = ARCHIVE_DIR, now_ms: Optional[int] = None) -> dict:
+    """
+    Archive every whole UTC day older than `older_than_days`.
+    A day that already has a file (late rows) is merged into a new file and the
+    catalog entry repointed. Returns {table_name: rows_archived}.
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    cutoff = (now_ms - int(older_than_days * DAY_MS)) // DAY_MS * DAY_MS
+    cat = ArchiveFile.__table__
+    moved = {}
+    for name, table in TABLES.items():
+        moved[name] = 0
+        with engine.connect() as conn:
+            groups = conn.execute(
+                select(table.c.symbol, (table.c.ts_ms // DAY_MS).label("d"))
+                .where(table.c.ts_ms < cutoff).group_by("symbol", "d")
+            ).all()
+        for symbol, d in groups:
+            t0, t1 = d * DAY_MS, (d + 1) * DAY_MS
+            day = _day(d)
+            with engine.begin() as conn:
+                cols = _load_hot(conn, table, symbol, t0, t1)
+                n = len(cols["ts_ms"])
+                if not n:
+                    continue
+                prev = conn.execute(select(cat.c.id, cat.c.path).where(
+                    cat.c.table_name == name, cat.c.symbol == symbol, cat.c.day == day)).first()
+                if prev is not None:
+                    cols = concat_columns([_load_file(archive_dir, prev.path), cols])
+                created_ms = int(time.time() * 1000)
+                rel = _rel_path(name, symbol, day, created_ms)
+                _write_file(archive_dir, rel, cols)
+
+                entry = dict(table_name=name, symbol=symbol, day=day,
+                             ts_min=int(cols["ts_ms"][0]), ts_max=int(cols["ts_ms"][-1]),
+                             rows=len(cols["ts_ms"]), path=rel, created_ms=created_ms)
+                if prev is None:
+                    conn.execute(cat.insert().values(**entry))
+                else:
+                    conn.execute(cat.update().where(cat.c.id == prev.id).values(**entry))
+                conn.execute(delete(table).where(table.c.symbol == symbol,
+                                                 table.c.ts_ms >= t0, table.c.ts_ms < t1))
+            if prev is not None:
+                try:
+                    os.remove(os.path.join(archive_dir, prev.path))
+                except OSError:
+                    pass
+            moved[name] += n
+    return moved
+
+
+def read_range(table_name: str, symbol: str, t0: Optional[int] = None, t1: Optional[int] = None,
+               engine=default_read_engine, archive_dir: str = ARCHIVE_DIR) -> dict:
+    """
+    Rows of `table_name` for `symbol` with t0 <= ts_ms < t1 as NumPy columns,
+    archived and hot together, ordered by ts_ms. Same layout as the hot reader
+    (lob_snapshots: see persist.load_lob_arrays). Empty dict if nothing matches.
+    """
+    table = TABLES[table_name]
+    cat = ArchiveFile.__table__
+    parts = []
+    with engine.connect() as conn:
+        q = select(cat.c.path).where(cat.c.table_name == table_name, cat.c.symbol == symbol)
+        if t0 is not None:
+            q = q.where(cat.c.ts_max >= t0)
+        if t1 is not None:
+            q = q.where(cat.c.ts_min < t1)
+        for (rel,) in conn.execute(q.order_by(cat.c.ts_min)):
+            cols = _load_file(archive_dir, rel)
+            ts = cols["ts_ms"]
+            mask = np.ones(len(ts), dtype=bool)
+            if t0 is not None:
+                mask &= ts >= t0
+            if t1 is not None:
+                mask &= ts < t1
+            parts.append({k: v[mask] for k, v in cols.items()})
+        parts.append(_load_hot(conn, table, symbol, t0, t1))
+    return concat_columns(parts)
+
+
+def archive_stats(engine=default_read_engine) -> list:
+    cat = ArchiveFile.__table__
+    with engine.connect() as conn:
+        return conn.execute(
+            select(cat.c.table_name, func.count(), func.sum(cat.c.rows), func.min(cat.c.day), func.max(cat.c.day))
+            .group_by(cat.c.table_name)
+        ).all()
+
+
+def main():
+    from .init_db import init_db
+    init_db()
+    days = float(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_AFTER_DAYS
+    for name, n in compact(older_than_days=days).items():
+        print(f"{name}: archived {n} rows")
+    for name, files, rows, first, last in archive_stats(default_engine):
+        print(f"[archive] {name}: {files} files, {rows} rows, {first}..{last}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 import time
 from funding_arb.init_db import init_db
-from funding_arb.db import SessionLocal
 from funding_arb.data.exchanges import BinanceUSDM_Public
 from funding_arb.exec.bandit_exec import BanditExecutor
-from funding_arb.models import ExecOutcome
+from funding_arb.exec.outcome_log import log_outcome
 
 def main():
     init_db()
@@ -18,20 +17,7 @@ def main():
         lob = ex.fetch_lob(symbol, depth=5)
         action, ts_ms, sim = executor.decide_and_execute(lob, symbol, side="buy")
         if sim:
-            with SessionLocal() as s:
-                s.add(ExecOutcome(
-                    ts_ms=ts_ms,
-                    symbol=symbol,
-                    action=action,
-                    side="buy",
-                    fill_px=sim["fill_px"],
-                    bench_mid_px=sim["bench_mid_px"],
-                    realized_cost_bps=sim["realized_cost_bps"],
-                    fee_bps=sim["fee_bps"],
-                    partial_fill=sim["partial_fill"],
-                    time_to_fill_ms=sim["time_to_fill_ms"],
-                ))
-                s.commit()
+            log_outcome(symbol, action, "buy", sim, ts_ms=ts_ms)
         time.sleep(0.25)
 
     print("Done. Outcomes logged to exec_outcomes.")
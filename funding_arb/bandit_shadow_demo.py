@@ -1,34 +1,16 @@
 import time, json
 import numpy as np
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
 
 from funding_arb.init_db import init_db
-from funding_arb.db import SessionLocal
 from funding_arb.data.exchanges import BinanceUSDM_Public
 from funding_arb.exec.baseline import Intent, simulate_fill, best_prices
-from funding_arb.models import BanditShadow
-from funding_arb.ml.features import FeatureBuilder
-from funding_arb.ml.bandit import LinTS
+from funding_arb.exec.outcome_log import log_shadow
+from funding_arb.ml.features import FeatureBuilder, exec_context
+from funding_arb.ml.warm_start import BANDIT_CKPT_EVERY, checkpoint_path, restore_bandit
 
 def as_vec(feats) -> np.ndarray:
-    # order must match features you return
-    x = np.array([
-        feats.spread_bp,
-        feats.mid_return_1s,
-        feats.mid_return_5s,
-        feats.vol_proxy_5s,
-        feats.depth_imb_top5,
-        feats.last_action,
-        feats.time_of_day_sin,
-        feats.time_of_day_cos,
-    ], dtype=float).reshape(-1, 1)
-    # normalize a bit to avoid huge scales
-    x[0] /= 10.0       # spread
-    x[1] /= 10.0       # r1s
-    x[2] /= 10.0       # r5s
-    x[3] /= 10.0       # vol proxy
-    return x
+    # order must match features you return (scaled to avoid huge scales)
+    return exec_context(feats)
 
 def main():
     init_db()
@@ -36,7 +18,8 @@ def main():
     fb = FeatureBuilder()
 
     # 4 actions: 0 maker_inside, 1 post_only_edge, 2 taker_now, 3 wait
-    bandit = LinTS(d=8, actions=[0,1,2,3])
+    # resumes ./checkpoints/bandit_shadow.npz, else replays bandit_shadow history
+    bandit = restore_bandit("shadow", "shadow", d=8, actions=[0,1,2,3])
 
     symbol = "BTC/USDT"
     deadline_ms = 500
@@ -50,19 +33,15 @@ def main():
     while time.time() < t_end:
         lob = ex.fetch_lob(symbol, depth=5)
 
-        # build features
-        bid_px = [px for px, _ in lob["bids"]]
-        ask_px = [px for px, _ in lob["asks"]]
-        bid_sz = [sz for _, sz in lob["bids"]]
-        ask_sz = [sz for _, sz in lob["asks"]]
+        # build features (reads the snapshot arrays in place)
         ts_ms = int(time.time() * 1000)
-
-        feats = fb.push_and_compute(ts_ms, bid_px, ask_px, bid_sz, ask_sz, last_action=last_action)
+        feats = fb.push_book(lob, last_action=last_action, ts_ms=ts_ms)
         if not feats:
             time.sleep(0.25); continue
 
         x = as_vec(feats)
         action_bandit = bandit.choose(x)
+        p_bandit = float(bandit.action_probs(x)[bandit.actions.index(action_bandit)])
 
         # execute BASELINE (taker_now), simulate fill & cost
         intent = Intent(symbol=symbol, side="buy", qty=100.0, deadline_ms=deadline_ms)
@@ -76,21 +55,17 @@ def main():
         # online update
         bandit.update(action_bandit, x, reward)
         n_updates += 1
+        if n_updates % BANDIT_CKPT_EVERY == 0:
+            bandit.save(checkpoint_path("shadow"))
         last_action = baseline_action  # last action we actually took
 
-        # log to DB
-        with SessionLocal() as s:
-            s.add(BanditShadow(
-                ts_ms=ts_ms,
-                symbol=symbol,
-                action_bandit=action_bandit,
-                action_baseline=baseline_action,
-                realized_cost_bps=realized_cost_bps,
-            ))
-            s.commit()
+        # log to DB (write-behind)
+        log_shadow(symbol, ts_ms, action_bandit, baseline_action, realized_cost_bps,
+                   context=x, propensity=p_bandit)
 
         time.sleep(0.25)
 
+    bandit.save(checkpoint_path("shadow"))
     print(f"Done. Shadow updates: {n_updates}")
 
 if __name__ == "__main__":
@@ -0,0 +1,78 @@
+# funding_arb/bench_bandit.py
+"""
+LinTS decisions/sec (choose + update per decision) at d = 8, 32, 128, 4 actions:
+the original dict-of-matrices version (inverse + multivariate_normal SVD per
+action per decision) vs ml.bandit.LinTS (rank-1 updates, one batched draw).
+Also reports how far the incrementally updated A_inv / R R^T drift from
+inv(A) after the run.
+    python -m funding_arb.bench_bandit [decisions]
+"""
+import sys
+import time
+
+import numpy as np
+
+from funding_arb.ml.bandit import LinTS
+
+DIMS = (8, 32, 128)
+ACTIONS = [0, 1, 2, 3]
+
+
+class _DictLinTS:
+    """The pre-rank-1 implementation, kept for comparison."""
+    def __init__(self, d, actions, sigma2=1.0, ridge=1.0):
+        self.actions = actions
+        self.sigma2 = sigma2
+        self.A = {a: ridge * np.eye(d) for a in actions}
+        self.b = {a: np.zeros((d, 1)) for a in actions}
+
+    def _sample_theta(self, a):
+        A_inv = np.linalg.inv(self.A[a])
+        mu = A_inv @ self.b[a]
+        return np.random.multivariate_normal(mu.ravel(), self.sigma2 * A_inv).reshape(-1, 1)
+
+    def choose(self, x):
+        scores = {a: (self._sample_theta(a).T @ x).item() for a in self.actions}
+        return max(scores, key=scores.get)
+
+    def update(self, a, x, reward):
+        self.A[a] += x @ x.T
+        self.b[a] += reward * x
+
+
+def _contexts(n: int, d: int, rng):
+    X = rng.normal(0.0, 1.0, (n, d, 1)) / np.sqrt(d)
+    theta = rng.normal(0.0, 1.0, (len(ACTIONS), d))
+    return X, theta
+
+
+def _run(bandit, X, theta, rng) -> float:
+    noise = rng.normal(0.0, 0.1, len(X))
+    t0 = time.perf_counter()
+    for x, e in zip(X, noise):
+        a = bandit.choose(x)
+        bandit.update(a, x, float(theta[a] @ x[:, 0]) + e)
+    return len(X) / (time.perf_counter() - t0)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = np.random.default_rng(4)
+    print(f"actions={len(ACTIONS)}  decisions={n} (original: fewer at large d)")
+    for d in DIMS:
+        X, theta = _contexts(n, d, rng)
+        n_old = max(50, n // (d // 8) ** 2)
+        np.random.seed(0)
+        old = _run(_DictLinTS(d, ACTIONS), X[:n_old], theta, rng)
+        bandit = LinTS(d, ACTIONS, seed=0)
+        new = _run(bandit, X, theta, rng)
+
+        exact = np.linalg.inv(bandit.A)
+        err_inv = np.abs(bandit.A_inv - exact).max()
+        err_cov = np.abs(bandit.R @ bandit.R.transpose(0, 2, 1) - exact).max()
+        print(f"d={d:4d}: original={old:9.0f}/s  rank-1={new:9.0f}/s  x{new / old:6.1f}  "
+              f"max|A_inv - inv(A)|={err_inv:.1e}  max|RR^T - inv(A)|={err_cov:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# funding_arb/bench_bandit_bank.py
+"""
+Per-tick cost of one decision + update for every symbol in the universe,
+d = 8, 4 actions: a dict of LinTS objects (one choose/update per symbol) vs
+one BanditBank (one choose/update call per tick).
+    python -m funding_arb.bench_bandit_bank [ticks]
+"""
+import sys
+import time
+
+import numpy as np
+
+from funding_arb.ml.bandit import BanditBank, LinTS
+
+UNIVERSE = (1, 10, 100, 1000)
+D = 8
+ACTIONS = [0, 1, 2, 3]
+
+
+def _dict_tick(bandits, symbols, X, theta, noise):
+    for j, s in enumerate(symbols):
+        a = bandits[s].choose(X[j])
+        bandits[s].update(a, X[j], float(theta[a] @ X[j]) + noise[j])
+
+
+def _bank_tick(bank, symbols, X, theta, noise):
+    a = bank.choose(symbols, X)
+    bank.update(symbols, a, X, np.einsum("nd,nd->n", theta[a], X) + noise)
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = np.random.default_rng(5)
+    theta = rng.normal(0.0, 1.0, (len(ACTIONS), D))
+    print(f"d={D} actions={len(ACTIONS)} ticks={ticks}; ms per tick (all symbols)")
+    for S in UNIVERSE:
+        symbols = [f"SYM{i}/USDT" for i in range(S)]
+        X = rng.normal(0.0, 1.0, (ticks, S, D)) / np.sqrt(D)
+        noise = rng.normal(0.0, 0.1, (ticks, S))
+        n = max(5, ticks // max(1, S // 10))   # fewer ticks for the slow path at large S
+        bandits = {s: LinTS(D, ACTIONS, seed=i) for i, s in enumerate(symbols)}
+        t0 = time.perf_counter()
+        for t in range(n):
+            _dict_tick(bandits, symbols, X[t], theta, noise[t])
+        old = (time.perf_counter() - t0) / n * 1e3
+        bank = BanditBank(D, ACTIONS, symbols, seed=0)
+        t0 = time.perf_counter()
+        for t in range(ticks):
+            _bank_tick(bank, symbols, X[t], theta, noise[t])
+        new = (time.perf_counter() - t0) / ticks * 1e3
+        print(f"S={S:5d}: dict of LinTS {old:8.3f} ms  bank {new:7.3f} ms  x{old / new:6.1f}  "
+              f"bank per symbol {new / S * 1e3:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# funding_arb/bench_book_snapshot.py
+"""
+Per-tick allocation / time: dict-of-lists lob (re-split by every consumer)
+vs BookSnapshot built once and read in place.
+    python -m funding_arb.bench_book_snapshot [depth] [ticks]
+"""
+import sys
+import time
+import tracemalloc
+
+from funding_arb.data.book import BookSnapshot
+
+
+def _ccxt_book(depth: int, i: int):
+    mid = 60000.0 + (i % 17) * 0.1
+    bids = [[mid - 0.05 - k * 0.1, 0.5 + k * 0.01] for k in range(depth)]
+    asks = [[mid + 0.05 + k * 0.1, 0.6 + k * 0.01] for k in range(depth)]
+    return {"bids": bids, "asks": asks}
+
+
+def _legacy_tick(ob, depth):
+    lob = {"bids": ob["bids"][:depth], "asks": ob["asks"][:depth], "latency_ms": 0}
+    held = [lob]
+    # persist.save_lob, BanditExecutor, bandit_shadow_demo: each re-split the levels
+    for _ in range(3):
+        held.append(([px for px, _ in lob["bids"]], [sz for _, sz in lob["bids"]],
+                     [px for px, _ in lob["asks"]], [sz for _, sz in lob["asks"]]))
+    # features: top-of-book + depth walk
+    held.append(sum(float(px) * float(sz) for px, sz in lob["bids"]))
+    return held
+
+
+def _snapshot_tick(ob, depth):
+    snap = BookSnapshot.from_levels("BTC/USDT", ob["bids"], ob["asks"], depth=depth)
+    held = [snap]
+    for _ in range(3):
+        held.append((snap.bid_px, snap.bid_sz, snap.ask_px, snap.ask_sz))
+    held.append(float(snap.bid_px @ snap.bid_sz))
+    return held
+
+
+def _measure(fn, depth: int, ticks: int):
+    books = [_ccxt_book(depth, i) for i in range(ticks)]
+    peaks = 0
+    tracemalloc.start()
+    for ob in books:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        held = fn(ob, depth)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+        del held
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    for ob in books:
+        fn(ob, depth)
+    us = (time.perf_counter() - t0) / ticks * 1e6
+    return peaks / ticks, us
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    print(f"depth={depth} ticks={ticks}")
+    for name, fn in (("dict-of-lists", _legacy_tick), ("BookSnapshot", _snapshot_tick)):
+        b, us = _measure(fn, depth, ticks)
+        print(f"{name:>14}: {b:9.0f} bytes/tick held, {us:7.2f} us/tick")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# funding_arb/bench_lob_storage.py
+"""
+lob_snapshots storage: legacy four-JSON-column layout vs float64 blobs.
+Writes N synthetic snapshots into two scratch SQLite files, then reports
+file size, write rows/s and read-to-NumPy rows/s.
+    python -m funding_arb.bench_lob_storage [rows] [depth]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+
+from funding_arb.data.book import BookSnapshot
+from funding_arb.models import LOBSnapshot
+from funding_arb.persist import load_lob_arrays, lob_row
+
+JSON_DDL = """
+CREATE TABLE lob_snapshots (
+    id INTEGER PRIMARY KEY, ts_ms BIGINT NOT NULL, symbol VARCHAR(32) NOT NULL,
+    bid_px JSON NOT NULL, bid_sz JSON NOT NULL, ask_px JSON NOT NULL, ask_sz JSON NOT NULL,
+    latency_ms INTEGER NOT NULL)
+"""
+
+
+def _books(n: int, depth: int):
+    rng = np.random.default_rng(7)
+    mids = 60000.0 + np.cumsum(rng.normal(0, 0.5, n))
+    steps = np.arange(depth) * 0.1
+    out = []
+    for i in range(n):
+        bid_px = np.round(mids[i] - 0.05 - steps, 1)
+        ask_px = np.round(mids[i] + 0.05 + steps, 1)
+        bid_sz = np.round(rng.exponential(0.8, depth), 3)
+        ask_sz = np.round(rng.exponential(0.8, depth), 3)
+        out.append(BookSnapshot.from_arrays("BTC/USDT", 1_700_000_000_000 + i * 250,
+                                            bid_px, bid_sz, ask_px, ask_sz, latency_ms=40))
+    return out
+
+
+def _bench_json(path: str, books):
+    eng = create_engine(f"sqlite:///{path}")
+    with eng.begin() as c:
+        c.exec_driver_sql(JSON_DDL)
+        c.exec_driver_sql("CREATE INDEX ix_lob_snapshots_ts_ms ON lob_snapshots (ts_ms)")
+        c.exec_driver_sql("CREATE INDEX ix_lob_snapshots_symbol ON lob_snapshots (symbol)")
+    t0 = time.perf_counter()
+    with eng.begin() as c:
+        c.exec_driver_sql(
+            "INSERT INTO lob_snapshots (ts_ms, symbol, bid_px, bid_sz, ask_px, ask_sz, latency_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(b.ts_ms, b.symbol, json.dumps(b.bid_px.tolist()), json.dumps(b.bid_sz.tolist()),
+              json.dumps(b.ask_px.tolist()), json.dumps(b.ask_sz.tolist()), b.latency_ms) for b in books],
+        )
+    t_write = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with eng.connect() as c:
+        rows = c.exec_driver_sql(
+            "SELECT ts_ms, bid_px, bid_sz, ask_px, ask_sz FROM lob_snapshots ORDER BY ts_ms").all()
+    ts = np.array([r[0] for r in rows], dtype=np.int64)
+    cols = [np.array([json.loads(r[k]) for r in rows], dtype=np.float64) for k in range(1, 5)]
+    t_read = time.perf_counter() - t0
+    assert len(ts) == len(books) and cols[0].shape[0] == len(books)
+    eng.dispose()
+    return t_write, t_read
+
+
+def _bench_blob(path: str, books):
+    eng = create_engine(f"sqlite:///{path}")
+    LOBSnapshot.__table__.create(eng)
+    t0 = time.perf_counter()
+    with eng.begin() as c:
+        c.execute(insert(LOBSnapshot.__table__), [lob_row(b) for b in books])
+    t_write = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with eng.connect() as c:
+        lob = load_lob_arrays(c)
+    t_read = time.perf_counter() - t0
+    assert lob["bid_px"].shape[0] == len(books)
+    eng.dispose()
+    return t_write, t_read
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    books = _books(n, depth)
+    print(f"rows={n} depth={depth}")
+    with tempfile.TemporaryDirectory() as d:
+        for name, fn in (("json", _bench_json), ("blob", _bench_blob)):
+            path = os.path.join(d, f"{name}.db")
+            t_w, t_r = fn(path, books)
+            size = os.path.getsize(path)
+            print(f"{name:>5}: size={size / 1e6:7.2f} MB ({size / n:6.0f} B/row)  "
+                  f"write={n / t_w:9.0f} rows/s  read={n / t_r:9.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
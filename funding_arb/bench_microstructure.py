@@ -0,0 +1,112 @@
+# funding_arb/bench_microstructure.py
+"""
+Per-book cost of the order-book statistics used by the feature modules:
+  loops    list-walking helpers (the original features.py: spread, top imbalance,
+           depth at 10/50 bps, plus FeatureBuilder's spread and top-5 sums)
+  helpers  the per-statistic NumPy helpers they were replaced with
+  kernel   microstructure.snapshot_stats, as compute_features calls it (plain-Python
+           walk up to LIST_PREFIX levels; also microprice, weighted mid, slope, top-5 imbalance)
+and batch throughput of book_stats over (n, depth) arrays (best of repeated runs).
+    python -m funding_arb.bench_microstructure [books]
+"""
+import sys
+import time
+
+import numpy as np
+
+from funding_arb.data.book import BookSnapshot
+from funding_arb.microstructure import book_stats, snapshot_stats
+
+LEVELS = (25, 100, 500)
+BPS = (10.0, 50.0)
+
+
+def _book(depth: int, rng) -> BookSnapshot:
+    mid = 60000.0
+    steps = np.cumsum(rng.integers(1, 4, depth)) * 0.5 - 0.5
+    return BookSnapshot.from_arrays("BTC/USDT", 0, np.round(mid - 0.05 - steps, 2), rng.exponential(0.8, depth),
+                                    np.round(mid + 0.05 + steps, 2), rng.exponential(0.8, depth))
+
+
+def _loops(bids, asks):
+    bid0, ask0 = bids[0][0], asks[0][0]
+    mid = (bid0 + ask0) / 2.0
+    spread = 0.0 if mid <= 0 else (ask0 - bid0) / mid * 1e4
+    imb_top = (bids[0][1] - asks[0][1]) / (bids[0][1] + asks[0][1] + 1e-12)
+    depth = []
+    for bps in BPS:
+        bid_cut, ask_cut = mid * (1 - bps / 1e4), mid * (1 + bps / 1e4)
+        b = 0.0
+        for px, sz in bids:
+            if px < bid_cut:
+                break
+            b += px * sz
+        a = 0.0
+        for px, sz in asks:
+            if px > ask_cut:
+                break
+            a += px * sz
+        depth.append((b, a))
+    # FeatureBuilder redoes spread and the top-5 sums on the same book
+    spread_fb = max(ask0 - bid0, 0.0) / mid * 1e4
+    sb = sum(sz for _, sz in bids[:5])
+    sa = sum(sz for _, sz in asks[:5])
+    return spread, imb_top, depth, spread_fb, (sb - sa) / ((sb + sa) or 1.0)
+
+
+def _helpers(book: BookSnapshot):
+    bid0, ask0 = book.best_bid, book.best_ask
+    mid = (bid0 + ask0) / 2.0
+    spread = (ask0 - bid0) / mid * 1e4
+    bsz, asz = float(book.bid_sz[0]), float(book.ask_sz[0])
+    imb_top = (bsz - asz) / (bsz + asz + 1e-12)
+    depth = []
+    for bps in BPS:
+        nb = int(np.searchsorted(-book.bid_px, -mid * (1 - bps / 1e4), side="right"))
+        na = int(np.searchsorted(book.ask_px, mid * (1 + bps / 1e4), side="right"))
+        depth.append((float(book.bid_px[:nb] @ book.bid_sz[:nb]), float(book.ask_px[:na] @ book.ask_sz[:na])))
+    spread_fb = max(ask0 - bid0, 0.0) / mid * 1e4
+    sb, sa = float(sum(book.bid_sz[:5])), float(sum(book.ask_sz[:5]))
+    return spread, imb_top, depth, spread_fb, (sb - sa) / ((sb + sa) or 1.0)
+
+
+def _per_book(fn, args, n: int) -> float:
+    t0 = time.perf_counter()
+    for a in args[:n]:
+        fn(*a)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = np.random.default_rng(2)
+    print(f"books={n}  thresholds={BPS} bps  (us per book)")
+    for depth in LEVELS:
+        books = [_book(depth, rng) for _ in range(200)]
+        lists = [(b.bids.T.tolist(), b.asks.T.tolist()) for b in books]
+        reps = max(1, n // len(books))
+        t_loop = min([_per_book(_loops, lists, len(lists)) for _ in range(reps)])
+        t_help = min([_per_book(_helpers, [(b,) for b in books], len(books)) for _ in range(reps)])
+        t_kern = min([_per_book(lambda b: snapshot_stats(b, BPS), [(b,) for b in books], len(books))
+                      for _ in range(reps)])
+
+        bp = np.stack([b.bid_px for b in books]); bs = np.stack([b.bid_sz for b in books])
+        ap = np.stack([b.ask_px for b in books]); az = np.stack([b.ask_sz for b in books])
+        k = max(1, 200_000 // len(books) // (depth // 25))
+        bp, bs, ap, az = (np.tile(x, (k, 1)) for x in (bp, bs, ap, az))
+        t0 = time.perf_counter()
+        st = book_stats(bp, bs, ap, az, BPS)
+        t_batch = (time.perf_counter() - t0) / len(bp) * 1e6
+
+        loops_depth = np.array([_loops(*lst)[2] for lst in lists])
+        one = [snapshot_stats(b, BPS) for b in books]
+        same = np.array_equal(st.depth_bid[:len(books)], loops_depth[:, :, 0]) and \
+            np.array_equal(st.depth_ask[:len(books)], loops_depth[:, :, 1]) and \
+            np.array_equal([s.depth_bid for s in one], loops_depth[:, :, 0]) and \
+            np.array_equal([s.depth_ask for s in one], loops_depth[:, :, 1])
+        print(f"levels={depth:4d}: loops={t_loop:7.1f}  helpers={t_help:7.1f}  kernel={t_kern:7.1f}  "
+              f"kernel batch={t_batch:6.2f}/book ({len(bp)} books)  depth matches loops: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# funding_arb/bench_query_range.py
+"""
+Per-symbol time-range reads: single-column ts_ms/symbol indexes (old schema)
+vs the composite (symbol, ts_ms) index. Fills two scratch SQLite files with a
+synthetic funding_ticks table (symbols interleaved in time, like the live
+loop), then times random per-symbol windows through query.fetch_range.
+    python -m funding_arb.bench_query_range [rows] [symbols] [queries]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from funding_arb.models import FundingTick
+from funding_arb.query import fetch_range
+
+OLD_DDL = [
+    "CREATE TABLE funding_ticks (id INTEGER PRIMARY KEY, ts_ms BIGINT, symbol VARCHAR(32), "
+    "rate_8h FLOAT, rate_day FLOAT, bps_day_net FLOAT)",
+    "CREATE INDEX ix_funding_ticks_ts_ms ON funding_ticks (ts_ms)",
+    "CREATE INDEX ix_funding_ticks_symbol ON funding_ticks (symbol)",
+]
+T_START = 1_700_000_000_000
+STEP_MS = 250
+
+
+def _rows(n: int, n_sym: int):
+    rng = np.random.default_rng(11)
+    ts = T_START + (np.arange(n) // n_sym) * STEP_MS
+    sym = [f"SYM{i:02d}/USDT" for i in range(n_sym)]
+    rate = rng.normal(1e-4, 5e-5, n)
+    return [(int(ts[i]), sym[i % n_sym], float(rate[i]), float(rate[i] * 3), float(rate[i] * 3e4))
+            for i in range(n)]
+
+
+def _build(path: str, rows, old: bool):
+    eng = create_engine(f"sqlite:///{path}")
+    with eng.begin() as c:
+        if old:
+            for ddl in OLD_DDL:
+                c.exec_driver_sql(ddl)
+        else:
+            FundingTick.__table__.create(c)
+    t0 = time.perf_counter()
+    with eng.begin() as c:
+        c.exec_driver_sql("INSERT INTO funding_ticks (ts_ms, symbol, rate_8h, rate_day, bps_day_net) "
+                          "VALUES (?, ?, ?, ?, ?)", rows)
+        c.exec_driver_sql("ANALYZE")
+    return eng, time.perf_counter() - t0
+
+
+def _plan(eng) -> str:
+    with eng.connect() as c:
+        rows = c.execute(text("EXPLAIN QUERY PLAN SELECT ts_ms, bps_day_net FROM funding_ticks "
+                              "WHERE symbol = :s AND ts_ms >= :a AND ts_ms < :b ORDER BY ts_ms"),
+                         {"s": "SYM00/USDT", "a": 0, "b": 1}).all()
+    return " | ".join(r[-1] for r in rows)
+
+
+def _time_queries(eng, windows):
+    t0 = time.perf_counter()
+    n = 0
+    for sym, a, b in windows:
+        cols = fetch_range("funding_ticks", sym, a, b, engine=eng)
+        n += len(cols["ts_ms"]) if cols else 0
+    return (time.perf_counter() - t0) / len(windows), n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    n_sym = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    n_q = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    rows = _rows(n, n_sym)
+    span = (n // n_sym) * STEP_MS
+    rng = np.random.default_rng(3)
+    win = span // 100  # each query covers 1% of the history of one symbol
+    windows = [(f"SYM{rng.integers(n_sym):02d}/USDT", int(a), int(a) + win)
+               for a in T_START + rng.integers(0, span - win, n_q)]
+    print(f"rows={n} symbols={n_sym} queries={n_q} window={win / 1000:.0f}s (~{n // n_sym // 100} rows each)")
+
+    with tempfile.TemporaryDirectory() as d:
+        for name, old in (("single", True), ("composite", False)):
+            path = os.path.join(d, f"{name}.db")
+            eng, t_ins = _build(path, rows, old)
+            per_q, got = _time_queries(eng, windows)
+            print(f"{name:>9}: insert={n / t_ins:8.0f} rows/s  size={os.path.getsize(path) / 1e6:6.1f} MB  "
+                  f"query={per_q * 1e3:8.2f} ms  rows={got}")
+            print(f"{'':>9}  plan: {_plan(eng)}")
+            eng.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# funding_arb/data/book.py
+import time
+from itertools import chain
+from typing import Optional, Sequence
+
+import numpy as np
+
+_EMPTY = np.empty((2, 0), dtype=np.float64)
+
+
+def _side(levels, depth: Optional[int]) -> np.ndarray:
+    """[[px, sz], ...] -> C-contiguous (2, n) float64: row 0 prices, row 1 sizes."""
+    if levels is None or len(levels) == 0:
+        return _EMPTY
+    if depth:
+        levels = levels[:depth]
+    n = len(levels)
+    if len(levels[0]) == 2:
+        # flat iterator avoids building an intermediate nested object array
+        flat = np.fromiter(chain.from_iterable(levels), dtype=np.float64, count=2 * n)
+        return flat.reshape(n, 2).T.copy()
+    arr = np.asarray([lv[:2] for lv in levels], dtype=np.float64)
+    return np.ascontiguousarray(arr.T)
+
+
+class BookSnapshot:
+    """
+    One L2 order-book snapshot, built once at ingestion.
+    bids/asks are (2, n) float64 arrays; bid_px/bid_sz/ask_px/ask_sz are
+    contiguous row views made once here, so consumers read them without copying.
+    """
+    __slots__ = ("symbol", "ts_ms", "latency_ms", "bids", "asks", "bid_px", "bid_sz", "ask_px", "ask_sz")
+
+    def __init__(self, symbol: str, ts_ms: int, bids: np.ndarray, asks: np.ndarray, latency_ms: int = 0):
+        self.symbol = symbol
+        self.ts_ms = int(ts_ms)
+        self.latency_ms = int(latency_ms)
+        self.bids = bids
+        self.asks = asks
+        self.bid_px, self.bid_sz = bids[0], bids[1]
+        self.ask_px, self.ask_sz = asks[0], asks[1]
+
+    @classmethod
+    def from_levels(cls, symbol: str, bids: Sequence, asks: Sequence, latency_ms: int = 0,
+                    ts_ms: Optional[int] = None, depth: Optional[int] = None) -> "BookSnapshot":
+        """From ccxt-style [[px, sz], ...] lists (bids desc, asks asc)."""
+        if ts_ms is None:
+            ts_ms = int(time.time() * 1000)
+        return cls(symbol, ts_ms, _side(bids, depth), _side(asks, depth), latency_ms)
+
+    @classmethod
+    def from_arrays(cls, symbol: str, ts_ms: int, bid_px, bid_sz, ask_px, ask_sz,
+                    latency_ms: int = 0) -> "BookSnapshot":
+        bids = np.ascontiguousarray(np.vstack([bid_px, bid_sz]), dtype=np.float64)
+        asks = np.ascontiguousarray(np.vstack([ask_px, ask_sz]), dtype=np.float64)
+        return cls(symbol, ts_ms, bids, asks, latency_ms)
+
+    @classmethod
+    def empty(cls, symbol: str, ts_ms: Optional[int] = None) -> "BookSnapshot":
+        return cls(symbol, int(time.time() * 1000) if ts_ms is None else ts_ms, _EMPTY, _EMPTY)
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return float(self.bids[0, 0]) if self.bids.shape[1] else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return float(self.asks[0, 0]) if self.asks.shape[1] else None
+
+    @property
+    def mid(self) -> Optional[float]:
+        bid, ask = self.best_bid, self.best_ask
+        return (bid + ask) / 2.0 if bid and ask else None
+
+    @property
+    def depth(self) -> int:
+        return min(self.bids.shape[1], self.asks.shape[1])
+
+    def age_ms(self, now_ms: Optional[int] = None) -> int:
+        return (int(time.time() * 1000) if now_ms is None else now_ms) - self.ts_ms
+
+    def __repr__(self):
+        return (f"BookSnapshot({self.symbol}, ts_ms={self.ts_ms}, bid={self.best_bid}, "
+                f"ask={self.best_ask}, levels={self.bids.shape[1]}/{self.asks.shape[1]}, "
+                f"latency_ms={self.latency_ms})")
@@ -0,0 +1,119 @@
+# funding_arb/data/clients.py
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import ccxt
+
+# markets payload cache (cold start skips the multi-hundred-KB markets download)
+MARKETS_CACHE_DIR = os.getenv("MARKETS_CACHE_DIR", "./.markets_cache")
+MARKETS_CACHE_TTL_S = float(os.getenv("MARKETS_CACHE_TTL_S", 6 * 3600))
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, bool, str, str], ccxt.Exchange] = {}
+_base_index: Dict[int, Dict[str, List[str]]] = {}
+
+
+def _cache_path(exchange: str, sandbox: bool) -> str:
+    return os.path.join(MARKETS_CACHE_DIR, f"{exchange}_{'testnet' if sandbox else 'live'}.json")
+
+
+def _read_cache(path: str) -> Optional[dict]:
+    try:
+        if time.time() - os.path.getmtime(path) > MARKETS_CACHE_TTL_S:
+            return None
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path: str, ex: ccxt.Exchange):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"markets": ex.markets, "currencies": ex.currencies}, f)
+        os.replace(tmp, path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"[note] markets cache not written: {e}")
+
+
+def cached_markets(exchange: str, sandbox: bool = False) -> Optional[dict]:
+    """The on-disk markets payload ({"markets", "currencies"}) if younger than MARKETS_CACHE_TTL_S."""
+    cached = _read_cache(_cache_path(exchange, sandbox))
+    return cached if cached and cached.get("markets") else None
+
+
+def _load_markets(ex: ccxt.Exchange, exchange: str, sandbox: bool, reload: bool = False):
+    path = _cache_path(exchange, sandbox)
+    cached = None if reload else _read_cache(path)
+    if cached and cached.get("markets"):
+        ex.set_markets(cached["markets"], cached.get("currencies") or None)
+    else:
+        ex.load_markets(reload=True)
+        _write_cache(path, ex)
+    _base_index.pop(id(ex), None)
+
+
+def get_client(exchange: str = "binanceusdm", sandbox: bool = False,
+               api_key: Optional[str] = None, secret: Optional[str] = None,
+               load_markets: bool = True) -> ccxt.Exchange:
+    """
+    Process-wide ccxt client, one per (exchange, sandbox, credentials).
+    Markets come from the on-disk cache when it is younger than MARKETS_CACHE_TTL_S.
+    """
+    key = (exchange, bool(sandbox), api_key or "", secret or "")
+    with _lock:
+        ex = _clients.get(key)
+        if ex is None:
+            cfg = {"enableRateLimit": True, "options": {"defaultType": "future"}}
+            if api_key and secret:
+                cfg.update(apiKey=api_key, secret=secret)
+            ex = getattr(ccxt, exchange)(cfg)
+            if sandbox:
+                ex.set_sandbox_mode(True)
+            _clients[key] = ex
+        if load_markets and not ex.markets:
+            _load_markets(ex, exchange, sandbox)
+    return ex
+
+
+def refresh_markets(ex: ccxt.Exchange):
+    """Force a markets download for a registry client and rewrite its cache file."""
+    with _lock:
+        for (exchange, sandbox, _, _), client in _clients.items():
+            if client is ex:
+                _load_markets(ex, exchange, sandbox, reload=True)
+                return
+    ex.load_markets(reload=True)
+    _base_index.pop(id(ex), None)
+
+
+def base_index(ex: ccxt.Exchange) -> Dict[str, List[str]]:
+    """base asset -> symbols (sorted), built once per markets load."""
+    idx = _base_index.get(id(ex))
+    if idx is None:
+        idx = {}
+        for sym, m in ex.markets.items():
+            base = str(m.get("base") or sym.split("/")[0]).upper()
+            idx.setdefault(base, []).append(sym)
+        for syms in idx.values():
+            syms.sort()
+        _base_index[id(ex)] = idx
+    return idx
+
+
+def usdt_perp_for_base(ex: ccxt.Exchange, base: str) -> Optional[str]:
+    """'ETH' -> 'ETH/USDT:USDT' (or another ':USDT' contract for that base), None if absent."""
+    base = base.upper()
+    syms = base_index(ex).get(base, [])
+    prefer = f"{base}/USDT:USDT"
+    if prefer in syms:
+        return prefer
+    for s in syms:
+        if s.endswith(":USDT"):
+            return s
+    return None
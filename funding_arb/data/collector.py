@@ -0,0 +1,124 @@
+# funding_arb/data/collector.py
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import ccxt.async_support as ccxt_async
+
+from .book import BookSnapshot
+from .clients import cached_markets
+
+
+@dataclass
+class SymbolStats:
+    symbol: str
+    interval_s: float
+    started_at: float = field(default_factory=time.time)
+    ok: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    skipped: int = 0    # cadence slots missed because a fetch overran
+    dropped: int = 0    # snapshots evicted from a full queue
+    last_latency_ms: int = 0
+
+    @property
+    def target_hz(self) -> float:
+        return 1.0 / self.interval_s if self.interval_s > 0 else 0.0
+
+    def achieved_hz(self, now: Optional[float] = None) -> float:
+        elapsed = (now or time.time()) - self.started_at
+        return self.ok / elapsed if elapsed > 0 else 0.0
+
+    def line(self, now: Optional[float] = None) -> str:
+        return (f"{self.symbol}: target={self.target_hz:.2f}Hz achieved={self.achieved_hz(now):.2f}Hz "
+                f"ok={self.ok} timeouts={self.timeouts} errors={self.errors} "
+                f"skipped={self.skipped} dropped={self.dropped} last_latency={self.last_latency_ms}ms")
+
+
+class AsyncLOBCollector:
+    """
+    Concurrent order-book poller for Binance USDM (public, no keys).
+    - one task per symbol, each on its own fixed cadence (`interval_s`)
+    - a fetch slower than `deadline_s` is cancelled and counted as a timeout
+    - snapshots land in a bounded queue; if the consumer falls behind the oldest
+      snapshot is dropped so producers never block on a slow writer
+    """
+    def __init__(self, symbols: List[str], interval_s: float = 0.25, depth: int = 5,
+                 deadline_s: Optional[float] = None, queue_size: int = 1000):
+        self.symbols = list(symbols)
+        self.interval_s = interval_s
+        self.depth = depth
+        self.deadline_s = deadline_s if deadline_s is not None else interval_s
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats: Dict[str, SymbolStats] = {s: SymbolStats(s, interval_s) for s in self.symbols}
+        self.ex = ccxt_async.binanceusdm({
+            "enableRateLimit": True,
+            "options": {"defaultType": "future"},
+        })
+        self._tasks: List[asyncio.Task] = []
+
+    def _offer(self, lob: BookSnapshot):
+        if self.queue.full():
+            old = self.queue.get_nowait()
+            self.stats[old.symbol].dropped += 1
+        self.queue.put_nowait(lob)
+
+    async def _fetch(self, symbol: str) -> BookSnapshot:
+        t0 = time.time()
+        book = await self.ex.fetch_order_book(symbol, limit=self.depth)
+        latency_ms = int((time.time() - t0) * 1000)
+        return BookSnapshot.from_levels(symbol, book.get("bids", []), book.get("asks", []),
+                                        latency_ms=latency_ms, ts_ms=int(t0 * 1000), depth=self.depth)
+
+    async def _poll(self, symbol: str):
+        st = self.stats[symbol]
+        next_t = time.time()
+        while True:
+            try:
+                lob = await asyncio.wait_for(self._fetch(symbol), timeout=self.deadline_s)
+                st.ok += 1
+                st.last_latency_ms = lob.latency_ms
+                self._offer(lob)
+            except asyncio.TimeoutError:
+                st.timeouts += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                st.errors += 1
+
+            next_t += self.interval_s
+            now = time.time()
+            if next_t < now:
+                # overran one or more slots: resync to the grid instead of bursting
+                missed = int((now - next_t) // self.interval_s) + 1
+                st.skipped += missed
+                next_t += missed * self.interval_s
+            await asyncio.sleep(next_t - now)
+
+    async def start(self):
+        """
+        Load markets before the pollers start: the first fetch_order_book would
+        otherwise download exchangeInfo under deadline_s, get cancelled, and
+        start the download over on every attempt.
+        """
+        cached = cached_markets("binanceusdm", False)
+        if cached:
+            self.ex.set_markets(cached["markets"], cached.get("currencies") or None)
+        else:
+            await self.ex.load_markets()
+        now = time.time()
+        for st in self.stats.values():
+            st.started_at = now
+        self._tasks = [asyncio.create_task(self._poll(s), name=f"lob:{s}") for s in self.symbols]
+
+    def report(self) -> List[str]:
+        now = time.time()
+        return [st.line(now) for st in self.stats.values()]
+
+    async def close(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.ex.close()
@@ -1,18 +1,19 @@
-import ccxt
 import time
+from .book import BookSnapshot
+from .clients import get_client
 
 class BinanceUSDM_Public:
     """Public-only access to Binance USDM (no API keys needed)."""
     def __init__(self):
-        self.ex = ccxt.binanceusdm({
-            "enableRateLimit": True,
-            "options": {"defaultType": "future"},
-        })
+        self.ex = get_client("binanceusdm")
 
     def fetch_lob(self, symbol="BTC/USDT", depth=5):
         t0 = time.time()
         book = self.ex.fetch_order_book(symbol, limit=depth)  # public endpoint
         latency_ms = int((time.time() - t0) * 1000)
-        bids = book.get("bids", [])[:depth]
-        asks = book.get("asks", [])[:depth]
-        return {"bids": bids, "asks": asks, "latency_ms": latency_ms}
\ No newline at end of file
+        return BookSnapshot.from_levels(symbol, book.get("bids", []), book.get("asks", []),
+                                        latency_ms=latency_ms, ts_ms=int(t0 * 1000), depth=depth)
+
+    def fetch_depth_snapshot(self, symbol="BTC/USDT", limit=1000):
+        """Raw REST depth incl. lastUpdateId, used to seed data.orderbook.OrderBook."""
+        return self.ex.fapiPublicGetDepth({"symbol": self.ex.market_id(symbol), "limit": limit})
@@ -1,57 +1,114 @@
 # funding_arb/data/funding.py
-import ccxt
+import os
 import time
+from dataclasses import dataclass
+from typing import Dict
+from .clients import get_client
+
+# upper bound on how long a premium-index entry is served from memory
+FUNDING_CACHE_TTL_S = float(os.getenv("FUNDING_CACHE_TTL_S", 60))
 
 def _to_binance_symbol(unified_symbol: str) -> str:
     """
     Convert CCXT unified 'BASE/QUOTE' into Binance 'BASEQUOTE', e.g. 'BTC/USDT' -> 'BTCUSDT'
     """
     if "/" in unified_symbol:
-        base, quote = unified_symbol.split("/")
+        base, quote = unified_symbol.split(":")[0].split("/")
         return f"{base}{quote}"
     return unified_symbol
 
+def _f(x, default: float = 0.0) -> float:
+    try:
+        return float(x)
+    except Exception:
+        return default
+
+@dataclass
+class PremiumIndex:
+    symbol: str             # Binance id, e.g. "BTCUSDT"
+    mark_px: float
+    index_px: float
+    funding_rate: float     # lastFundingRate: predicted rate for the next settlement, per 8h
+    interest_rate: float
+    next_funding_ms: int
+    ts_ms: int
+
+    @classmethod
+    def from_raw(cls, d: dict) -> "PremiumIndex":
+        return cls(
+            symbol=str(d.get("symbol", "")),
+            mark_px=_f(d.get("markPrice")),
+            index_px=_f(d.get("indexPrice")),
+            funding_rate=_f(d.get("lastFundingRate")),
+            interest_rate=_f(d.get("interestRate")),
+            next_funding_ms=int(_f(d.get("nextFundingTime"))),
+            ts_ms=int(_f(d.get("time")) or time.time() * 1000),
+        )
+
 class FundingFeed:
     """
     Real funding fetch for Binance USDM via raw premium-index endpoint.
     Returns (rate_per_8h, timestamp_ms).
+
+    bulk=True pulls the premium index for every symbol in one request and serves
+    lookups from memory until the entry's nextFundingTime or `ttl_s`, whichever
+    comes first. bulk=False keeps one request per symbol (same caching).
     """
-    def __init__(self):
-        # public-only; no keys required
-        self.ex = ccxt.binanceusdm({
-            "enableRateLimit": True,
-            "options": {"defaultType": "future"},
-        })
+    def __init__(self, bulk: bool = True, ttl_s: float = FUNDING_CACHE_TTL_S):
+        # public-only; no keys required. Raw endpoint only, so markets aren't needed.
+        self.ex = get_client("binanceusdm", load_markets=False)
+        self.bulk = bulk
+        self.ttl_s = ttl_s
+        self._cache: Dict[str, PremiumIndex] = {}
+        self._expires: Dict[str, float] = {}
+        self.requests = 0
 
-    def funding_rate_8h(self, symbol: str = "BTC/USDT"):
+    def _store(self, raw: dict, now: float):
+        pi = PremiumIndex.from_raw(raw)
+        if not pi.symbol:
+            return
+        expires = now + self.ttl_s
+        if pi.next_funding_ms:
+            expires = min(expires, pi.next_funding_ms / 1000.0)
+        self._cache[pi.symbol] = pi
+        self._expires[pi.symbol] = expires
+
+    def refresh(self, bsym: str | None = None):
         """
-        rate is per 8h as a decimal (e.g., 0.0001 == 1 bp per 8h).
+        Raw endpoint: GET /fapi/v1/premiumIndex (ccxt: fapiPublicGetPremiumIndex).
+        Without a symbol Binance returns a list covering every perp.
         """
+        params = {} if (self.bulk or not bsym) else {"symbol": bsym}
+        resp = self.ex.fapiPublicGetPremiumIndex(params)
+        self.requests += 1
+        now = time.time()
+        for raw in (resp if isinstance(resp, list) else [resp or {}]):
+            self._store(raw, now)
+        if bsym and bsym not in self._cache:
+            self._expires[bsym] = now + self.ttl_s  # unknown symbol: don't refetch every call
+
+    def premium(self, symbol: str = "BTC/USDT") -> PremiumIndex:
+        """Mark, index and predicted funding for `symbol`, refreshed only when expired."""
         bsym = _to_binance_symbol(symbol)
+        if time.time() >= self._expires.get(bsym, 0.0):
+            try:
+                self.refresh(bsym)
+            except Exception:
+                if bsym not in self._cache:
+                    raise
+                # serve the stale entry; next lookup retries
+        pi = self._cache.get(bsym)
+        if pi is None:
+            return PremiumIndex(bsym, 0.0, 0.0, 0.0, 0.0, 0, int(time.time() * 1000))
+        return pi
 
-        # Raw endpoint: GET /fapi/v1/premiumIndex
-        # ccxt method: fapiPublicGetPremiumIndex
-        resp = self.ex.fapiPublicGetPremiumIndex({"symbol": bsym})
-        # Some ccxt versions return a list if symbol param is omitted; ensure we have a dict for our symbol
-        if isinstance(resp, list):
-            items = [it for it in resp if str(it.get("symbol")) == bsym]
-            data = items[0] if items else {}
-        else:
-            data = resp or {}
-
-        # Keys we care about:
-        # - lastFundingRate (string)
-        # - nextFundingTime (ms)
-        # - time (ms)
-        rate_str = data.get("lastFundingRate", "0")
-        try:
-            rate = float(rate_str)
-        except Exception:
-            rate = 0.0
-
-        ts = int(data.get("time") or time.time() * 1000)
-        return rate, ts
+    def funding_rate_8h(self, symbol: str = "BTC/USDT"):
+        """
+        rate is per 8h as a decimal (e.g., 0.0001 == 1 bp per 8h).
+        """
+        pi = self.premium(symbol)
+        return pi.funding_rate, pi.ts_ms
 
 def funding_per_day_from_8h(rate_per_8h: float) -> float:
     """Binance funds every 8h → 3 periods per day."""
-    return rate_per_8h * 3.0
\ No newline at end of file
+    return rate_per_8h * 3.0
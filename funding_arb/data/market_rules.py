@@ -0,0 +1,227 @@
+# funding_arb/data/market_rules.py
+"""
+Per-symbol trading rules (price tick, qty step, min/max qty, min notional)
+read once from a client's markets into a table, so sizing and rounding on
+the order path are plain arithmetic instead of ex.market() lookups and
+ccxt *_to_precision calls. A background thread re-downloads the markets
+every MARKET_RULES_REFRESH_S and swaps the table in.
+    python -m funding_arb.data.market_rules [symbols] [orders]
+"""
+import math
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Optional
+
+import ccxt
+
+from funding_arb.data.clients import refresh_markets
+
+MARKET_RULES_REFRESH_S = float(os.getenv("MARKET_RULES_REFRESH_S", 3600.0))
+OPEN_FLOOR_USDT = float(os.getenv("OPEN_FLOOR_USDT", 20.0))   # Binance testnet opening-order floor
+
+_lock = threading.Lock()
+_registry: Dict[int, "MarketRules"] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    tick: float             # price increment (0 = unknown)
+    step: float             # qty increment (0 = unknown)
+    min_qty: float
+    max_qty: float          # inf when the venue sets none
+    min_notional: float     # venue cost floor (0 = none)
+    price_dp: int           # decimals of tick / step, to print rounded values exactly
+    qty_dp: int
+
+
+def _decimals(step: float) -> int:
+    """Decimals in the step's own representation: 0.25 -> 2, 0.5 -> 1, 5 -> 0."""
+    if step <= 0:
+        return 12
+    return max(0, -Decimal(repr(step)).normalize().as_tuple().exponent)
+
+
+def floor_to_step(x: float, step: float, dp: int) -> float:
+    """Truncate to a multiple of step (amount_to_precision semantics); 1e-9 absorbs float noise."""
+    if step <= 0:
+        return x
+    return round(math.floor(x / step + 1e-9) * step, dp)
+
+
+def round_to_tick(px: float, tick: float, dp: int, side: Optional[str] = None) -> float:
+    """Nearest tick, or the passive one for a side: down for a buy, up for a sell."""
+    if tick <= 0:
+        return px
+    q = px / tick
+    n = math.floor(q + 1e-9) if side == "buy" else math.ceil(q - 1e-9) if side == "sell" else round(q)
+    return round(n * tick, dp)
+
+
+def _increment(precision, mode: int) -> float:
+    if precision is None:
+        return 0.0
+    if mode == ccxt.DECIMAL_PLACES:
+        return 10.0 ** -float(precision)
+    return float(precision)   # TICK_SIZE: already an increment
+
+
+def build_rule(m: dict, mode: int) -> Rule:
+    prec = m.get("precision") or {}
+    limits = m.get("limits") or {}
+    amount = limits.get("amount") or {}
+    cost = limits.get("cost") or {}
+    tick, step = _increment(prec.get("price"), mode), _increment(prec.get("amount"), mode)
+    return Rule(tick=tick, step=step,
+                min_qty=float(amount.get("min") or 0.0),
+                max_qty=float(amount.get("max") or math.inf),
+                min_notional=float(cost.get("min") or 0.0),
+                price_dp=_decimals(tick), qty_dp=_decimals(step))
+
+
+class MarketRules:
+    """
+    Rule table for one ccxt client. Reads never block on the refresher: the
+    table is a dict swapped in whole. Unknown symbols rebuild from the
+    client's current markets once, then raise KeyError.
+    """
+    def __init__(self, ex, refresh_s: float = MARKET_RULES_REFRESH_S):
+        self.ex = ex
+        self.refresh_s = refresh_s
+        self.rules: Dict[str, Rule] = {}
+        self.loaded_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0
+        self.errors = 0
+        self.load()
+
+    def load(self):
+        """Rebuild the table from the client's markets (no network)."""
+        mode = getattr(self.ex, "precisionMode", ccxt.TICK_SIZE)
+        self.rules = {sym: build_rule(m, mode) for sym, m in (self.ex.markets or {}).items()}
+        self.loaded_at = time.time()
+
+    def start(self) -> "MarketRules":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="market-rules", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_s):
+            try:
+                refresh_markets(self.ex)
+                self.load()
+                self.refreshes += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"[note] market rules refresh failed: {e}")
+
+    # ---------- order path ----------
+    def rule(self, symbol: str) -> Rule:
+        r = self.rules.get(symbol)
+        if r is None:
+            self.load()   # markets may have been reloaded since (e.g. _ensure_symbol)
+            r = self.rules[symbol]
+        return r
+
+    def floor_qty(self, symbol: str, qty: float) -> float:
+        r = self.rule(symbol)
+        return floor_to_step(min(qty, r.max_qty), r.step, r.qty_dp)
+
+    def round_price(self, symbol: str, px: float, side: Optional[str] = None) -> float:
+        r = self.rule(symbol)
+        return round_to_tick(px, r.tick, r.price_dp, side)
+
+    def min_notional(self, symbol: str, ref_price: float, floor: float = OPEN_FLOOR_USDT) -> float:
+        """Conservative opening minimum in quote: min qty at ref_price, the venue cost floor, `floor`."""
+        r = self.rule(symbol)
+        approx = r.min_qty * ref_price if ref_price else 0.0
+        return max(approx, r.min_notional, floor)
+
+    def qty_from_notional(self, symbol: str, price: float, notional: float) -> float:
+        """Base qty for `notional` quote at `price`, at least min qty, truncated to the step."""
+        if price <= 0:
+            raise ValueError("price must be > 0")
+        r = self.rule(symbol)
+        qty = floor_to_step(min(max(notional / price, r.min_qty), r.max_qty), r.step, r.qty_dp)
+        if qty < r.min_qty:
+            qty = floor_to_step(r.min_qty, r.step, r.qty_dp)
+        return max(qty, 0.0)
+
+
+def rules_for(ex, start: bool = True) -> MarketRules:
+    """Process-wide MarketRules per client (refresher started on first use)."""
+    with _lock:
+        rules = _registry.get(id(ex))
+        if rules is None or rules.ex is not ex:
+            rules = _registry[id(ex)] = MarketRules(ex)
+    return rules.start() if start else rules
+
+
+def main():
+    n_sym = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    ex = ccxt.binanceusdm()
+    markets = {}
+    steps = (1.0, 0.1, 0.01, 0.001, 0.25, 0.5, 5.0, 0.005)    # powers of ten and not
+    ticks = (0.01, 0.25, 0.5, 0.1, 0.05, 0.0001)
+    for i in range(n_sym):
+        sym = f"C{i}/USDT:USDT"
+        step, tick = steps[i % len(steps)], ticks[i % len(ticks)]
+        markets[sym] = {"id": f"C{i}USDT", "symbol": sym, "base": f"C{i}", "quote": "USDT", "settle": "USDT",
+                        "type": "swap", "spot": False, "swap": True, "linear": True, "contract": True, "active": True,
+                        "precision": {"price": tick, "amount": step},
+                        "limits": {"amount": {"min": step, "max": 1e6}, "cost": {"min": 5.0}, "price": {}}}
+    ex.set_markets(markets)
+    rules = MarketRules(ex)
+    syms = list(markets)
+    prices = [10.0 + (k % 977) * 3.7 for k in range(n)]
+
+    def ccxt_path(sym, px):
+        # what BinanceUSDM_TestnetTrader did per order: market lookups + amount_to_precision
+        m = ex.market(sym)
+        min_amt = (m.get("limits", {}).get("amount", {}) or {}).get("min") or 0.0
+        floor = max(float(min_amt) * px, OPEN_FLOOR_USDT)
+        m = ex.market(sym)
+        min_amt = (m.get("limits", {}).get("amount", {}) or {}).get("min") or 0.0
+        qty = float(ex.amount_to_precision(sym, max(max(25.0, floor) / px, float(min_amt))))
+        return max(qty, float(min_amt))
+
+    def rules_path(sym, px):
+        return rules.qty_from_notional(sym, px, max(25.0, rules.min_notional(sym, px)))
+
+    mismatches = sum(ccxt_path(syms[k % n_sym], prices[k]) != rules_path(syms[k % n_sym], prices[k])
+                     for k in range(n))
+    # prices and raw quantities on every tick/step grid: on-grid, never above the request, same as ccxt
+    off_grid = px_mismatches = 0
+    for k in range(n):
+        sym, r = syms[k % n_sym], rules.rules[syms[k % n_sym]]
+        raw = prices[k] / 7.0
+        q = rules.floor_qty(sym, raw)
+        off_grid += q > raw + 1e-12 or abs(q / r.step - round(q / r.step)) > 1e-9
+        px_mismatches += rules.round_price(sym, prices[k] + 0.0137) != float(ex.price_to_precision(sym, prices[k] + 0.0137))
+    for name, fn in (("ccxt market()+amount_to_precision", ccxt_path), ("rule table", rules_path)):
+        t0 = time.perf_counter()
+        for k in range(n):
+            fn(syms[k % n_sym], prices[k])
+        dt = time.perf_counter() - t0
+        print(f"{name:36s} {dt / n * 1e6:7.2f} us/order")
+    t0 = time.perf_counter()
+    rules.load()
+    print(f"table build for {n_sym} symbols: {(time.perf_counter() - t0) * 1e3:.2f} ms; "
+          f"qty mismatches vs ccxt: {mismatches}/{n}; price mismatches: {px_mismatches}/{n}; "
+          f"off-grid or rounded-up quantities: {off_grid}/{n}")
+
+
+if __name__ == "__main__":
+    main()
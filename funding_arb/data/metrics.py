@@ -0,0 +1,182 @@
+# funding_arb/data/metrics.py
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# knobs (env-overridable)
+METRICS_BASIS_EVERY_S = float(os.getenv("METRICS_BASIS_EVERY_S", 3.0))    # mark price moves ~1 s
+METRICS_BASIS_TTL_S   = float(os.getenv("METRICS_BASIS_TTL_S", 30.0))     # older -> served as zeros
+METRICS_STATS_BAR_S   = float(os.getenv("METRICS_STATS_BAR_S", 300.0))    # taker ratio / OI hist are 5m bars
+METRICS_STATS_LAG_S   = float(os.getenv("METRICS_STATS_LAG_S", 5.0))      # poll this long after a bar closes
+METRICS_STATS_TTL_S   = float(os.getenv("METRICS_STATS_TTL_S", 900.0))    # older -> omitted
+METRICS_RETRY_S       = float(os.getenv("METRICS_RETRY_S", 10.0))
+METRICS_TIMEOUT_S     = float(os.getenv("METRICS_TIMEOUT_S", 3.0))
+
+STATS_BASE_URL = "https://fapi.binance.com"  # mainnet-only public stats (work even when trading testnet)
+
+_BASIS_ZERO = {"basis_bps": 0.0, "mark_px": 0.0, "index_px": 0.0}
+
+
+def pooled_session(pool_size: int = 4) -> requests.Session:
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def fetch_basis(session: requests.Session, fapi_public: str, symbol_id: str,
+                timeout: float = METRICS_TIMEOUT_S) -> dict:
+    """
+    Basis (mark - index)/index in bps from GET {fapi_public}/premiumIndex.
+    `fapi_public` e.g. "https://fapi.binance.com/fapi/v1" (ccxt: ex.urls["api"]["fapiPublic"]).
+    """
+    d = session.get(f"{fapi_public}/premiumIndex", params={"symbol": symbol_id}, timeout=timeout).json()
+    mark = float(d.get("markPrice") or 0.0)
+    index = float(d.get("indexPrice") or 0.0)
+    basis_bps = (mark - index) / index * 1e4 if mark > 0 and index > 0 else 0.0
+    return {"basis_bps": basis_bps, "mark_px": mark, "index_px": index}
+
+
+def fetch_stats(session: requests.Session, asset_ccy: str, timeout: float = METRICS_TIMEOUT_S) -> dict:
+    """
+    Mainnet 5m stats for "ETH/USDT":
+    - taker buy/sell ratio (taker_buy_sell_ratio_5m)
+    - open interest change and level (oi_change_pct_5m, oi_sum)
+    Endpoints that fail are left out; returns {} if both fail.
+    """
+    out = {}
+    sym = asset_ccy.split(":")[0].replace("/", "")
+    try:
+        d = session.get(f"{STATS_BASE_URL}/futures/data/takerlongshortRatio",
+                        params={"symbol": sym, "interval": "5m", "limit": 1}, timeout=timeout).json()
+        if isinstance(d, list) and d:
+            last = d[-1]
+            # Binance returns different keys across time; use whatever exists
+            out["taker_buy_sell_ratio_5m"] = float(last.get("buySellRatio") or last.get("longShortRatio") or 1.0)
+    except Exception:
+        pass
+    try:
+        d = session.get(f"{STATS_BASE_URL}/futures/data/openInterestHist",
+                        params={"symbol": sym, "period": "5m", "limit": 2}, timeout=timeout).json()
+        if isinstance(d, list) and len(d) >= 2:
+            prev = float(d[-2].get("sumOpenInterest", 0.0))
+            cur = float(d[-1].get("sumOpenInterest", 0.0))
+            if prev > 0:
+                out["oi_change_pct_5m"] = (cur - prev) / prev
+            out["oi_sum"] = cur
+    except Exception:
+        pass
+    return out
+
+
+class MetricsRefresher:
+    """
+    Polls the slow feature inputs in a background thread, over one pooled
+    HTTP session, so the per-tick feature path only reads memory:
+    - basis from premiumIndex every METRICS_BASIS_EVERY_S
+    - taker ratio / OI stats shortly after each 5m bar closes
+    `get(symbol_id, asset_ccy)` registers the pair on first use and returns the
+    cached values plus basis_age_s / stats_age_s (None until the first fetch).
+    """
+    def __init__(self, fapi_public: str = "https://fapi.binance.com/fapi/v1",
+                 session: Optional[requests.Session] = None):
+        self.fapi_public = fapi_public.rstrip("/")
+        self.session = session or pooled_session()
+        self._basis: Dict[str, Tuple[float, dict]] = {}   # symbol_id -> (fetched_at, values)
+        self._stats: Dict[str, Tuple[float, dict]] = {}   # asset_ccy -> (fetched_at, values)
+        self._due: Dict[Tuple[str, str], float] = {}      # (kind, key) -> next poll time
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+        self.errors = 0
+
+    @classmethod
+    def for_exchange(cls, ex, **kw) -> "MetricsRefresher":
+        """Basis from the same venue (mainnet or testnet) the ccxt client points at."""
+        return cls(fapi_public=ex.urls["api"]["fapiPublic"], **kw)
+
+    def start(self) -> "MetricsRefresher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def track(self, symbol_id: str, asset_ccy: str):
+        with self._lock:
+            added = False
+            for key in (("basis", symbol_id), ("stats", asset_ccy)):
+                if key not in self._due:
+                    self._due[key] = 0.0
+                    added = True
+        if added:
+            self._wake.set()
+
+    def get(self, symbol_id: str, asset_ccy: str, now: Optional[float] = None) -> dict:
+        self.track(symbol_id, asset_ccy)
+        now = time.time() if now is None else now
+        out = dict(_BASIS_ZERO)
+        basis_age = stats_age = None
+        with self._lock:
+            b = self._basis.get(symbol_id)
+            s = self._stats.get(asset_ccy)
+        if b is not None:
+            basis_age = now - b[0]
+            if basis_age <= METRICS_BASIS_TTL_S:
+                out.update(b[1])
+        if s is not None:
+            stats_age = now - s[0]
+            if stats_age <= METRICS_STATS_TTL_S:
+                out.update(s[1])
+        out["basis_age_s"] = basis_age
+        out["stats_age_s"] = stats_age
+        return out
+
+    # ---------- worker ----------
+    def _next_stats_poll(self, now: float) -> float:
+        return (now // METRICS_STATS_BAR_S + 1) * METRICS_STATS_BAR_S + METRICS_STATS_LAG_S
+
+    def _poll(self, kind: str, key: str, now: float) -> float:
+        """Fetch one source; returns when it is due next."""
+        self.requests += 1
+        try:
+            if kind == "basis":
+                vals = fetch_basis(self.session, self.fapi_public, key)
+                with self._lock:
+                    self._basis[key] = (time.time(), vals)
+                return now + METRICS_BASIS_EVERY_S
+            vals = fetch_stats(self.session, key)
+            if not vals:
+                raise ValueError("no stats")
+            with self._lock:
+                self._stats[key] = (time.time(), vals)
+            return self._next_stats_poll(now)
+        except Exception:
+            self.errors += 1
+            return now + (METRICS_BASIS_EVERY_S if kind == "basis" else METRICS_RETRY_S)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            now = time.time()
+            with self._lock:
+                due = [k for k, t in self._due.items() if t <= now]
+            for kind, key in due:
+                nxt = self._poll(kind, key, now)
+                with self._lock:
+                    self._due[(kind, key)] = nxt
+            with self._lock:
+                wait = min(self._due.values(), default=now + 60.0) - time.time()
+            self._wake.wait(max(wait, 0.0))
@@ -0,0 +1,248 @@
+# funding_arb/data/orderbook.py
+import asyncio
+import json
+import sys
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional
+
+import aiohttp
+
+from .book import BookSnapshot
+
+
+class _Side:
+    """
+    One side of the book: price -> size map plus a sorted key list.
+    Keys are stored so that index 0 is always the best level
+    (bids are kept as negated prices).
+    """
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.size: Dict[float, float] = {}
+        self.keys: List[float] = []
+
+    def _key(self, px: float) -> float:
+        return -px if self.is_bid else px
+
+    def clear(self):
+        self.size.clear()
+        self.keys.clear()
+
+    def set(self, px: float, sz: float):
+        if sz <= 0.0:
+            if px in self.size:
+                del self.size[px]
+                k = self._key(px)
+                del self.keys[bisect_left(self.keys, k)]
+            return
+        if px not in self.size:
+            insort(self.keys, self._key(px))
+        self.size[px] = sz
+
+    def best(self) -> Optional[float]:
+        if not self.keys:
+            return None
+        k = self.keys[0]
+        return -k if self.is_bid else k
+
+    def levels(self, n: int) -> List[List[float]]:
+        out = []
+        for k in self.keys[:n]:
+            px = -k if self.is_bid else k
+            out.append([px, self.size[px]])
+        return out
+
+    def notional_until(self, cut: float) -> float:
+        """Sum px*sz from the top until a level lies beyond `cut` (walks only the levels inside)."""
+        total = 0.0
+        for k in self.keys:
+            px = -k if self.is_bid else k
+            if (px < cut) if self.is_bid else (px > cut):
+                break
+            total += px * self.size[px]
+        return total
+
+
+class OrderBook:
+    """
+    Locally maintained L2 book for one Binance USDM symbol.
+    Seed with a REST depth snapshot, then feed depthUpdate events:
+    - events with u < lastUpdateId are stale and dropped
+    - the first applied event must straddle the snapshot (U <= lastUpdateId <= u)
+    - afterwards every event's `pu` must equal the previous `u`, otherwise the
+      book is marked out of sync and events are buffered until a new snapshot
+    """
+    def __init__(self, symbol: str, max_buffer: int = 5000):
+        self.symbol = symbol
+        self.bids = _Side(is_bid=True)
+        self.asks = _Side(is_bid=False)
+        self.last_update_id: Optional[int] = None
+        self.synced = False
+        self._first = True
+        self._buffer: deque = deque(maxlen=max_buffer)
+        self.last_event_ms = 0
+        self.applied = 0
+        self.gaps = 0
+        self.resyncs = 0
+
+    @property
+    def needs_resync(self) -> bool:
+        return not self.synced
+
+    # ---------- feed ----------
+    def load_snapshot(self, snapshot: dict) -> bool:
+        """
+        snapshot: {"lastUpdateId": int, "bids": [[px, sz], ...], "asks": [[px, sz], ...]}
+        Replays buffered events on top. Returns True if the book is in sync afterwards.
+        """
+        self.bids.clear()
+        self.asks.clear()
+        for px, sz in snapshot.get("bids", []):
+            self.bids.set(float(px), float(sz))
+        for px, sz in snapshot.get("asks", []):
+            self.asks.set(float(px), float(sz))
+        self.last_update_id = int(snapshot["lastUpdateId"])
+        self.last_event_ms = int(snapshot.get("T") or snapshot.get("E") or 0)
+        self.synced = True
+        self._first = True
+        self.resyncs += 1
+
+        pending = list(self._buffer)
+        self._buffer.clear()
+        for ev in pending:
+            self.apply(ev)
+        return self.synced
+
+    def apply(self, event: dict) -> bool:
+        """Apply one depthUpdate event. Returns True if it changed the book."""
+        event = event.get("data", event)  # combined-stream wrapper
+        if not self.synced:
+            self._buffer.append(event)
+            return False
+
+        U, u = int(event["U"]), int(event["u"])
+        if u < self.last_update_id:
+            return False  # already contained in the snapshot
+
+        if self._first:
+            if U > self.last_update_id:
+                # snapshot is older than the stream: need a fresher one
+                self._mark_gap(event)
+                return False
+            self._first = False
+        elif int(event.get("pu", -1)) != self.last_update_id:
+            self._mark_gap(event)
+            return False
+
+        for px, sz in event.get("b", []):
+            self.bids.set(float(px), float(sz))
+        for px, sz in event.get("a", []):
+            self.asks.set(float(px), float(sz))
+        self.last_update_id = u
+        self.last_event_ms = int(event.get("T") or event.get("E") or self.last_event_ms)
+        self.applied += 1
+        return True
+
+    def _mark_gap(self, event: dict):
+        self.synced = False
+        self.gaps += 1
+        self._buffer.append(event)
+
+    # ---------- queries ----------
+    def best_bid(self) -> Optional[float]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[float]:
+        return self.asks.best()
+
+    def mid(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        return (bid + ask) / 2.0 if bid is not None and ask is not None else None
+
+    def top(self, n: int = 5):
+        """Top-n levels per side as ([[px, sz], ...] bids desc, [[px, sz], ...] asks asc)."""
+        return self.bids.levels(n), self.asks.levels(n)
+
+    def depth_within_bps(self, bps: float) -> dict:
+        """Notional (USDT) within +/- bps of mid on each side."""
+        mid = self.mid()
+        if not mid:
+            return dict(bid_usdt=0.0, ask_usdt=0.0)
+        return dict(
+            bid_usdt=self.bids.notional_until(mid * (1 - bps / 1e4)),
+            ask_usdt=self.asks.notional_until(mid * (1 + bps / 1e4)),
+        )
+
+    def to_lob(self, depth: int = 5) -> BookSnapshot:
+        """Same type as BinanceUSDM_Public.fetch_lob, for existing consumers."""
+        bids, asks = self.top(depth)
+        return BookSnapshot.from_levels(self.symbol, bids, asks, ts_ms=self.last_event_ms or None)
+
+
+# ---------- live feed ----------
+WS_BASE = "wss://fstream.binance.com/ws"
+
+async def stream_book(book: OrderBook, ws_symbol: str, fetch_snapshot: Callable[[], dict],
+                      speed: str = "100ms", on_update: Optional[Callable[[OrderBook], None]] = None):
+    """
+    Keep `book` live from the diff stream. `fetch_snapshot` is a blocking REST call
+    (e.g. BinanceUSDM_Public.fetch_depth_snapshot); it runs in a worker thread while
+    events keep buffering, and again whenever a sequence gap is detected.
+    """
+    url = f"{WS_BASE}/{ws_symbol.lower()}@depth@{speed}"
+    resync: Optional[asyncio.Task] = None
+    async with aiohttp.ClientSession() as http:
+        async with http.ws_connect(url, heartbeat=30) as ws:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                changed = book.apply(json.loads(msg.data))
+                if resync is not None and resync.done():
+                    task, resync = resync, None
+                    if task.exception() is None:
+                        changed = book.load_snapshot(task.result()) or changed
+                if book.needs_resync and resync is None:
+                    resync = asyncio.create_task(asyncio.to_thread(fetch_snapshot))
+                if changed and on_update:
+                    on_update(book)
+
+
+# ---------- offline replay ----------
+def iter_recorded(path: str) -> Iterator[dict]:
+    """
+    Recorded stream: one JSON object per line. Lines with `lastUpdateId` are REST
+    snapshots, everything else is a depthUpdate event (optionally {"stream", "data"} wrapped).
+    """
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def replay_file(path: str, symbol: str = "") -> OrderBook:
+    book = OrderBook(symbol)
+    for msg in iter_recorded(path):
+        if "lastUpdateId" in msg:
+            book.load_snapshot(msg)
+        else:
+            book.apply(msg)
+    return book
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python -m funding_arb.data.orderbook <recorded.jsonl> [depth]")
+        return
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    book = replay_file(sys.argv[1])
+    bids, asks = book.top(depth)
+    print(f"synced={book.synced} last_update_id={book.last_update_id} "
+          f"applied={book.applied} gaps={book.gaps} resyncs={book.resyncs}")
+    print("bids:", bids)
+    print("asks:", asks)
+    print("depth10:", book.depth_within_bps(10.0))
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,57 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
 DB_URL = os.getenv("DB_URL", "sqlite:///./funding_arb.db")
 
-# echo=False = no SQL spam; future=True = 2.0-style engine
-engine = create_engine(DB_URL, echo=False, future=True)
+# --------- SQLite profile: one writer, many readers (env-overridable) ---------
+SQLITE_JOURNAL_MODE    = os.getenv("SQLITE_JOURNAL_MODE", "WAL")        # readers never block the writer
+SQLITE_SYNCHRONOUS     = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")      # WAL-safe; fsync on checkpoint only
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)) # wait on locks instead of failing
+SQLITE_MMAP_SIZE       = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB   = int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+DB_WRITE_POOL_SIZE     = int(os.getenv("DB_WRITE_POOL_SIZE", 1))        # single writer connection
+DB_READ_POOL_SIZE      = int(os.getenv("DB_READ_POOL_SIZE", 4))
+# -----------------------------------------------------------------------------
+
+_URL = make_url(DB_URL)
+_IS_SQLITE_FILE = _URL.get_backend_name() == "sqlite" and _URL.database not in (None, "", ":memory:")
+
+def _sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if read_only:
+            cur.execute("PRAGMA query_only=ON")
+        else:
+            cur.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")  # persisted in the file
+            cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cur.close()
+    return on_connect
+
+def _read_only_url(url: str) -> str:
+    path = os.path.abspath(make_url(url).database)
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+if _IS_SQLITE_FILE:
+    # echo=False = no SQL spam; future=True = 2.0-style engine
+    engine = create_engine(DB_URL, echo=False, future=True,
+                           pool_size=DB_WRITE_POOL_SIZE, max_overflow=0)
+    event.listen(engine, "connect", _sqlite_pragmas(read_only=False))
+
+    # analytics / report scripts: read-only connections, never take the write lock
+    read_engine = create_engine(_read_only_url(DB_URL), echo=False, future=True,
+                                pool_size=DB_READ_POOL_SIZE, max_overflow=0)
+    event.listen(read_engine, "connect", _sqlite_pragmas(read_only=True))
+else:
+    engine = create_engine(DB_URL, echo=False, future=True)
+    read_engine = engine
 
 # Session factory your code imports as SessionLocal
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
 
 # Declarative base for ORM models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
@@ -1,28 +1,36 @@
-import sqlite3
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from funding_arb.db import read_engine
+from funding_arb.ml.ope import report
 
 def main():
-    con = sqlite3.connect("funding_arb.db")
-    cur = con.cursor()
-    cur.execute("SELECT COUNT(*) FROM bandit_shadow")
-    n = cur.fetchone()[0]
-    print("bandit_shadow rows:", n)
-    if n == 0:
-        print("No shadow data. Run bandit_shadow_demo first.")
-        return
+    with read_engine.connect() as con:
+        n = con.execute(text("SELECT COUNT(*) FROM bandit_shadow")).scalar()
+        print("bandit_shadow rows:", n)
+        if n == 0:
+            print("No shadow data. Run bandit_shadow_demo first.")
+            return
 
-    # Simple sanity: avg baseline cost (bandit learns from it)
-    cur.execute("SELECT AVG(realized_cost_bps) FROM bandit_shadow")
-    avg_cost = cur.fetchone()[0]
-    print(f"Avg baseline realized cost (bps): {avg_cost:.3f}")
+        # Simple sanity: avg baseline cost (bandit learns from it)
+        avg_cost = con.execute(text("SELECT AVG(realized_cost_bps) FROM bandit_shadow")).scalar()
+        print(f"Avg baseline realized cost (bps): {avg_cost:.3f}")
 
-    # Action distribution suggested by bandit
-    print("Bandit suggested action distribution:")
-    for a in (0,1,2,3):
-        cur.execute("SELECT COUNT(*) FROM bandit_shadow WHERE action_bandit=?", (a,))
-        c = cur.fetchone()[0]
-        print(f"  action {a}: {c}")
+        # Action distribution suggested by bandit (one pass)
+        print("Bandit suggested action distribution:")
+        rows = con.execute(text("SELECT action_bandit, COUNT(*), AVG(CASE WHEN action_bandit = action_baseline THEN 1.0 ELSE 0.0 END) "
+                                "FROM bandit_shadow GROUP BY action_bandit ORDER BY action_bandit")).all()
+        counts = {a: c for a, c, _ in rows}
+        for a in (0,1,2,3):
+            print(f"  action {a}: {counts.get(a, 0)}")
+        agree = sum(c * ag for _, c, ag in rows) / n
+        print(f"Agreement with baseline: {agree:.1%}")
 
-    con.close()
+    print()
+    try:
+        report("shadow")
+    except OperationalError as e:
+        print(f"OPE unavailable ({e.orig}); run python -m funding_arb.migrations")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,87 @@
+# funding_arb/eval_counterfactual.py
+"""
+Full-information counterfactual over stored books: every execution action
+simulated on every lob_snapshots row of the last day for one symbol (one
+simulate_all_actions call, seeded), with mean cost per action, how often
+each action is cheapest, and the scalar simulate_fill loop timed on a slice;
+then the same with queue-position maker fills (exec.queue_sim).
+    python -m funding_arb.eval_counterfactual SYMBOL [qty_quote] [side] [seed]
+"""
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from funding_arb.data.book import BookSnapshot
+from funding_arb.db import read_engine
+from funding_arb.exec.baseline import ACTIONS, Intent, simulate_all_actions, simulate_fill
+from funding_arb.exec.queue_sim import replay_all_actions
+from funding_arb.query import fetch_range
+
+ACTION_NAMES = ("maker_inside", "post_only_edge", "taker_now", "wait")
+DAY_MS = 86_400_000
+LOOP_ROWS = 2000  # scalar loop timed on this many snapshots x 4 actions
+
+
+def main():
+    if len(sys.argv) < 2:
+        raise SystemExit(__doc__)
+    symbol = sys.argv[1]
+    qty = float(sys.argv[2]) if len(sys.argv) > 2 else 100.0
+    side = sys.argv[3] if len(sys.argv) > 3 else "buy"
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+
+    with read_engine.connect() as con:
+        t1 = con.execute(text("SELECT MAX(ts_ms) FROM lob_snapshots WHERE symbol = :s"), {"s": symbol}).scalar()
+    if t1 is None:
+        print(f"no lob_snapshots for {symbol}")
+        return
+    lob = fetch_range("lob_snapshots", symbol, t1 - DAY_MS, t1 + 1)
+    n = len(lob["ts_ms"])
+
+    t0 = time.perf_counter()
+    out = simulate_all_actions(side, qty, lob["bid_px"], lob["bid_sz"], lob["ask_px"], lob["ask_sz"],
+                               rng=np.random.default_rng(seed))
+    t_batch = time.perf_counter() - t0
+
+    m = min(LOOP_ROWS, n)
+    books = [BookSnapshot.from_arrays(symbol, lob["ts_ms"][i], lob["bid_px"][i], lob["bid_sz"][i],
+                                      lob["ask_px"][i], lob["ask_sz"][i]) for i in range(m)]
+    intent = Intent(symbol=symbol, side=side, qty=qty)
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    for b in books:
+        for a in ACTIONS:
+            simulate_fill(a, intent, b, b.ts_ms, rng=rng)
+    t_loop = (time.perf_counter() - t0) / m * n
+
+    cost = out["realized_cost_bps"]
+    ok = out["valid"].all(axis=1)
+    print(f"{symbol}: {n} snapshots ({ok.sum()} valid), {side} {qty:g} quote, seed {seed}")
+    print(f"batch {t_batch * 1e3:.1f} ms ({n * len(ACTIONS) / t_batch:,.0f} fills/s); "
+          f"scalar loop ~{t_loop * 1e3:.0f} ms (timed on {m} snapshots)")
+    best = np.bincount(cost[ok].argmin(axis=1), minlength=len(ACTIONS)) / max(ok.sum(), 1)
+    for j, name in enumerate(ACTION_NAMES):
+        c = cost[ok, j]
+        print(f"  {name:15s} mean {c.mean():8.3f} bps  p95 {np.percentile(c, 95) if len(c) else np.nan:8.3f}  "
+              f"cheapest {best[j]:6.1%}  partial {out['partial_fill'][ok, j].mean():6.1%}  "
+              f"fill ms {out['time_to_fill_ms'][ok, j].mean():6.0f}")
+
+
+    t0 = time.perf_counter()
+    q = replay_all_actions(lob, np.arange(n), side, qty)
+    t_queue = time.perf_counter() - t0
+    cost = q["realized_cost_bps"]
+    ok = ~np.isnan(cost).any(axis=1)
+    best = np.bincount(cost[ok].argmin(axis=1), minlength=len(ACTIONS)) / max(ok.sum(), 1)
+    print(f"queue-position makers (replayed in {t_queue * 1e3:.0f} ms):")
+    for j, name in enumerate(ACTION_NAMES):
+        c = cost[ok, j]
+        print(f"  {name:15s} mean {c.mean():8.3f} bps  p95 {np.percentile(c, 95) if len(c) else np.nan:8.3f}  "
+              f"cheapest {best[j]:6.1%}  partial {q['partial_fill'][ok, j].mean():6.1%}  "
+              f"fill ms {q['time_to_fill_ms'][ok, j].mean():6.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,33 @@
-import sqlite3
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from funding_arb.db import read_engine
+from funding_arb.ml.ope import report
 
 def main():
-    con = sqlite3.connect("funding_arb.db")
-    cur = con.cursor()
-    cur.execute("SELECT COUNT(*) FROM exec_outcomes")
-    n = cur.fetchone()[0]
-    print("rows in exec_outcomes:", n)
-    if n == 0:
-        print("No data yet. Run exec_demo first.")
-        return
+    with read_engine.connect() as con:
+        n = con.execute(text("SELECT COUNT(*) FROM exec_outcomes")).scalar()
+        print("rows in exec_outcomes:", n)
+        if n == 0:
+            print("No data yet. Run exec_demo first.")
+            return
+
+        # avg cost per action (one pass)
+        print("\nAverage realized execution cost (bps) by action:")
+        print("0=maker_inside, 1=post_only_edge, 2=taker_now, 3=wait")
+        rows = con.execute(text("SELECT action, COUNT(*), AVG(realized_cost_bps) FROM exec_outcomes "
+                                "GROUP BY action ORDER BY action")).all()
+        stats = {a: (c, avg) for a, c, avg in rows}
+        for a in (0,1,2,3):
+            c, avg = stats.get(a, (0, None))
+            print(f"action {a}: {avg:.3f} bps (n={c})" if avg is not None else f"action {a}: no samples")
 
-    # avg cost per action
-    print("\nAverage realized execution cost (bps) by action:")
-    print("0=maker_inside, 1=post_only_edge, 2=taker_now, 3=wait")
-    for a in (0,1,2,3):
-        cur.execute("SELECT AVG(realized_cost_bps) FROM exec_outcomes WHERE action=?", (a,))
-        avg = cur.fetchone()[0]
-        print(f"action {a}: {avg:.3f} bps" if avg is not None else f"action {a}: no samples")
-    con.close()
+    # would another policy have done better? (needs rows logged with context + propensity)
+    print()
+    try:
+        report("exec")
+    except OperationalError as e:
+        print(f"OPE unavailable ({e.orig}); run python -m funding_arb.migrations")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,54 +1,134 @@
 import time
+from typing import Mapping
+
 import numpy as np
+
+from funding_arb.data.book import BookSnapshot
 from funding_arb.exec.baseline import Intent, simulate_fill
 from funding_arb.models import ExecOutcome
-from funding_arb.ml.bandit import LinTS
-from funding_arb.ml.features import FeatureBuilder
+from funding_arb.ml.bandit import BanditBank, LinTS
+from funding_arb.ml.features import FeatureBuilder, exec_context
+from funding_arb.ml.warm_start import BANDIT_CKPT_EVERY, checkpoint_path, restore_bandit, restore_bank
+
+PROPENSITY_SAMPLES = 1000  # Monte Carlo draws for the logged propensity of the chosen action
 
 class BanditExecutor:
-    def __init__(self):
+    def __init__(self, feature_store=None, checkpoint: str | None = "exec_v2", seed: int | None = None):
         self.fb = FeatureBuilder()
-        self.bandit = LinTS(d=8, actions=[0,1,2,3])
+        self.feature_store = feature_store  # optional FeatureStore over EXEC_FEATURE_COLUMNS
+        # checkpoint name: resume from ./checkpoints/bandit_<name>.npz, else warm start from exec_outcomes
+        # (_v2: posteriors from before post_only_edge was repriced are not resumed)
+        self.checkpoint = checkpoint
+        if checkpoint:
+            self.bandit = restore_bandit(checkpoint, "exec", d=8, actions=[0,1,2,3], seed=seed)
+        else:
+            self.bandit = LinTS(d=8, actions=[0,1,2,3], seed=seed)
+        self.sim_rng = np.random.default_rng(None if seed is None else (seed, 1))  # simulate_fill draws, own stream
         self.last_action = 0
+        self._since_ckpt = 0
+
+    def save_checkpoint(self):
+        if self.checkpoint:
+            self.bandit.save(checkpoint_path(self.checkpoint))
+            self._since_ckpt = 0
 
     def _as_vec(self, feats):
-        x = np.array([
-            feats.spread_bp,
-            feats.mid_return_1s,
-            feats.mid_return_5s,
-            feats.vol_proxy_5s,
-            feats.depth_imb_top5,
-            feats.last_action,
-            feats.time_of_day_sin,
-            feats.time_of_day_cos,
-        ], dtype=float).reshape(-1, 1)
-        # normalize
-        x[0] /= 10.0; x[1] /= 10.0; x[2] /= 10.0; x[3] /= 10.0
-        return x
-
-    def decide_and_execute(self, lob, symbol, side="buy", deadline_ms=500):
-        bid_px = [px for px, _ in lob["bids"]]
-        ask_px = [px for px, _ in lob["asks"]]
-        bid_sz = [sz for _, sz in lob["bids"]]
-        ask_sz = [sz for _, sz in lob["asks"]]
+        return exec_context(feats)
+
+    def decide_and_execute(self, lob: BookSnapshot, symbol, side="buy", deadline_ms=500):
         ts_ms = int(time.time() * 1000)
 
-        feats = self.fb.push_and_compute(ts_ms, bid_px, ask_px, bid_sz, ask_sz, last_action=self.last_action)
+        feats = self.fb.push_book(lob, last_action=self.last_action, ts_ms=ts_ms)
         if not feats:
             return None, None, None  # no features yet
+        if self.feature_store is not None:
+            self.feature_store.append(symbol, ts_ms, feats)
 
         x = self._as_vec(feats)
         action = self.bandit.choose(x)
+        probs = self.bandit.action_probs(x, PROPENSITY_SAMPLES)
+        propensity = max(float(probs[self.bandit.actions.index(action)]), 1.0 / PROPENSITY_SAMPLES)
 
         intent = Intent(symbol=symbol, side=side, qty=100.0, deadline_ms=deadline_ms)
-        sim = simulate_fill(action, intent, lob, ts_ms)
+        sim = simulate_fill(action, intent, lob, ts_ms, rng=self.sim_rng)
         if sim is None:
             return None, None, None
+        # decision-time logging for offline evaluation (outcome_log.log_outcome stores both)
+        sim["context"] = x.ravel()
+        sim["propensity"] = propensity
 
         # reward: negative cost
         reward = -sim["realized_cost_bps"]
         self.bandit.update(action, x, reward)
         self.last_action = action
+        self._since_ckpt += 1
+        if self._since_ckpt >= BANDIT_CKPT_EVERY:
+            self.save_checkpoint()
 
         # return outcome row
-        return action, ts_ms, sim
\ No newline at end of file
+        return action, ts_ms, sim
+
+
+class BanditBankExecutor:
+    """
+    BanditExecutor over many symbols: one FeatureBuilder per symbol, one
+    BanditBank for all of them, so a tick is one choose and one update call
+    whatever the size of the universe. `share` is the bank's partial pooling.
+    """
+    def __init__(self, feature_store=None, checkpoint: str | None = "exec_bank_v2", share: float = 0.0,
+                 seed: int | None = None):
+        self.fbs: dict[str, FeatureBuilder] = {}
+        self.feature_store = feature_store
+        self.checkpoint = checkpoint
+        if checkpoint:
+            self.bank = restore_bank(checkpoint, "exec", d=8, actions=[0,1,2,3], share=share, seed=seed)
+        else:
+            self.bank = BanditBank(d=8, actions=[0,1,2,3], share=share, seed=seed)
+        self.sim_rng = np.random.default_rng(None if seed is None else (seed, 1))
+        self.last_action: dict[str, int] = {}
+        self._since_ckpt = 0
+
+    def save_checkpoint(self):
+        if self.checkpoint:
+            self.bank.save(checkpoint_path(self.checkpoint))
+            self._since_ckpt = 0
+
+    def decide_and_execute_many(self, books: Mapping[str, BookSnapshot], side="buy", deadline_ms=500) -> dict:
+        """{symbol: (action, ts_ms, sim)} for the symbols that had features and a simulated fill."""
+        ts_ms = int(time.time() * 1000)
+        symbols, rows = [], []
+        for symbol, lob in books.items():
+            fb = self.fbs.setdefault(symbol, FeatureBuilder())
+            feats = fb.push_book(lob, last_action=self.last_action.get(symbol, 0), ts_ms=ts_ms)
+            if not feats:
+                continue
+            if self.feature_store is not None:
+                self.feature_store.append(symbol, ts_ms, feats)
+            symbols.append(symbol)
+            rows.append(exec_context(feats).ravel())
+        if not symbols:
+            return {}
+
+        X = np.stack(rows)
+        actions = self.bank.choose(symbols, X).tolist()
+        probs = self.bank.action_probs(symbols, X, PROPENSITY_SAMPLES)
+
+        out, upd = {}, []
+        for j, (symbol, action) in enumerate(zip(symbols, actions)):
+            intent = Intent(symbol=symbol, side=side, qty=100.0, deadline_ms=deadline_ms)
+            sim = simulate_fill(action, intent, books[symbol], ts_ms, rng=self.sim_rng)
+            if sim is None:
+                continue
+            sim["context"] = X[j]
+            sim["propensity"] = max(float(probs[j, self.bank.actions.index(action)]), 1.0 / PROPENSITY_SAMPLES)
+            self.last_action[symbol] = action
+            out[symbol] = (action, ts_ms, sim)
+            upd.append(j)
+
+        if upd:
+            self.bank.update([symbols[j] for j in upd], [actions[j] for j in upd], X[upd],
+                             [-out[symbols[j]][2]["realized_cost_bps"] for j in upd])
+            self._since_ckpt += 1
+            if self._since_ckpt >= BANDIT_CKPT_EVERY:
+                self.save_checkpoint()
+        return out
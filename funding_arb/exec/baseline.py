@@ -1,6 +1,21 @@
-import time
+import os
 from dataclasses import dataclass
 
+import numpy as np
+
+from funding_arb.data.book import BookSnapshot
+
+ACTIONS = (0, 1, 2, 3)                   # maker_inside, post_only_edge, taker_now, wait
+MAKER_FILL_PROB = {0: 0.5, 1: 0.3}       # chance the maker order is hit before the deadline
+MAKER_INSIDE = {0: 0.5, 1: 0.0}          # fraction of the spread the maker order improves on its own touch
+MAKER_FILL_MS = 250
+WAIT_COST_BPS = 0.1
+SIM_SEED = os.getenv("SIM_SEED")         # fixed seed makes the default simulator RNG reproducible
+# post_only_edge was simulated at the opposite touch before this time (UTC ms); those rows are not comparable
+POST_ONLY_REPRICED_MS = int(os.getenv("POST_ONLY_REPRICED_MS", 1792224600000))
+
+_rng = np.random.default_rng(None if SIM_SEED is None else int(SIM_SEED))
+
 @dataclass
 class Intent:
     symbol: str
@@ -8,15 +23,14 @@ class Intent:
     qty: float      # notional units in quote, simplified
     deadline_ms: int = 1000  # must fill within 1s or we cross
 
-def best_prices(lob):
-    bid = lob["bids"][0][0] if lob["bids"] else None
-    ask = lob["asks"][0][0] if lob["asks"] else None
-    mid = (bid + ask) / 2.0 if bid and ask else None
-    return bid, ask, mid
+def best_prices(lob: BookSnapshot):
+    return lob.best_bid, lob.best_ask, lob.mid
 
-def simulate_fill(action:int, intent: Intent, lob, start_ts_ms:int):
+def simulate_fill(action:int, intent: Intent, lob: BookSnapshot, start_ts_ms:int,
+                  rng: np.random.Generator | None = None):
     """
-    Simulate execution cost vs current LOB.
+    Simulate execution cost vs current LOB (top of book; simulate_fill_batch walks depth).
+    rng: source of the maker fill draw; the module RNG (seeded by SIM_SEED) if None.
     action: 0 maker_inside, 1 post_only_edge, 2 taker_now, 3 wait
     - maker_inside: place post-only inside the spread; assume 50% chance to get hit within deadline
     - post_only_edge: post at best bid/ask; 30% chance to get hit within deadline
@@ -41,18 +55,18 @@ def simulate_fill(action:int, intent: Intent, lob, start_ts_ms:int):
             return None
     elif action in (0, 1):  # maker variants
         # assume probabilistic fill within deadline; if not filled, cross at deadline
-        prob = 0.5 if action == 0 else 0.3
-        filled_maker = (time.time_ns() % 1000) / 1000.0 < prob  # pseudo randomness
+        prob = MAKER_FILL_PROB[action]
+        filled_maker = (rng or _rng).random() < prob
         if filled_maker:
-            # maker price a tick inside for maker_inside; at edge for post_only_edge
+            # maker price inside the spread for maker_inside; at our own touch for post_only_edge
             if intent.side == "buy":
-                # maker buy posts below ask
-                px = ask - (ask - bid) * (0.5 if action == 0 else 0.0)
+                # maker buy posts at or above the best bid
+                px = bid + (ask - bid) * MAKER_INSIDE[action]
             else:
-                # maker sell posts above bid
-                px = bid + (ask - bid) * (0.5 if action == 0 else 0.0)
+                # maker sell posts at or below the best ask
+                px = ask - (ask - bid) * MAKER_INSIDE[action]
             fill_px = px
-            time_to_fill_ms = min(intent.deadline_ms, 250)
+            time_to_fill_ms = min(intent.deadline_ms, MAKER_FILL_MS)
         else:
             # missed maker fill, cross at deadline
             time_to_fill_ms = intent.deadline_ms
@@ -73,13 +87,13 @@ def simulate_fill(action:int, intent: Intent, lob, start_ts_ms:int):
 
     if fill_px is None:
         # waiting: penalize tiny amount (e.g., 0.1 bps)
-        realized_cost_bps = 0.1
+        realized_cost_bps = WAIT_COST_BPS
         return {
             "fill_px": bench_mid_px,  # treat as no improvement
             "bench_mid_px": bench_mid_px,
             "fee_bps": fee_bps,
             "partial_fill": partial_fill,
-            "time_to_fill_ms": 250,
+            "time_to_fill_ms": MAKER_FILL_MS,
             "realized_cost_bps": realized_cost_bps,
         }
 
@@ -98,4 +112,118 @@ def simulate_fill(action:int, intent: Intent, lob, start_ts_ms:int):
         "partial_fill": partial_fill,
         "time_to_fill_ms": int(time_to_fill_ms),
         "realized_cost_bps": float(realized_cost_bps),
-    }
\ No newline at end of file
+    }
+
+
+def _sweep(px: np.ndarray, sz: np.ndarray, qty: np.ndarray):
+    """
+    Take `qty` quote notional from one side, level by level ((n, depth), NaN
+    padded). Returns (vwap, filled notional); vwap is NaN on an empty side.
+    """
+    px, sz = np.nan_to_num(px), np.nan_to_num(sz)
+    n, depth = px.shape
+    cum_nt = np.zeros((n, depth + 1))
+    cum_sz = np.zeros((n, depth + 1))
+    np.cumsum(px * sz, axis=1, out=cum_nt[:, 1:])
+    np.cumsum(sz, axis=1, out=cum_sz[:, 1:])
+    k = (cum_nt[:, 1:] < qty[:, None]).sum(axis=1)            # levels taken whole
+    rows = np.arange(n)
+    filled = np.minimum(qty, cum_nt[:, -1])
+    rest_px = px[rows, np.minimum(k, depth - 1)] if depth else np.zeros(n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        base = cum_sz[rows, k] + np.where(k < depth, (filled - cum_nt[rows, k]) / rest_px, 0.0)
+        vwap = filled / base
+    return vwap, filled
+
+
+def _book_terms(buy: np.ndarray, qty: np.ndarray, bid_px, bid_sz, ask_px, ask_sz):
+    """Per-snapshot touch, mid and the sweep for qty on the side a cross takes: (bid, ask, mid, cross_px, filled)."""
+    n = len(bid_px)
+    bid = bid_px[:, 0] if bid_px.shape[1] else np.full(n, np.nan)
+    ask = ask_px[:, 0] if ask_px.shape[1] else np.full(n, np.nan)
+    mid = (bid + ask) / 2.0
+    # crossing: buys lift the asks, sells hit the bids
+    cross_px, filled = np.empty(n), np.empty(n)
+    for take, px, sz in ((buy, ask_px, ask_sz), (~buy, bid_px, bid_sz)):
+        if take.all():
+            cross_px[:], filled[:] = _sweep(px, sz, qty)
+        elif take.any():
+            cross_px[take], filled[take] = _sweep(px[take], sz[take], qty[take])
+    return bid, ask, mid, cross_px, filled
+
+
+def _action_terms(actions, buy, qty, deadline_ms, u, terms, fee_bps: float) -> dict:
+    """Outcome arrays for `actions`, which broadcast against the per-snapshot arrays (n,) or (n, 1)."""
+    bid, ask, mid, cross_px, filled = terms
+    maker = (actions == 0) | (actions == 1)
+    prob = np.where(actions == 0, MAKER_FILL_PROB[0], MAKER_FILL_PROB[1])
+    inside = np.where(actions == 0, MAKER_INSIDE[0], MAKER_INSIDE[1])
+    hit = maker & (u < prob)
+    maker_px = np.where(buy, bid + (ask - bid) * inside, ask - (ask - bid) * inside)
+
+    wait = actions == 3
+    fill_px = np.where(hit, maker_px, np.where(wait, mid, cross_px))
+    filled = np.where(hit | wait, qty, filled)
+    time_to_fill_ms = np.where(hit, np.minimum(deadline_ms, MAKER_FILL_MS),
+                               np.where(wait, MAKER_FILL_MS, np.where(maker, deadline_ms, 0)))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        impact = np.where(buy, fill_px - mid, mid - fill_px) / mid
+        cost = np.where(wait, WAIT_COST_BPS, impact * 1e4 + fee_bps)
+        filled_frac = np.where(qty > 0, filled / qty, 1.0)
+    valid = (mid != 0) & ~np.isnan(mid) & np.isin(actions, ACTIONS) & (wait | ~np.isnan(fill_px))
+    return {
+        "fill_px": fill_px,
+        "bench_mid_px": np.broadcast_to(mid, fill_px.shape),
+        "realized_cost_bps": np.where(valid, cost, np.nan),
+        "time_to_fill_ms": time_to_fill_ms,
+        "filled_frac": filled_frac,
+        "partial_fill": (valid & (filled_frac < 1.0)).astype(np.int64),
+        "valid": valid,
+    }
+
+
+def _batch_inputs(sides, qty, deadline_ms, bid_px, bid_sz, ask_px, ask_sz):
+    bid_px, bid_sz = np.atleast_2d(np.asarray(bid_px, dtype=np.float64)), np.atleast_2d(np.asarray(bid_sz, dtype=np.float64))
+    ask_px, ask_sz = np.atleast_2d(np.asarray(ask_px, dtype=np.float64)), np.atleast_2d(np.asarray(ask_sz, dtype=np.float64))
+    n = len(bid_px)
+    buy = np.broadcast_to(np.asarray(sides) == "buy", (n,))
+    qty = np.broadcast_to(np.asarray(qty, dtype=np.float64), (n,))
+    deadline_ms = np.broadcast_to(np.asarray(deadline_ms, dtype=np.int64), (n,))
+    return n, buy, qty, deadline_ms, _book_terms(buy, qty, bid_px, bid_sz, ask_px, ask_sz)
+
+
+def simulate_fill_batch(actions, sides, qty, bid_px, bid_sz, ask_px, ask_sz, deadline_ms=1000,
+                        rng: np.random.Generator | None = None, u: np.ndarray | None = None,
+                        fee_bps: float = 0.0) -> dict:
+    """
+    simulate_fill over n snapshots at once: books are (n, depth) arrays (bids
+    descending, asks ascending, NaN padded, as fetch_range returns them),
+    actions / sides ("buy"/"sell") / qty (quote notional) / deadline_ms (n,)
+    or scalars. Crossing sweeps the book for qty instead of taking the touch;
+    maker orders fill whole at their price with MAKER_FILL_PROB, else cross at
+    the deadline. u: the uniform per row behind the maker draws (from rng if None).
+    Returns (n,) arrays: fill_px, bench_mid_px, realized_cost_bps, time_to_fill_ms,
+    filled_frac, partial_fill (1 when the book ran out) and valid (False where
+    simulate_fill would return None).
+    """
+    n, buy, qty, deadline_ms, terms = _batch_inputs(sides, qty, deadline_ms, bid_px, bid_sz, ask_px, ask_sz)
+    actions = np.broadcast_to(np.asarray(actions), (n,))
+    u = (rng or _rng).random(n) if u is None else np.asarray(u, dtype=np.float64)
+    return _action_terms(actions, buy, qty, deadline_ms, u, terms, fee_bps)
+
+
+def simulate_all_actions(sides, qty, bid_px, bid_sz, ask_px, ask_sz, deadline_ms=1000,
+                         rng: np.random.Generator | None = None, fee_bps: float = 0.0) -> dict:
+    """
+    Full-information counterfactual: every action on every snapshot, (n, 4)
+    arrays keyed like simulate_fill_batch. The book is swept once per snapshot
+    and one uniform per snapshot is shared by the maker actions (common random
+    numbers), so a maker_inside miss is also a post_only_edge miss and action
+    differences carry less noise.
+    """
+    n, buy, qty, deadline_ms, terms = _batch_inputs(sides, qty, deadline_ms, bid_px, bid_sz, ask_px, ask_sz)
+    u = (rng or _rng).random(n)
+    col = lambda a: a[:, None]
+    return _action_terms(np.asarray(ACTIONS)[None, :], col(buy), col(qty), col(deadline_ms), col(u),
+                         tuple(map(col, terms)), fee_bps)
@@ -1,6 +1,6 @@
-import ccxt
 import os, math
 from dotenv import load_dotenv
+from funding_arb.data.clients import get_client
 
 load_dotenv()
 
@@ -8,15 +8,8 @@ API_KEY = os.getenv("BINANCE_USDM_API_KEY")
 API_SECRET = os.getenv("BINANCE_USDM_API_SECRET")
 
 def _ex():
-    ex = ccxt.binanceusdm({
-        "apiKey": API_KEY,
-        "secret": API_SECRET,
-        "enableRateLimit": True,
-        "options": {"defaultType": "future"},
-    })
-    ex.set_sandbox_mode(True)
-    ex.load_markets()
-    return ex
+    # shared with the trader; no rebuild / markets reload per call
+    return get_client("binanceusdm", sandbox=True, api_key=API_KEY, secret=API_SECRET)
 
 def flatten_symbol(symbol: str):
     ex = _ex()
@@ -0,0 +1,426 @@
+# funding_arb/exec/order_manager.py
+"""
+Non-blocking order lifecycle. OrderManager runs an asyncio loop in a
+background thread; callers get concurrent.futures.Future results and keep
+ticking. Each order is a small state machine:
+  NEW -> OPEN -> FILLED
+              -> (deadline) CANCELING -> CANCELED [-> CROSSING -> FILLED]
+  NEW -> REJECTED / ERROR
+State comes from one fetch_open_orders per symbol per poll (not a
+fetch_order per order), plus fetch_order once when an order leaves the open
+set; a user-data-stream adapter can push order dicts through on_update()
+instead. Deadlines are scheduled tasks, so a maker attempt never holds the
+caller. The venue is anything with ccxt's create_order / cancel_order /
+fetch_order / fetch_open_orders (a ccxt client, or FakeExchange below).
+    python -m funding_arb.exec.order_manager [orders] [latency_ms]
+"""
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+OM_POLL_MS      = int(os.getenv("OM_POLL_MS", 250))       # fetch_open_orders cadence per symbol
+OM_REST_WORKERS = int(os.getenv("OM_REST_WORKERS", 4))    # concurrent REST calls to the venue
+
+NEW, OPEN, FILLED, CANCELING, CANCELED, CROSSING, REJECTED, ERROR = (
+    "new", "open", "filled", "canceling", "canceled", "crossing", "rejected", "error")
+DONE = (FILLED, REJECTED, ERROR)
+
+
+@dataclass
+class ManagedOrder:
+    client_id: int
+    symbol: str
+    side: str
+    qty: float
+    price: Optional[float]          # None for market
+    reduce_only: bool
+    deadline_at: float              # time.time() after which a maker rests no longer
+    mid: Optional[float] = None     # decision-time mid, passed through to the result
+    state: str = NEW
+    order_id: Optional[str] = None
+    filled: float = 0.0
+    average: Optional[float] = None
+    unpriced: bool = False          # a market fill priced at the decision mid: no venue price, no book
+    cross_order: Optional[dict] = None
+    order: Optional[dict] = None
+    error: Optional[str] = None
+    history: List[tuple] = field(default_factory=list)    # (time, state)
+    future: Future = field(default_factory=Future)
+    _closed: Optional[asyncio.Event] = None
+
+    def to(self, state: str):
+        self.state = state
+        self.history.append((time.time(), state))
+
+
+def _market_params(reduce_only: bool) -> dict:
+    return {"reduceOnly": reduce_only}
+
+
+def _post_only_params(reduce_only: bool) -> dict:
+    return {"postOnly": True, "timeInForce": "GTX", "reduceOnly": reduce_only}
+
+
+class OrderManager:
+    def __init__(self, venue, poll_ms: int = OM_POLL_MS, workers: int = OM_REST_WORKERS):
+        self.venue = venue
+        self.poll_s = poll_ms / 1000.0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="om-rest")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._ids = itertools.count(1)
+        self.orders: Dict[int, ManagedOrder] = {}
+        self._by_venue_id: Dict[str, ManagedOrder] = {}
+        self.requests = 0
+        self.errors = 0
+
+    # ---------- lifecycle ----------
+    def start(self) -> "OrderManager":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="order-manager", daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stop polling; orders still in flight are abandoned (their futures stay pending)."""
+        if self._loop is not None and self._thread is not None and self._thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=False)
+
+    async def _shutdown(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop.stop()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.create_task(self._poller())
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def run(self, coro) -> Future:
+        """Schedule a coroutine on the manager loop from any thread."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def call(self, fn, *args):
+        """A blocking venue call on the REST pool, counted."""
+        self.requests += 1
+        try:
+            return await self._loop.run_in_executor(self._pool, fn, *args)
+        except Exception:
+            self.errors += 1
+            raise
+
+    # ---------- public ----------
+    def submit(self, symbol: str, side: str, qty: float, price: Optional[float] = None,
+               deadline_ms: int = 800, reduce_only: bool = False, mid: Optional[float] = None) -> Future:
+        """
+        Post-only limit at `price` (crossed at market after `deadline_ms` if not
+        filled), or a market order when price is None. The future resolves to
+        {"status", "price", "order", "mid", "filled"} like execute_action.
+        """
+        o = self.new_order(symbol, side, qty, price, deadline_ms, reduce_only, mid)
+        self.run(self.place(o))
+        return o.future
+
+    def on_update(self, order: dict):
+        """Push an order update (ccxt order dict) from a user-data stream; thread-safe."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._apply, order)
+
+    def open_orders(self) -> List[ManagedOrder]:
+        return [o for o in list(self.orders.values()) if o.state not in DONE]
+
+    def new_order(self, symbol: str, side: str, qty: float, price: Optional[float] = None, deadline_ms: int = 800,
+                  reduce_only: bool = False, mid: Optional[float] = None) -> ManagedOrder:
+        """Register an order without placing it; `await place(o)` on the manager loop runs it."""
+        o = ManagedOrder(client_id=next(self._ids), symbol=symbol, side=side, qty=float(qty),
+                         price=None if price is None else float(price), reduce_only=reduce_only,
+                         deadline_at=time.time() + deadline_ms / 1000.0, mid=mid)
+        o.to(NEW)
+        self.orders[o.client_id] = o
+        return o
+
+    # ---------- state machine (manager loop) ----------
+    async def place(self, o: ManagedOrder) -> dict:
+        """Run one order to completion on the manager loop; also resolves o.future."""
+        o._closed = asyncio.Event()
+        try:
+            if o.price is None:
+                await self._market(o, o.qty)
+            else:
+                await self._maker(o)
+        except Exception as e:
+            o.error = str(e)
+            o.to(ERROR)
+        res = self._result(o)
+        if not o.future.done():
+            o.future.set_result(res)
+        return res
+
+    async def _maker(self, o: ManagedOrder):
+        try:
+            placed = await self.call(self.venue.create_order, o.symbol, "limit", o.side, o.qty, o.price,
+                                     _post_only_params(o.reduce_only))
+        except Exception as e:
+            o.error = str(e)
+            o.to(REJECTED)
+            return
+        o.order = placed
+        o.order_id = str(placed["id"])
+        self._by_venue_id[o.order_id] = o
+        o.to(OPEN)
+        self._apply(placed)
+
+        # rest until filled or the deadline
+        if o.state == OPEN:
+            try:
+                await asyncio.wait_for(o._closed.wait(), max(o.deadline_at - time.time(), 0.0))
+            except asyncio.TimeoutError:
+                pass
+        if o.state == FILLED:
+            return
+
+        if o.state == OPEN:
+            o.to(CANCELING)
+            try:
+                await self.call(self.venue.cancel_order, o.order_id, o.symbol)
+            except Exception:
+                pass  # filled or gone meanwhile: the final fetch below says which
+            try:
+                self._apply(await self.call(self.venue.fetch_order, o.order_id, o.symbol))
+            except Exception:
+                pass
+        if o.state == FILLED:
+            return
+        o.to(CANCELED)
+        rest = o.qty - o.filled
+        if rest > 0:
+            o.to(CROSSING)
+            await self._market(o, rest)
+
+    async def _market(self, o: ManagedOrder, qty: float):
+        placed = await self.call(self.venue.create_order, o.symbol, "market", o.side, qty, None,
+                                 _market_params(o.reduce_only))
+        info = placed
+        if not placed.get("average"):
+            try:
+                info = await self.call(self.venue.fetch_order, str(placed["id"]), o.symbol)
+            except Exception:
+                pass
+        # no "filled" at all: assume the whole market order; a reported 0 (expired/rejected) is no fill
+        got = qty if info.get("filled") is None else float(info["filled"])
+        if o.price is None:
+            o.order = placed
+        else:
+            o.cross_order = placed
+        if not got:
+            if not o.filled:
+                o.error = f"market order not filled ({info.get('status')})"
+                o.to(ERROR)
+                return
+            o.to(FILLED)   # the maker part stands
+            return
+        # the venue filled it whether or not it reported a price: always count the quantity
+        px = info.get("average") or info.get("price") or await self._fallback_px(o)
+        if px:
+            # VWAP of the maker part and the crossed remainder
+            maker_nt = o.filled * (o.average or 0.0)
+            o.average = (maker_nt + got * float(px)) / (o.filled + got)
+        o.filled += got
+        o.to(FILLED)
+
+    async def _fallback_px(self, o: ManagedOrder) -> Optional[float]:
+        """
+        Price for a market fill the venue did not report: the touch it crossed
+        (ask for a buy, bid for a sell). Without a book, the decision mid with
+        o.unpriced set, so the fill is booked but not logged as a cost.
+        """
+        try:
+            ob = await self.call(self.venue.fetch_order_book, o.symbol, 5)
+            return ob["asks"][0][0] if o.side == "buy" else ob["bids"][0][0]
+        except Exception:
+            o.unpriced = True
+            return o.mid or o.price
+
+    def _apply(self, info: dict):
+        """Fold a venue order dict into its ManagedOrder (poll result or stream push)."""
+        o = self._by_venue_id.get(str(info.get("id")))
+        if o is None or o.state in DONE or o.state == CROSSING:
+            return
+        filled = float(info.get("filled") or 0.0)
+        if filled > o.filled:
+            o.filled = filled
+            o.average = float(info.get("average") or info.get("price") or o.price)
+        status = info.get("status")
+        if o.filled >= o.qty * (1 - 1e-9) or (status == "closed" and o.filled > 0):
+            o.to(FILLED)
+            o._closed.set()
+        elif status in ("canceled", "expired", "rejected"):
+            if o.state == OPEN:
+                o.to(CANCELED if o.filled or status == "canceled" else REJECTED)
+            o._closed.set()
+
+    async def _poller(self):
+        """One fetch_open_orders per symbol with resting orders; fetch_order for the ones that left."""
+        while True:
+            await asyncio.sleep(self.poll_s)
+            resting: Dict[str, List[ManagedOrder]] = {}
+            for o in list(self.orders.values()):    # callers add orders from their own thread
+                if o.state == OPEN and o.order_id is not None:
+                    resting.setdefault(o.symbol, []).append(o)
+            for symbol, orders in resting.items():
+                try:
+                    open_now = await self.call(self.venue.fetch_open_orders, symbol)
+                except Exception:
+                    continue
+                seen = set()
+                for info in open_now:
+                    seen.add(str(info.get("id")))
+                    self._apply(info)
+                gone = [o for o in orders if o.order_id not in seen and o.state == OPEN]
+                infos = await asyncio.gather(*(self.call(self.venue.fetch_order, o.order_id, symbol) for o in gone),
+                                             return_exceptions=True)
+                for info in infos:
+                    if isinstance(info, dict):
+                        self._apply(info)
+            # forget finished orders after a while
+            cutoff = time.time() - 60.0
+            for cid in [c for c, o in list(self.orders.items()) if o.state in DONE and o.history[-1][0] < cutoff]:
+                o = self.orders.pop(cid)
+                self._by_venue_id.pop(o.order_id, None)
+
+    def _result(self, o: ManagedOrder) -> dict:
+        if o.state == FILLED:
+            status = "filled" if o.cross_order is None else "filled_after_cross"
+            order = o.order if o.cross_order is None else o.cross_order
+            return {"status": status, "price": o.average, "order": order, "mid": o.mid, "filled": o.filled,
+                    "unpriced": o.unpriced}
+        if o.state == REJECTED:
+            return {"status": f"order_error: {o.error}", "price": None, "order": None, "mid": o.mid, "filled": 0.0}
+        err = "cross_error" if o.order_id else "order_error"   # the maker leg was placed before it failed
+        return {"status": f"{err}: {o.error}", "price": None, "order": None, "mid": o.mid, "filled": o.filled}
+
+
+class FakeExchange:
+    """
+    In-memory venue with ccxt's order methods, for exercising OrderManager
+    without a network. Each call sleeps `latency_ms`. Resting limit orders fill
+    when trade(symbol, px) prints through them; market orders fill at the touch.
+    """
+    def __init__(self, bid: float = 100.0, ask: float = 100.1, latency_ms: float = 50.0):
+        self.latency_s = latency_ms / 1000.0
+        self.books: Dict[str, tuple] = {}
+        self.default = (bid, ask)
+        self.orders: Dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+
+    def _call(self, name: str):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        time.sleep(self.latency_s)
+
+    def set_book(self, symbol: str, bid: float, ask: float):
+        with self._lock:
+            self.books[symbol] = (bid, ask)
+
+    def trade(self, symbol: str, px: float):
+        """A print at px fills resting buys at >= px and sells at <= px."""
+        with self._lock:
+            for o in self.orders.values():
+                if o["symbol"] == symbol and o["status"] == "open" and \
+                        (o["price"] >= px if o["side"] == "buy" else o["price"] <= px):
+                    o.update(status="closed", filled=o["amount"], average=o["price"])
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        self._call("create_order")
+        with self._lock:
+            bid, ask = self.books.get(symbol, self.default)
+            oid = str(next(self._ids))
+            o = {"id": oid, "symbol": symbol, "type": type, "side": side, "amount": float(amount),
+                 "price": price, "status": "open", "filled": 0.0, "average": None}
+            if type == "market":
+                px = ask if side == "buy" else bid
+                o.update(status="closed", filled=float(amount), average=px, price=px)
+            elif (params or {}).get("postOnly") and (price >= ask if side == "buy" else price <= bid):
+                raise ValueError("post-only order would cross")   # Binance GTX rejection
+            self.orders[oid] = o
+            return dict(o)
+
+    def cancel_order(self, id, symbol=None):
+        self._call("cancel_order")
+        with self._lock:
+            o = self.orders[id]
+            if o["status"] == "open":
+                o["status"] = "canceled"
+            return dict(o)
+
+    def fetch_order(self, id, symbol=None):
+        self._call("fetch_order")
+        with self._lock:
+            return dict(self.orders[id])
+
+    def fetch_order_book(self, symbol, limit=None):
+        self._call("fetch_order_book")
+        with self._lock:
+            bid, ask = self.books.get(symbol, self.default)
+            return {"bids": [[bid, 1e9]], "asks": [[ask, 1e9]]}
+
+    def fetch_open_orders(self, symbol=None):
+        self._call("fetch_open_orders")
+        with self._lock:
+            return [dict(o) for o in self.orders.values()
+                    if o["status"] == "open" and (symbol is None or o["symbol"] == symbol)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+    deadline_ms = 800
+    symbol = "FAKE/USDT:USDT"
+    ex = FakeExchange(latency_ms=latency_ms)
+    om = OrderManager(ex).start()
+
+    # n bids that get printed through 300 ms in, n that rest to the deadline and cross
+    t0 = time.perf_counter()
+    futs = [om.submit(symbol, "buy", 1.0, 100.0, deadline_ms=deadline_ms, mid=100.05) for _ in range(n)]
+    t_submit = time.perf_counter() - t0
+    time.sleep(0.3)
+    ex.trade(symbol, 100.0)
+    futs += [om.submit(symbol, "buy", 1.0, 100.0, deadline_ms=deadline_ms, mid=100.05) for _ in range(n)]
+    res = [f.result(30) for f in futs]
+    t_all = time.perf_counter() - t0
+    lifetimes = [o.history[-1][0] - o.history[0][0] for o in om.orders.values()]
+    om.stop()
+
+    statuses = {}
+    for r in res:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    print(f"{2 * n} maker orders, venue latency {latency_ms:.0f} ms, deadline {deadline_ms} ms, poll {OM_POLL_MS} ms")
+    print(f"caller time per submit: {t_submit / n * 1e6:.0f} us")
+    print(f"all resolved {t_all:.2f} s after the first submit; statuses {statuses}")
+    print(f"order lifetimes: mean {sum(lifetimes) / len(lifetimes):.2f} s, sum {sum(lifetimes):.1f} s "
+          f"(what one-at-a-time blocking execution would hold the caller)")
+    print(f"venue calls {ex.calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
 import time
-from sqlalchemy.orm import Session
-from funding_arb.models import ExecOutcome
+import numpy as np
+from funding_arb.models import ExecOutcome, BanditShadow, PairedExecution
+from funding_arb.writer import get_writer
 
-def log_outcome(session: Session, symbol: str, action: int, side: str, sim):
-    row = ExecOutcome(
-        ts_ms=int(time.time() * 1000),
+def _context_blob(context):
+    return None if context is None else np.ascontiguousarray(context, dtype="<f8").ravel().tobytes()
+
+def log_outcome(symbol: str, action: int, side: str, sim, ts_ms: int | None = None):
+    """
+    `sim` may carry the decision's "context" vector and "propensity" (BanditExecutor
+    adds both), and "snapshot_age_ms" for real orders (execute_action's result).
+    """
+    get_writer().submit(ExecOutcome.__table__, dict(
+        ts_ms=int(time.time() * 1000) if ts_ms is None else ts_ms,
         symbol=symbol,
         action=action,
         side=side,
@@ -14,5 +22,40 @@ def log_outcome(session: Session, symbol: str, action: int, side: str, sim):
         fee_bps=sim["fee_bps"],
         partial_fill=sim["partial_fill"],
         time_to_fill_ms=sim["time_to_fill_ms"],
-    )
-    session.add(row)
\ No newline at end of file
+        context=_context_blob(sim.get("context")),
+        propensity=sim.get("propensity"),
+        snapshot_age_ms=sim.get("snapshot_age_ms"),
+    ))
+
+def log_shadow(symbol: str, ts_ms: int, action_bandit: int, action_baseline: int, realized_cost_bps: float,
+               context=None, propensity: float | None = None):
+    get_writer().submit(BanditShadow.__table__, dict(
+        ts_ms=ts_ms,
+        symbol=symbol,
+        action_bandit=action_bandit,
+        action_baseline=action_baseline,
+        realized_cost_bps=realized_cost_bps,
+        context=_context_blob(context),
+        propensity=propensity,
+    ))
+
+def log_paired(symbol: str, hedge_symbol: str, side: str, qty: float, res: dict, ts_ms: int | None = None):
+    """`res` is PairedExecutor.execute's result."""
+    legging_ms = res["legging_ms"]
+    get_writer().submit(PairedExecution.__table__, dict(
+        ts_ms=int(time.time() * 1000) if ts_ms is None else ts_ms,
+        symbol=symbol,
+        hedge_symbol=hedge_symbol,
+        side=side,
+        qty=qty,
+        status=res["status"],
+        perp_px=res["price"],
+        hedge_px=res["hedge_price"],
+        perp_slip_bps=res["perp_slip_bps"],
+        hedge_slip_bps=res["hedge_slip_bps"],
+        perp_fill_ms=int(res["perp_fill_ms"]),
+        hedge_fill_ms=int(res["hedge_fill_ms"]),
+        legging_ms=None if legging_ms is None else int(legging_ms),
+        topup_qty=res["topup_qty"],
+        residual_qty=res["residual_qty"],
+    ))
@@ -0,0 +1,240 @@
+# funding_arb/exec/paired.py
+"""
+Two-leg delta-neutral execution. The perp leg and its hedge (a perp on a
+second venue, or a second symbol on the same one) are placed at the same
+time, each on its venue's OrderManager, so the naked window is the gap
+between the two fills rather than the whole first leg. When both are done
+the filled base quantities are reconciled: the short leg is topped up at
+market by the difference. Each pair records its legging time (first leg
+filled -> both legs matched), per-leg time to fill and per-leg slippage
+against the mid at submission to paired_executions.
+    python -m funding_arb.exec.paired [pairs] [perp_latency_ms] [hedge_latency_ms]
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Optional
+
+from funding_arb.data.market_rules import _decimals, floor_to_step, rules_for
+from funding_arb.exec.order_manager import FakeExchange, ManagedOrder, OrderManager
+from funding_arb.exec.outcome_log import log_paired
+
+PAIR_QTY_TOL = float(os.getenv("PAIR_QTY_TOL", 1e-6))   # relative base-qty mismatch left alone
+
+# second venue for the hedge leg (a ccxt exchange id with USDT perps); unset = perp-only execution
+HEDGE_EXCHANGE = os.getenv("HEDGE_EXCHANGE")
+HEDGE_SANDBOX = os.getenv("HEDGE_SANDBOX", "1") == "1"
+
+
+@dataclass
+class Leg:
+    om: OrderManager
+    symbol: str
+    side: str                       # "buy" or "sell"
+    qty: float                      # base units
+    price: Optional[float] = None   # post-only limit, crossed at the deadline; None = market
+    mid: Optional[float] = None     # decision-time mid; fetched from the venue at submission if None
+    reduce_only: bool = False
+
+
+def _slip_bps(side: str, px: Optional[float], mid: Optional[float]) -> Optional[float]:
+    if not (px and mid):
+        return None
+    return (px - mid) / mid * 1e4 * (1.0 if side == "buy" else -1.0)
+
+
+def _done_at(o: ManagedOrder) -> float:
+    return o.history[-1][0]
+
+
+class PairedExecutor:
+    """Runs on the perp leg's OrderManager loop; the hedge leg may live on another manager."""
+    def __init__(self, perp: OrderManager, hedge: OrderManager, record: bool = True):
+        self.perp = perp
+        self.hedge = hedge
+        self.record = record
+
+    def submit(self, perp: Leg, hedge: Leg, deadline_ms: int = 800) -> Future:
+        """Both legs at once; the future resolves to execute()'s dict."""
+        return perp.om.run(self.execute(perp, hedge, deadline_ms))
+
+    async def execute(self, perp: Leg, hedge: Leg, deadline_ms: int = 800) -> dict:
+        """
+        Place both legs concurrently, then top up whichever filled less. The
+        result has execute_action's "status"/"price" (the perp leg's VWAP) plus
+        the per-leg results and legging measurements.
+        """
+        # both legs on the coarser step, so a top-up can always cover the difference
+        step = max(self._step(perp.om, perp.symbol), self._step(hedge.om, hedge.symbol))
+        perp.qty = self._round(perp.om, perp.symbol, floor_to_step(perp.qty, step, _decimals(step)))
+        hedge.qty = self._round(hedge.om, hedge.symbol, floor_to_step(hedge.qty, step, _decimals(step)))
+        if perp.qty <= 0 or hedge.qty <= 0:
+            return {"status": "qty_zero", "price": None, "order": None}
+        t0 = time.time()
+        orders = [leg.om.new_order(leg.symbol, leg.side, leg.qty, leg.price, deadline_ms, leg.reduce_only, leg.mid)
+                  for leg in (perp, hedge)]
+        res_p, res_h, mid_p, mid_h = await asyncio.gather(
+            self._place(perp.om, orders[0]), self._place(hedge.om, orders[1]),
+            self._mid(perp), self._mid(hedge))
+        t_p, t_h = _done_at(orders[0]), _done_at(orders[1])
+
+        # reconcile: the leg that filled less gets the difference at market
+        legs = [[perp, res_p, res_p.get("filled") or 0.0, res_p.get("price")],
+                [hedge, res_h, res_h.get("filled") or 0.0, res_h.get("price")]]
+        gap = legs[0][2] - legs[1][2]
+        short = legs[1] if gap > 0 else legs[0]
+        leg = short[0]
+        # a residual below the short leg's step cannot be topped up: it counts as matched
+        tol = max(PAIR_QTY_TOL * max(perp.qty, hedge.qty), self._step(leg.om, leg.symbol) * (1 - 1e-9))
+        topup_qty, topup_leg, t_end = 0.0, None, max(t_p, t_h)
+        if abs(gap) > tol:
+            qty = self._round(leg.om, leg.symbol, abs(gap))
+            if qty > 0:
+                o = leg.om.new_order(leg.symbol, leg.side, qty, None, 0, leg.reduce_only, leg.mid)
+                res = await self._place(leg.om, o)
+                got = res.get("filled") or 0.0
+                if got:
+                    topup_qty, topup_leg = got, "perp" if leg is perp else "hedge"
+                    px = res.get("price") or short[3] or leg.mid or 0.0
+                    short[3] = (short[2] * (short[3] or 0.0) + got * px) / (short[2] + got)
+                    short[2] += got
+                t_end = _done_at(o)
+        residual = legs[0][2] - legs[1][2]
+        matched = abs(residual) <= tol
+
+        if not legs[0][2] and not legs[1][2]:
+            status = "failed"
+        elif not matched:
+            status = "unhedged"
+        else:
+            status = "paired" if topup_leg is None else f"paired_topup_{topup_leg}"
+        filled_at = [t for t, got in ((t_p, legs[0][2]), (t_h, legs[1][2])) if got]
+        out = {
+            "status": status,
+            "price": legs[0][3] if legs[0][2] else None,
+            "hedge_price": legs[1][3] if legs[1][2] else None,
+            "perp": res_p, "hedge": res_h,
+            "perp_fill_ms": (t_p - t0) * 1e3, "hedge_fill_ms": (t_h - t0) * 1e3,
+            # naked window: first leg filled -> the other leg (or its top-up) filled
+            "legging_ms": (t_end - min(filled_at)) * 1e3 if filled_at and matched else None,
+            "perp_slip_bps": _slip_bps(perp.side, legs[0][3], mid_p),
+            "hedge_slip_bps": _slip_bps(hedge.side, legs[1][3], mid_h),
+            "topup_qty": topup_qty, "topup_leg": topup_leg, "residual_qty": residual,
+            "perp_filled": legs[0][2], "hedge_filled": legs[1][2],
+        }
+        if self.record:
+            log_paired(perp.symbol, hedge.symbol, perp.side, perp.qty, out, ts_ms=int(t0 * 1000))
+        return out
+
+    def submit_unwind(self, res: dict, perp_symbol: str, hedge_symbol: str, perp_side: str) -> Future:
+        """Flatten what an execute() result left open, both legs at once; resolves to [perp, hedge] results."""
+        return self.perp.run(self.unwind(res, perp_symbol, hedge_symbol, perp_side))
+
+    async def unwind(self, res: dict, perp_symbol: str, hedge_symbol: str, perp_side: str) -> list:
+        """Reduce-only market orders against each leg's filled quantity (for an unhedged pair)."""
+        back = {"buy": "sell", "sell": "buy"}
+        hedge_side = back[perp_side]
+        jobs = []
+        for om, symbol, side, qty in ((self.perp, perp_symbol, back[perp_side], res["perp_filled"]),
+                                      (self.hedge, hedge_symbol, back[hedge_side], res["hedge_filled"])):
+            qty = self._round(om, symbol, qty)
+            if qty > 0:
+                jobs.append(self._place(om, om.new_order(symbol, side, qty, None, 0, True)))
+        return list(await asyncio.gather(*jobs))
+
+    async def _place(self, om: OrderManager, o: ManagedOrder) -> dict:
+        if om._loop is asyncio.get_running_loop():
+            return await om.place(o)
+        return await asyncio.wrap_future(om.run(om.place(o)))
+
+    async def _mid(self, leg: Leg) -> Optional[float]:
+        if leg.mid is not None:
+            return leg.mid
+        try:
+            ob = await self._call(leg.om, leg.om.venue.fetch_order_book, leg.symbol, 5)
+            return (ob["bids"][0][0] + ob["asks"][0][0]) / 2.0
+        except Exception:
+            return None
+
+    async def _call(self, om: OrderManager, fn, *args):
+        if om._loop is asyncio.get_running_loop():
+            return await om.call(fn, *args)
+        return await asyncio.wrap_future(om.run(om.call(fn, *args)))
+
+    @staticmethod
+    def _step(om: OrderManager, symbol: str) -> float:
+        if not getattr(om.venue, "markets", None):
+            return 0.0
+        return rules_for(om.venue).rule(symbol).step
+
+    @staticmethod
+    def _round(om: OrderManager, symbol: str, qty: float) -> float:
+        if not getattr(om.venue, "markets", None):
+            return float(qty)   # FakeExchange: no rules
+        return rules_for(om.venue).floor_qty(symbol, qty)
+
+
+def hedge_from_env() -> Optional[OrderManager]:
+    """OrderManager for HEDGE_EXCHANGE (HEDGE_API_KEY / HEDGE_API_SECRET), or None when unset."""
+    if not HEDGE_EXCHANGE:
+        return None
+    from funding_arb.data.clients import get_client
+    ex = get_client(HEDGE_EXCHANGE, sandbox=HEDGE_SANDBOX,
+                    api_key=os.getenv("HEDGE_API_KEY"), secret=os.getenv("HEDGE_API_SECRET"))
+    return OrderManager(ex)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    lat_p = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+    lat_h = float(sys.argv[3]) if len(sys.argv) > 3 else 120.0
+    sym_p, sym_h = "FAKE/USDT:USDT", "FAKE2/USDT:USDT"
+    ex_p, ex_h = FakeExchange(latency_ms=lat_p), FakeExchange(latency_ms=lat_h)
+    om_p, om_h = OrderManager(ex_p).start(), OrderManager(ex_h).start()
+    pairs = PairedExecutor(om_p, om_h, record=False)
+
+    def legs(i: int):
+        # every third hedge is posted through the book and rejected: the top-up has to cover it
+        hedge_px = 100.2 if i % 3 == 2 else None
+        return (Leg(om_p, sym_p, "sell", 1.0, None, 100.05),
+                Leg(om_h, sym_h, "buy", 1.0, hedge_px, 100.05))
+
+    # concurrent legs
+    t0 = time.perf_counter()
+    res = [pairs.submit(*legs(i)).result(30) for i in range(n)]
+    t_pair = time.perf_counter() - t0
+
+    # the same pairs one leg after the other, as a blocking perp-then-hedge caller would
+    serial = []
+    for i in range(n):
+        p, h = legs(i)
+        t1 = time.time()
+        om_p.submit(p.symbol, p.side, p.qty, p.price, 800, False, p.mid).result(30)
+        t_perp = time.time()
+        h_res = om_h.submit(h.symbol, h.side, h.qty, h.price, 800, False, h.mid).result(30)
+        if not h_res.get("price"):
+            om_h.submit(h.symbol, h.side, h.qty, None, 0, False, h.mid).result(30)
+        serial.append(((time.time() - t_perp) * 1e3, (t_perp - t1) * 1e3))
+    om_p.stop()
+    om_h.stop()
+
+    statuses = {}
+    for r in res:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    leg_ms = sorted(r["legging_ms"] for r in res if r["legging_ms"] is not None) or [0.0]
+    print(f"{n} pairs, perp venue {lat_p:.0f} ms, hedge venue {lat_h:.0f} ms per call")
+    print(f"statuses {statuses}; wall {t_pair:.2f} s")
+    print(f"concurrent legging ms: mean {sum(leg_ms) / len(leg_ms):.0f}, max {leg_ms[-1]:.0f}")
+    print(f"serial legging ms:     mean {sum(s[0] for s in serial) / n:.0f}, "
+          f"max {max(s[0] for s in serial):.0f}")
+    slip = {k: [r[k] for r in res if r[k] is not None] or [0.0] for k in ("perp_slip_bps", "hedge_slip_bps")}
+    print(f"slippage bps perp {sum(slip['perp_slip_bps']) / len(slip['perp_slip_bps']):.2f}, "
+          f"hedge {sum(slip['hedge_slip_bps']) / len(slip['hedge_slip_bps']):.2f}; "
+          f"residual qty {max(abs(r['residual_qty']) for r in res):.2g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# funding_arb/exec/queue_sim.py
+"""
+Queue-position maker fills replayed over stored books. A virtual post-only
+order joins the back of its price level (queue ahead = the level's size when
+placed, 0 for a price inside the spread) and is then walked through the
+following lob_snapshots rows until its deadline:
+  - size leaving the level reduces the queue ahead; once that is gone, size
+    leaving the level while it is the touch is traded against us
+  - the opposite touch reaching our price (traded through), or every level
+    at and better than ours disappearing (depleted, for an order that joined
+    a visible level), fills the rest
+Size joining the level queues behind us. While the level is deeper than the
+stored depth the queue is carried unchanged, not counted as leaving. Orders are independent, so they
+are replayed together as (orders x snapshots x depth) blocks, and an order
+leaves the replay as soon as it fills.
+    python -m funding_arb.exec.queue_sim SYMBOL [qty_quote] [deadline_ms]
+"""
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from funding_arb.exec.baseline import ACTIONS, MAKER_FILL_MS, MAKER_INSIDE, WAIT_COST_BPS, _sweep
+
+CHUNK_ORDERS = 50_000     # orders replayed together
+FIRST_BLOCK = 4           # snapshots per step of the replay, doubling up to MAX_BLOCK
+MAX_BLOCK = 64
+
+NOT_FILLED, QUEUE, TRADE_THROUGH, DEPLETED, REJECTED = 0, 1, 2, 3, 4
+
+
+@dataclass(slots=True)
+class MakerFills:
+    """(m,) per order."""
+    filled_qty: np.ndarray      # base units filled by the deadline
+    fill_idx: np.ndarray        # snapshot row where the order completed, else the deadline row
+    time_to_fill_ms: np.ndarray
+    queue_ahead: np.ndarray     # base units ahead of us when placed
+    reason: np.ndarray          # NOT_FILLED / QUEUE / TRADE_THROUGH / DEPLETED / REJECTED
+
+
+def _level_size(px: np.ndarray, sz: np.ndarray, price: np.ndarray) -> np.ndarray:
+    """Size resting at `price` (broadcast over the leading axes), 0 where the level is absent."""
+    # exact match: order prices are book prices or lie strictly inside the spread
+    return np.where(px == price[..., None], sz, 0.0).sum(axis=-1)
+
+
+def replay_maker(lob: dict, idx, buy, price, qty, deadline_ms) -> MakerFills:
+    """
+    Replay post-only orders placed at snapshot rows `idx` of `lob` (fetch_range
+    columns) at `price`, for `qty` base units, until `deadline_ms` later. All
+    (m,) arrays or scalars. An order crossing the opposite touch when placed
+    is rejected, as post-only would be.
+    """
+    ts = lob["ts_ms"]
+    n = len(ts)
+    idx = np.asarray(idx, dtype=np.int64).reshape(-1)
+    m = len(idx)
+    buy = np.broadcast_to(np.asarray(buy, dtype=bool), (m,))
+    price = np.broadcast_to(np.asarray(price, dtype=np.float64), (m,))
+    qty = np.broadcast_to(np.asarray(qty, dtype=np.float64), (m,))
+    end = np.searchsorted(ts, ts[idx] + np.broadcast_to(np.asarray(deadline_ms), (m,)), side="right") - 1
+    end = np.maximum(end, idx)
+
+    out = MakerFills(filled_qty=np.zeros(m), fill_idx=end.copy(), time_to_fill_ms=ts[end] - ts[idx],
+                     queue_ahead=np.zeros(m), reason=np.zeros(m, dtype=np.int8))
+    for side_buy in (True, False):
+        sel = np.flatnonzero(buy == side_buy)
+        if not len(sel):
+            continue
+        same_px, same_sz = (lob["bid_px"], lob["bid_sz"]) if side_buy else (lob["ask_px"], lob["ask_sz"])
+        opp_px = lob["ask_px"] if side_buy else lob["bid_px"]
+        sgn = 1.0 if side_buy else -1.0   # prices compared as sgn * px: "better" is larger on both sides
+        for c in range(0, len(sel), CHUNK_ORDERS):
+            j = sel[c:c + CHUNK_ORDERS]
+            _replay_side(out, j, idx[j], end[j], price[j], qty[j], sgn, same_px, same_sz, opp_px, ts, n)
+    return out
+
+
+def _replay_side(out: MakerFills, j, i0, end, p, qty, sgn, same_px, same_sz, opp_px, ts, n):
+    """
+    Walk orders j forward in blocks of snapshots (FIRST_BLOCK, doubling), dropping
+    the ones that finished: most fills come long before a generous deadline.
+    """
+    sp = sgn * p
+    with np.errstate(invalid="ignore"):
+        # rejected: post-only price at or through the opposite touch when placed
+        rejected = sgn * opp_px[i0, 0] <= sp
+        joined = sgn * same_px[i0, 0] >= sp           # on a visible level, not alone inside the spread
+    size0 = _level_size(same_px[i0], same_sz[i0], p)
+    ahead = np.where(joined, size0, 0.0)
+    out.queue_ahead[j] = ahead
+    out.fill_idx[j] = np.where(rejected, i0, end)
+    out.filled_qty[j] = 0.0
+    out.reason[j] = np.where(rejected, REJECTED, NOT_FILLED)
+
+    act = np.flatnonzero(~rejected & (end > i0))     # positions into j still being walked
+    prev, filled = size0, np.zeros(len(j))
+    off, block = 0, FIRST_BLOCK
+    while len(act):
+        rows = i0[act, None] + off + 1 + np.arange(block)
+        live = rows <= end[act, None]
+        rows = np.minimum(rows, n - 1)
+        bpx = same_px[rows]                                          # (k, B, depth)
+        spa = sp[act, None]
+        size = _level_size(bpx, same_sz[rows], p[act, None])
+        # our price below the visible depth: its size is unknown, not gone; carry the last seen size
+        hidden = np.where(np.isnan(bpx), np.inf, sgn * bpx).min(axis=-1) > spa
+        seen = np.maximum.accumulate(np.where(hidden, -1, np.arange(block)), axis=1)
+        size = np.where(seen >= 0, np.take_along_axis(size, np.maximum(seen, 0), axis=1), prev[act, None])
+        touch = sgn * bpx[..., 0]
+        with np.errstate(invalid="ignore"):
+            through = (sgn * opp_px[rows, 0] <= spa) & live
+            # every visible level at our price or better is gone: the book moved through us
+            depleted = (touch < spa) & live & joined[act, None]
+            at_touch = (touch == spa) & live
+
+        # size leaving the level reduces the queue ahead; past it, leaving at the touch is traded with us
+        dec = np.maximum(-np.diff(size, axis=1, prepend=prev[act, None]), 0.0) * live
+        ahead_after = np.maximum(ahead[act, None] - np.cumsum(dec, axis=1), 0.0)
+        ahead_before = np.concatenate([ahead[act, None], ahead_after[:, :-1]], axis=1)
+        got = filled[act, None] + np.cumsum(np.where(at_touch, np.maximum(dec - ahead_before, 0.0), 0.0), axis=1)
+
+        done_q = got >= qty[act, None]
+        done = done_q | through | depleted
+        any_done = done.any(axis=1)
+        first = done.argmax(axis=1)
+        k = np.arange(len(act))
+        fin = act[any_done]
+        out.fill_idx[j[fin]] = rows[k, first][any_done]
+        out.filled_qty[j[fin]] = qty[fin]
+        out.reason[j[fin]] = np.where(done_q[k, first], QUEUE,
+                                      np.where(through[k, first], TRADE_THROUGH, DEPLETED))[any_done]
+
+        ahead[act], filled[act], prev[act] = ahead_after[:, -1], got[:, -1], size[:, -1]
+        rest = ~any_done & live[:, -1]
+        off += block
+        act = act[rest]
+        block = min(2 * block, MAX_BLOCK)
+
+    open_ = out.reason[j] == NOT_FILLED
+    out.filled_qty[j[open_]] = np.minimum(filled[open_], qty[open_])
+    out.time_to_fill_ms[j] = ts[out.fill_idx[j]] - ts[i0]
+
+
+def replay_all_actions(lob: dict, idx, side: str = "buy", qty: float = 100.0, deadline_ms: int = 1000) -> dict:
+    """
+    simulate_all_actions with queue-aware makers: (m, 4) arrays for orders of
+    `qty` quote notional placed at rows `idx`. Makers post at the touch
+    (post_only_edge) or MAKER_INSIDE into the spread (maker_inside), as
+    simulate_fill does; whatever
+    is unfilled at the deadline crosses the book as it is then. Cost is
+    against the mid at placement.
+    """
+    idx = np.asarray(idx, dtype=np.int64)
+    m, buy = len(idx), side == "buy"
+    bid, ask = lob["bid_px"][idx, 0], lob["ask_px"][idx, 0]
+    mid = (bid + ask) / 2.0
+    opp = ("ask_px", "ask_sz") if buy else ("bid_px", "bid_sz")
+    qty_v = np.full(m, float(qty))
+
+    fill_px = np.full((m, len(ACTIONS)), np.nan)
+    time_ms = np.zeros((m, len(ACTIONS)), dtype=np.int64)
+    filled_frac = np.ones((m, len(ACTIONS)))
+    reason = np.zeros((m, len(ACTIONS)), dtype=np.int8)
+
+    cross_px, got = _sweep(lob[opp[0]][idx], lob[opp[1]][idx], qty_v)
+    fill_px[:, 2], filled_frac[:, 2] = cross_px, got / qty_v
+    fill_px[:, 3], time_ms[:, 3] = mid, MAKER_FILL_MS
+
+    for a in (0, 1):
+        p = np.where(buy, bid + (ask - bid) * MAKER_INSIDE[a], ask - (ask - bid) * MAKER_INSIDE[a])
+        base = qty_v / p
+        r = replay_maker(lob, idx, buy, p, base, deadline_ms)
+        frac = r.filled_qty / base
+        # the rest crosses at the deadline against the book at that time
+        rest_px, rest_got = _sweep(lob[opp[0]][r.fill_idx], lob[opp[1]][r.fill_idx], qty_v * (1.0 - frac))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mixed = (frac * qty_v + rest_got) / (frac * qty_v / p + rest_got / rest_px)
+        fill_px[:, a] = np.where(frac < 1.0, mixed, p)
+        filled_frac[:, a] = np.where(frac < 1.0, frac + rest_got / qty_v, 1.0)
+        time_ms[:, a] = r.time_to_fill_ms
+        reason[:, a] = r.reason
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        impact = (fill_px - mid[:, None]) / mid[:, None] * (1.0 if buy else -1.0)
+        cost = impact * 1e4
+    cost[:, 3] = WAIT_COST_BPS
+    return {"fill_px": fill_px, "bench_mid_px": mid, "realized_cost_bps": cost, "time_to_fill_ms": time_ms,
+            "filled_frac": filled_frac, "partial_fill": (filled_frac < 1.0).astype(np.int64), "reason": reason}
+
+
+def main():
+    from funding_arb.query import fetch_range
+    if len(sys.argv) < 2:
+        raise SystemExit(__doc__)
+    symbol = sys.argv[1]
+    qty = float(sys.argv[2]) if len(sys.argv) > 2 else 100.0
+    deadline_ms = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    lob = fetch_range("lob_snapshots", symbol)
+    n = len(lob.get("ts_ms", ()))
+    if not n:
+        print(f"no lob_snapshots for {symbol}")
+        return
+    idx = np.arange(n)
+    t0 = time.perf_counter()
+    out = replay_all_actions(lob, idx, "buy", qty, deadline_ms)
+    dt = time.perf_counter() - t0
+    steps = int(np.searchsorted(lob["ts_ms"], lob["ts_ms"] + deadline_ms, side="right").sum() - idx.sum() - n)
+    print(f"{symbol}: {n} snapshots, one buy order per snapshot per maker action, {deadline_ms} ms deadline")
+    print(f"replay {dt * 1e3:.1f} ms: {n / dt:,.0f} snapshots/s, {2 * steps / dt:,.0f} order-snapshot steps/s")
+    names = ("maker_inside", "post_only_edge", "taker_now", "wait")
+    for a, name in enumerate(names):
+        r = out["reason"][:, a]
+        print(f"  {name:15s} cost {np.nanmean(out['realized_cost_bps'][:, a]):7.3f} bps  "
+              f"filled as maker {np.isin(r, (QUEUE, TRADE_THROUGH, DEPLETED)).mean():6.1%}  "
+              f"fill ms {out['time_to_fill_ms'][:, a].mean():6.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 import time, random
-from funding_arb.db import SessionLocal
 from funding_arb.init_db import init_db
 from funding_arb.data.exchanges import BinanceUSDM_Public
 from funding_arb.exec.baseline import Intent, simulate_fill
 from funding_arb.exec.outcome_log import log_outcome
+from funding_arb.ml.features import FeatureBuilder, exec_context
+
+ACTIONS = [0, 1, 2, 3]  # maker_inside, edge, taker, wait
 
 def main():
     init_db()
     ex = BinanceUSDM_Public()
     symbol = "BTC/USDT"
+    fb = FeatureBuilder()
+    last_action = 0
     print("Paper-executing intents for ~5 seconds...")
 
     t_end = time.time() + 5
@@ -17,14 +21,19 @@ def main():
 
         # randomize side and action for demo (we just want data in DB)
         side = random.choice(["buy", "sell"])
-        action = random.choice([0, 1, 2, 3])  # maker_inside, edge, taker, wait
+        action = random.choice(ACTIONS)
         intent = Intent(symbol=symbol, side=side, qty=100.0, deadline_ms=500)
 
-        sim = simulate_fill(action, intent, lob, int(time.time() * 1000))
+        ts_ms = int(time.time() * 1000)
+        feats = fb.push_book(lob, last_action=last_action, ts_ms=ts_ms)
+        sim = simulate_fill(action, intent, lob, ts_ms)
         if sim:
-            with SessionLocal() as s:
-                log_outcome(s, symbol, action, side, sim)
-                s.commit()
+            # uniform random logging: the ideal data for offline policy evaluation
+            if feats:
+                sim["context"] = exec_context(feats).ravel()
+                sim["propensity"] = 1.0 / len(ACTIONS)
+            log_outcome(symbol, action, side, sim, ts_ms=ts_ms)
+            last_action = action
 
         time.sleep(0.25)
 
@@ -0,0 +1,174 @@
+# funding_arb/feature_store.py
+"""
+Versioned feature store. A feature set is a name plus an ordered column list;
+each distinct (name, columns) gets its own version in `feature_sets`. Rows in
+`feature_rows` are keyed by (symbol, version, ts_ms) and hold one float64
+vector in column order (NaN = missing), written through the background writer.
+
+Layout is one packed row per tick, not per-column chunks: the live loop
+appends one tick at a time through the writer (no buffering that a crash
+would lose), the unique (symbol, version, ts_ms) key keeps re-run backfills
+idempotent row by row, and a range read is already one contiguous
+np.frombuffer into an (n, k) matrix, so columns are a strided view, the same
+trade-off lob_snapshots makes with its packed bids/asks.
+
+    store = FeatureStore("llm", LLM_COLUMNS)
+    store.append("ETH/USDT:USDT", ts_ms, feats_dict)          # live loop
+    store.append_batch("BTC/USDT", ts, fb.compute_batch(...))  # backfill
+    ts, X, cols = load_features("llm", "ETH/USDT:USDT", t0, t1)  # readers
+"""
+import numbers
+import time
+from typing import Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy import func, insert, select
+
+from .db import engine as default_engine, read_engine as default_read_engine
+from .models import FeatureRow, FeatureSetDef
+from .writer import get_writer
+
+_F8 = np.dtype("<f8")
+
+
+def register_feature_set(name: str, columns: Sequence[str], engine=default_engine) -> int:
+    """Version for (name, columns); an unseen column list gets a new version."""
+    columns = list(columns)
+    t = FeatureSetDef.__table__
+    with engine.begin() as conn:
+        for version, cols in conn.execute(select(t.c.version, t.c.columns).where(t.c.name == name)):
+            if list(cols) == columns:
+                return version
+        res = conn.execute(insert(t).values(name=name, columns=columns, created_ms=int(time.time() * 1000)))
+        return res.inserted_primary_key[0]
+
+
+def feature_set(version: int, engine=default_read_engine) -> Tuple[str, list]:
+    t = FeatureSetDef.__table__
+    with engine.connect() as conn:
+        row = conn.execute(select(t.c.name, t.c.columns).where(t.c.version == version)).first()
+    if row is None:
+        raise KeyError(f"unknown feature set version {version}")
+    return row.name, list(row.columns)
+
+
+def latest_version(name: str, engine=default_read_engine) -> int:
+    t = FeatureSetDef.__table__
+    with engine.connect() as conn:
+        v = conn.execute(select(func.max(t.c.version)).where(t.c.name == name)).scalar()
+    if v is None:
+        raise KeyError(f"no feature set named {name!r}")
+    return v
+
+
+class FeatureStore:
+    """Appends rows for one feature-set version through the background writer."""
+    def __init__(self, name: str, columns: Sequence[str], engine=default_engine):
+        self.name = name
+        self.columns = list(columns)
+        self.version = register_feature_set(name, self.columns, engine)
+        self._index = {c: i for i, c in enumerate(self.columns)}
+        self.dropped = 0
+
+    def vector(self, feats: Union[Mapping, Sequence, object]) -> np.ndarray:
+        """dict / dataclass / sequence -> float64 vector in column order (non-numeric -> NaN)."""
+        if not isinstance(feats, Mapping):
+            if hasattr(feats, "__dataclass_fields__"):
+                feats = vars(feats)
+            else:
+                return np.asarray(feats, dtype=_F8).reshape(len(self.columns))
+        out = np.full(len(self.columns), np.nan, dtype=_F8)
+        for k, v in feats.items():
+            i = self._index.get(k)
+            if i is not None and isinstance(v, numbers.Real) and not isinstance(v, bool):
+                out[i] = v
+        return out
+
+    def append(self, symbol: str, ts_ms: int, feats) -> bool:
+        row = dict(ts_ms=int(ts_ms), symbol=symbol, version=self.version, vec=self.vector(feats).tobytes())
+        ok = get_writer().submit(FeatureRow.__table__, row)
+        self.dropped += not ok
+        return ok
+
+    def append_batch(self, symbol: str, ts_ms, values) -> int:
+        """
+        Bulk append. `values` is an (n, k) array in column order or a structured
+        array with those field names (e.g. FeatureBuilder.compute_batch output).
+        Returns the number of rows accepted by the writer.
+        """
+        if values.dtype.names:
+            values = np.column_stack([values[c].astype(_F8) for c in self.columns])
+        X = np.ascontiguousarray(values, dtype=_F8).reshape(len(ts_ms), len(self.columns))
+        t = FeatureRow.__table__
+        w = get_writer()
+        n = 0
+        for ts, row in zip(np.asarray(ts_ms, dtype=np.int64).tolist(), X):
+            n += w.submit(t, dict(ts_ms=ts, symbol=symbol, version=self.version, vec=row.tobytes()))
+        self.dropped += len(X) - n
+        return n
+
+
+def load_features(name_or_version: Union[str, int], symbol: str, t0: Optional[int] = None,
+                  t1: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+                  engine=default_read_engine):
+    """
+    (ts_ms (n,), X (n, k), columns) for one symbol, ordered by ts_ms, t0 <= ts_ms < t1.
+    A name resolves to its latest version. `columns` selects/reorders (unknown -> NaN).
+    """
+    version = name_or_version if isinstance(name_or_version, int) else latest_version(name_or_version, engine)
+    _, cols = feature_set(version, engine)
+    t = FeatureRow.__table__
+    q = (select(t.c.ts_ms, t.c.vec)
+         .where(t.c.symbol == symbol, t.c.version == version).order_by(t.c.ts_ms))
+    if t0 is not None:
+        q = q.where(t.c.ts_ms >= t0)
+    if t1 is not None:
+        q = q.where(t.c.ts_ms < t1)
+    with engine.connect() as conn:
+        rows = conn.execute(q).all()
+
+    ts = np.fromiter((r.ts_ms for r in rows), dtype=np.int64, count=len(rows))
+    X = np.frombuffer(b"".join(r.vec for r in rows), dtype=_F8).reshape(len(rows), len(cols))
+    if columns is not None:
+        idx = {c: i for i, c in enumerate(cols)}
+        X = np.column_stack([X[:, idx[c]] if c in idx else np.full(len(rows), np.nan) for c in columns]) \
+            if len(columns) else X[:, :0]
+        cols = list(columns)
+    return ts, X, cols
+
+
+def align(grid_ms, ts_ms, X, max_age_ms: Optional[int] = None) -> np.ndarray:
+    """
+    As-of join: for each grid time the latest row at or before it; NaN before
+    the first row or when that row is older than `max_age_ms`.
+    """
+    grid_ms = np.asarray(grid_ms, dtype=np.int64)
+    j = np.searchsorted(ts_ms, grid_ms, side="right") - 1
+    out = np.full((len(grid_ms), X.shape[1]), np.nan)
+    if not len(ts_ms):
+        return out
+    ok = j >= 0
+    if max_age_ms is not None:
+        ok &= grid_ms - ts_ms[np.maximum(j, 0)] <= max_age_ms
+    out[ok] = X[j[ok]]
+    return out
+
+
+def load_aligned(name_or_version: Union[str, int], symbols: Sequence[str], grid_ms,
+                 max_age_ms: int = 60_000, columns: Optional[Sequence[str]] = None,
+                 engine=default_read_engine):
+    """
+    (len(symbols), len(grid), k) feature tensor on a shared, ascending time grid
+    (as-of rows no older than `max_age_ms`), plus the column list.
+    """
+    grid_ms = np.asarray(grid_ms, dtype=np.int64)
+    if not len(grid_ms):
+        raise ValueError("empty grid")
+    t0, t1 = int(grid_ms[0]) - max_age_ms, int(grid_ms[-1]) + 1
+    mats, cols = [], list(columns or [])
+    for sym in symbols:
+        ts, X, cols = load_features(name_or_version, sym, t0, t1, columns=columns, engine=engine)
+        mats.append(align(grid_ms, ts, X, max_age_ms))
+    if not mats:
+        return np.empty((0, len(grid_ms), len(cols))), cols
+    return np.stack(mats), cols
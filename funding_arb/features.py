@@ -1,181 +1,193 @@
 # funding_arb/features.py
 import math
 import time
-import statistics
-from typing import Dict, List
-import requests
+from typing import Dict, Optional
+
+from funding_arb.data.book import BookSnapshot
+from funding_arb.data.metrics import MetricsRefresher, fetch_basis, fetch_stats, pooled_session
+from funding_arb.microstructure import snapshot_stats
 
 __all__ = [
+    "LLM_FEATURE_COLUMNS",
     "VolEstimator",
     "compute_features",
 ]
 
 _EPS = 1e-12
+DEPTH_BPS = (10.0, 50.0)  # depth{N}_bid/ask_usdt bands
+_session = None  # pooled HTTP session for the inline (no refresher) path
+
+# every numeric key compute_features can return, in feature-store column order
+LLM_FEATURE_COLUMNS = (
+    "mid_px", "spread_bps", "imbalance_top",
+    "depth10_bid_usdt", "depth10_ask_usdt", "depth_imb10", "depth50_bid_usdt", "depth50_ask_usdt",
+    "microprice", "weighted_mid5", "imbalance_top5", "book_slope_bid", "book_slope_ask",
+    "vol_1m_ann", "vol_5m_ann", "vol_1h_ann",
+    "basis_bps", "mark_px", "index_px", "basis_age_s",
+    "taker_buy_sell_ratio_5m", "oi_change_pct_5m", "oi_sum", "stats_age_s",
+)
+
+
+class _Window:
+    """Running Welford stats over the returns whose first point is inside one time window."""
+    __slots__ = ("span_s", "head", "n", "mean", "m2", "dt_sum")
+
+    def __init__(self, span_s: float, head: int):
+        self.span_s = span_s
+        self.head = head  # absolute index of the oldest return still counted
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.dt_sum = 0.0
+
+    def add(self, r: float, dt: float):
+        self.n += 1
+        d = r - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (r - self.mean)
+        self.dt_sum += dt
+
+    def remove(self, r: float, dt: float):
+        self.n -= 1
+        if self.n == 0:
+            self.mean = self.m2 = self.dt_sum = 0.0
+            return
+        d = r - self.mean
+        self.mean -= d / self.n
+        self.m2 -= d * (r - self.mean)
+        self.dt_sum -= dt
 
 
 class VolEstimator:
     """
-    Simple realized volatility estimator over a rolling time window.
-    Stores (ts, mid) and computes annualized vol from recent log-returns.
+    Realized volatility over several rolling time windows at once.
+    Each tick's log-return goes into a fixed-size ring buffer; every window keeps
+    running Welford sums and evicts expired returns as time advances, so update
+    and vol_ann are O(1) amortized instead of rescanning the buffer.
+    Same definition as before: population std of consecutive log-returns whose
+    points are both within `window_s` of now, scaled by the mean step and annualized.
     """
-    def __init__(self, max_points: int = 2000):
+    ANNUALIZE = math.sqrt(365 * 24 * 60 * 60)
+    RECOMPUTE_EVERY = 10_000  # exact re-sum of each window's stats to shed float drift
+
+    def __init__(self, max_points: int = 20000, windows_s=(60.0, 300.0, 3600.0)):
         self.max_points = max_points
-        self.buf: List[tuple[float, float]] = []
+        self._ts = [0.0] * max_points   # ring: timestamp of the return's first point
+        self._ret = [0.0] * max_points
+        self._dt = [0.0] * max_points
+        self._n = 0                     # returns pushed so far (absolute index of the next slot)
+        self._last: tuple[float, float] | None = None
+        self._windows: Dict[float, _Window] = {}
+        for w in windows_s:
+            self._window(w)
 
     def reset(self):
-        self.buf.clear()
+        self._n = 0
+        self._last = None
+        for w in list(self._windows):
+            self._windows[w] = _Window(w, 0)
+
+    def _window(self, window_s: float) -> _Window:
+        win = self._windows.get(window_s)
+        if win is None:
+            # window requested for the first time: seed it from what the ring still holds
+            win = self._windows[window_s] = _Window(window_s, max(0, self._n - self.max_points))
+            self._resum(win)
+        return win
+
+    def _resum(self, win: _Window):
+        win.n, win.mean, win.m2, win.dt_sum = 0, 0.0, 0.0, 0.0
+        cap = self.max_points
+        for k in range(win.head, self._n):
+            win.add(self._ret[k % cap], self._dt[k % cap])
+
+    def _evict(self, win: _Window, cutoff: float):
+        cap = self.max_points
+        floor = self._n - cap
+        while win.head < self._n and (win.head < floor or self._ts[win.head % cap] < cutoff):
+            if win.head >= floor:
+                k = win.head % cap
+                win.remove(self._ret[k], self._dt[k])
+            win.head += 1
 
     def update(self, mid: float, ts: float | None = None):
         if not ts:
             ts = time.time()
-        self.buf.append((float(ts), float(mid)))
-        if len(self.buf) > self.max_points:
-            # drop oldest
-            self.buf = self.buf[-self.max_points :]
-
-    def vol_ann(self, window_s: float = 60.0) -> float:
+        ts, mid = float(ts), float(mid)
+        last, self._last = self._last, (ts, mid)
+        if last is None:
+            return
+        t0, p0 = last
+        if not (p0 > 0 and mid > 0 and ts > t0):
+            return
+
+        cap = self.max_points
+        k = self._n % cap
+        if self._n >= cap:
+            # slot is about to be overwritten: drop it from any window still counting it
+            for win in self._windows.values():
+                if win.head == self._n - cap:
+                    win.remove(self._ret[k], self._dt[k])
+                    win.head += 1
+        r, dt = math.log(mid / p0), ts - t0
+        self._ts[k], self._ret[k], self._dt[k] = t0, r, dt
+        self._n += 1
+        for win in self._windows.values():
+            win.add(r, dt)
+            if self._n % self.RECOMPUTE_EVERY == 0:
+                self._resum(win)
+
+    def vol_ann(self, window_s: float = 60.0, now: float | None = None) -> float:
         """
         Annualized realized vol from last `window_s` seconds.
         Returns 0.0 if insufficient data.
         """
-        if len(self.buf) < 2:
-            return 0.0
-        now = time.time()
-        pts = [p for p in self.buf if now - p[0] <= window_s]
-        if len(pts) < 2:
-            return 0.0
-
-        rets = []
-        dts = []
-        for i in range(1, len(pts)):
-            p0, p1 = pts[i - 1][1], pts[i][1]
-            t0, t1 = pts[i - 1][0], pts[i][0]
-            if p0 > 0 and p1 > 0 and t1 > t0:
-                rets.append(math.log(p1 / p0))
-                dts.append(t1 - t0)
-
-        if len(rets) < 2 or sum(dts) <= 0:
-            return 0.0
-
-        avg_dt = sum(dts) / len(dts)
-        if avg_dt <= 0:
+        win = self._window(window_s)
+        self._evict(win, (time.time() if now is None else now) - window_s)
+        if win.n < 2 or win.dt_sum <= 0:
             return 0.0
-
+        avg_dt = win.dt_sum / win.n
         # per-step std -> per-second std -> annualized
-        step_std = statistics.pstdev(rets)
-        per_sec_std = step_std / math.sqrt(avg_dt)
-        annualize = math.sqrt(365 * 24 * 60 * 60)
-        return per_sec_std * annualize
-
-
-def _spread_bps(bid: float, ask: float) -> float:
-    mid = (bid + ask) / 2.0
-    return 0.0 if mid <= 0 else (ask - bid) / mid * 1e4
-
-
-def _depth_within_bps(bids: List[List[float]], asks: List[List[float]], mid: float, bps: float) -> dict:
-    """
-    Sums notional depth within +/- bps of mid on each side, in USDT.
-    bids: [[price, size], ...] descending
-    asks: [[price, size], ...] ascending
-    """
-    if mid <= 0:
-        return dict(bid_usdt=0.0, ask_usdt=0.0)
+        step_std = math.sqrt(max(win.m2, 0.0) / win.n)
+        return step_std / math.sqrt(avg_dt) * self.ANNUALIZE
 
-    bid_cut = mid * (1 - bps / 1e4)
-    ask_cut = mid * (1 + bps / 1e4)
+    def vols(self, now: float | None = None) -> Dict[float, float]:
+        """{window_s: annualized vol} for every tracked window."""
+        now = time.time() if now is None else now
+        return {w: self.vol_ann(w, now) for w in list(self._windows)}
 
-    bid_usdt = 0.0
-    for px, sz in bids:
-        if px < bid_cut:
-            break
-        bid_usdt += float(px) * float(sz)
 
-    ask_usdt = 0.0
-    for px, sz in asks:
-        if px > ask_cut:
-            break
-        ask_usdt += float(px) * float(sz)
-
-    return dict(bid_usdt=bid_usdt, ask_usdt=ask_usdt)
-
-
-def _top_imbalance(bids: List[List[float]], asks: List[List[float]]) -> float:
-    """
-    (bid_size - ask_size) / (bid_size + ask_size)
-    """
-    if not (bids and asks):
-        return 0.0
-    bsz = float(bids[0][1])
-    asz = float(asks[0][1])
-    denom = bsz + asz + _EPS
-    return (bsz - asz) / denom
-
-
-def _binance_symbol_raw(asset_ccy: str) -> str:
-    # "ETH/USDT" -> "ETHUSDT"
-    return asset_ccy.replace("/", "")
+def _inline_session():
+    global _session
+    if _session is None:
+        _session = pooled_session()
+    return _session
 
 
 def _external_binance_metrics(asset_ccy: str) -> dict:
     """
     Optional: mainnet-only public stats (works even when you trade testnet).
-    - Taker buy/sell ratio (5m)
-    - Open interest change (5m)
-    If endpoints fail, returns empty dict.
+    Inline fallback when no MetricsRefresher is passed; returns {} on failure.
     """
-    out = {}
     try:
-        sym = _binance_symbol_raw(asset_ccy)
-        base = "https://fapi.binance.com"
-
-        # Taker long/short (buy/sell) ratio
-        try:
-            url = f"{base}/futures/data/takerlongshortRatio?symbol={sym}&interval=5m&limit=1"
-            r = requests.get(url, timeout=3)
-            d = r.json()
-            if isinstance(d, list) and d:
-                last = d[-1]
-                # Binance returns different keys across time; use whatever exists
-                ratio = float(last.get("buySellRatio") or last.get("longShortRatio") or 1.0)
-                out["taker_buy_sell_ratio_5m"] = ratio
-        except Exception:
-            pass
-
-        # Open interest hist (5m change)
-        try:
-            url = f"{base}/futures/data/openInterestHist?symbol={sym}&period=5m&limit=2"
-            r = requests.get(url, timeout=3)
-            d = r.json()
-            if isinstance(d, list) and len(d) >= 2:
-                prev = float(d[-2].get("sumOpenInterest", 0.0))
-                cur = float(d[-1].get("sumOpenInterest", 0.0))
-                if prev > 0:
-                    out["oi_change_pct_5m"] = (cur - prev) / prev
-                out["oi_sum"] = cur
-        except Exception:
-            pass
-
+        return fetch_stats(_inline_session(), asset_ccy)
     except Exception:
         # swallow — features are optional
-        return out
+        return {}
 
-    return out
 
+def _market_id(ex, symbol: str) -> str:
+    try:
+        return ex.market(symbol)["id"]
+    except Exception:
+        # "ETH/USDT:USDT" -> "ETHUSDT"
+        return symbol.split(":")[0].replace("/", "")
 
-def _basis_features(ex, symbol: str) -> dict:
-    """
-    Basis (mark - index)/index in bps using fetch_ticker() if available.
-    """
+
+def _inline_basis(ex, symbol: str) -> dict:
+    """Basis from the venue's premiumIndex (what MetricsRefresher polls); zeros on failure."""
     try:
-        t = ex.fetch_ticker(symbol)
-        info = t.get("info", {}) if isinstance(t, dict) else {}
-        mark = float(info.get("markPrice") or t.get("mark", 0.0) or t.get("last", 0.0) or 0.0)
-        index = float(info.get("indexPrice") or t.get("index", 0.0) or 0.0)
-        basis_bps = 0.0
-        if mark > 0 and index > 0:
-            basis_bps = (mark - index) / index * 1e4
-        return {"basis_bps": basis_bps, "mark_px": mark, "index_px": index}
+        return fetch_basis(_inline_session(), ex.urls["api"]["fapiPublic"].rstrip("/"), _market_id(ex, symbol))
     except Exception:
         return {"basis_bps": 0.0, "mark_px": 0.0, "index_px": 0.0}
 
@@ -184,43 +196,56 @@ def compute_features(
     ex,
     symbol: str,
     asset_ccy: str,
-    bids: List[List[float]],
-    asks: List[List[float]],
+    book: BookSnapshot,
     vol: VolEstimator,
+    metrics: Optional[MetricsRefresher] = None,
 ) -> Dict:
     """
     Aggregate microstructure + external features into a dict safe for LLM.
+    With `metrics` (a started MetricsRefresher) basis/taker/OI come from its
+    cache with basis_age_s / stats_age_s, and no network call is made here;
+    without it they are fetched inline.
     """
-    if not (bids and asks):
+    if not book.depth:
         return {}
 
-    bid0, ask0 = float(bids[0][0]), float(asks[0][0])
+    bid0, ask0 = book.best_bid, book.best_ask
     mid = (bid0 + ask0) / 2.0
     vol.update(mid)
 
-    spread = _spread_bps(bid0, ask0)
-    imb_top = _top_imbalance(bids, asks)
-
-    depth10 = _depth_within_bps(bids, asks, mid, 10.0)
-    depth50 = _depth_within_bps(bids, asks, mid, 50.0)
+    # spread, imbalances, depth at 10/50 bps, microprice and slope in one pass over the book
+    st = snapshot_stats(book, bps=DEPTH_BPS, levels=(1, 5))
+    spread = st.spread_bps if mid > 0 else 0.0
+    imb_top, imb_top5 = st.imbalance
+    bid10, bid50 = st.depth_bid
+    ask10, ask50 = st.depth_ask
 
     # normalized depth imbalance (within 10 bps)
-    denom10 = depth10["bid_usdt"] + depth10["ask_usdt"] + _EPS
-    depth_imb10 = (depth10["bid_usdt"] - depth10["ask_usdt"]) / denom10
+    depth_imb10 = (bid10 - ask10) / (bid10 + ask10 + _EPS)
 
-    basis = _basis_features(ex, symbol)
-    ext = _external_binance_metrics(asset_ccy)
+    if metrics is not None:
+        basis, ext = {}, metrics.get(_market_id(ex, symbol), asset_ccy)
+    else:
+        basis = _inline_basis(ex, symbol)
+        ext = _external_binance_metrics(asset_ccy)
 
     return {
         "mid_px": mid,
         "spread_bps": spread,
         "imbalance_top": imb_top,
-        "depth10_bid_usdt": depth10["bid_usdt"],
-        "depth10_ask_usdt": depth10["ask_usdt"],
+        "depth10_bid_usdt": bid10,
+        "depth10_ask_usdt": ask10,
         "depth_imb10": depth_imb10,
-        "depth50_bid_usdt": depth50["bid_usdt"],
-        "depth50_ask_usdt": depth50["ask_usdt"],
+        "depth50_bid_usdt": bid50,
+        "depth50_ask_usdt": ask50,
+        "microprice": st.microprice,
+        "weighted_mid5": st.weighted_mid,
+        "imbalance_top5": imb_top5,
+        "book_slope_bid": st.slope_bid,
+        "book_slope_ask": st.slope_ask,
         "vol_1m_ann": vol.vol_ann(window_s=60.0),
+        "vol_5m_ann": vol.vol_ann(window_s=300.0),
+        "vol_1h_ann": vol.vol_ann(window_s=3600.0),
         **basis,
         **ext,
     }
\ No newline at end of file
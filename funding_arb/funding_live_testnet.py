@@ -1,17 +1,25 @@
 import time, json, os
 from dotenv import load_dotenv
 
+from funding_arb.data.book import BookSnapshot
+from funding_arb.data.clients import usdt_perp_for_base
 from funding_arb.data.funding import FundingFeed, funding_per_day_from_8h
 from funding_arb.exec.bandit_exec import BanditExecutor
+from funding_arb.exec.outcome_log import log_outcome
+from funding_arb.exec.paired import PairedExecutor, hedge_from_env
 from funding_arb.exec.real import BinanceUSDM_TestnetTrader
 from funding_arb.paper.positions import PaperBook
 from funding_arb.risk.guards import RiskConfig, RiskState
 from funding_arb.notify import send_telegram, fmt_status, fmt_open, fmt_close, fmt_risk
-from funding_arb.db import SessionLocal
 from funding_arb.loggers import log_funding, log_signal, log_position
+from funding_arb.writer import get_writer
 
 # NEW features + LLM
-from funding_arb.features import VolEstimator, compute_features
+from funding_arb.data.metrics import MetricsRefresher
+from funding_arb.features import LLM_FEATURE_COLUMNS, VolEstimator, compute_features
+from funding_arb.feature_store import FeatureStore
+from funding_arb.init_db import init_db
+from funding_arb.ml.features import EXEC_FEATURE_COLUMNS
 from funding_arb.llm.provider import get_provider
 from funding_arb.llm.prompt import build_messages
 
@@ -28,24 +36,47 @@ def spread_bps_from_ob(bid: float, ask: float) -> float:
     mid = (bid + ask) / 2.0
     return 0.0 if mid <= 0 else (ask - bid) / mid * 1e4
 
-def est_min_notional(ex, symbol: str) -> float:
-    m = ex.market(symbol)
-    min_amt = (m.get("limits", {}).get("amount", {}) or {}).get("min") or 0.0
-    ob = ex.fetch_order_book(symbol, limit=5)
-    bids, asks = ob.get("bids", []), ob.get("asks", [])
-    mid = (bids[0][0] + asks[0][0]) / 2.0 if bids and asks else 0.0
-    approx = float(min_amt) * float(mid) if mid else 0.0
-    return max(20.0, approx)
-
 def map_asset_to_testnet_symbol(ex, asset: str) -> str:
-    base = asset.split("/")[0].upper()
-    prefer = f"{base}/USDT:USDT"
-    if prefer in ex.symbols:
-        return prefer
-    for s in ex.symbols:
-        if s.startswith(f"{base}/") and s.endswith(":USDT"):
-            return s
-    return ex.symbols[0]
+    return usdt_perp_for_base(ex, asset.split("/")[0]) or ex.symbols[0]
+
+def hedge_symbol_for(hedge_ex, perp_ex, symbol: str):
+    """
+    The same base's USDT perp on the hedge venue, or None (trade perp-only)
+    when the venue does not list it or it is the perp itself (HEDGE_EXCHANGE
+    pointing at the perp venue: the two legs would cancel out).
+    """
+    hedge = usdt_perp_for_base(hedge_ex, symbol.split("/")[0])
+    if hedge is None or (hedge == symbol and hedge_ex.id == perp_ex.id):
+        return None
+    return hedge
+
+def settle_open(real: dict, pairs, symbol: str, hedge_symbol, side: str) -> bool:
+    """
+    True when an open left a position to book. A pair that stayed unhedged
+    (a leg and its top-up failed) is flattened leg by leg, reduce-only, and
+    alerted instead of being left open untracked.
+    """
+    if real.get("status") == "unhedged":
+        print(f"[risk] unhedged open {symbol} {real['perp_filled']} / {hedge_symbol} {real['hedge_filled']}; flattening")
+        res = pairs.submit_unwind(real, symbol, hedge_symbol, side).result()
+        send_telegram(f"UNHEDGED open on {symbol}/{hedge_symbol} flattened: {[r['status'] for r in res]}")
+        return False
+    return bool(real.get("price"))
+
+def log_real_outcome(real: dict, symbol: str, action: int, side: str, ts_ms: int, deadline_ms: int):
+    """exec_outcomes row for a live order (the perp leg of a pair), with the book age it was priced from."""
+    leg = real.get("perp") or real
+    fill, mid = real.get("price"), leg.get("mid")
+    if not (fill and mid) or leg.get("unpriced"):
+        return   # no fill, or a fill the venue never priced: its cost is unknown
+    cost_bps = ((fill - mid) / mid if side == "buy" else (mid - fill) / mid) * 1e4
+    fill_ms = real.get("perp_fill_ms")
+    log_outcome(symbol, action, side, dict(
+        fill_px=float(fill), bench_mid_px=float(mid),
+        realized_cost_bps=float(cost_bps), fee_bps=0.0,
+        partial_fill=0, time_to_fill_ms=deadline_ms if fill_ms is None else int(fill_ms),
+        snapshot_age_ms=real.get("snapshot_age_ms"),
+    ), ts_ms=ts_ms)
 
 def fallback_rule_intent(bpsd_raw: float, pos_open: bool) -> str:
     if not pos_open and abs(bpsd_raw) >= OPEN_TH:
@@ -90,8 +121,11 @@ def main():
     print("Funding LIVE (testnet) — LLM supervisor + bandit + risk + telegram + logging")
 
     fund   = FundingFeed()
-    bandit = BanditExecutor()
+    init_db()
+    bandit = BanditExecutor(feature_store=FeatureStore("exec", EXEC_FEATURE_COLUMNS))
     trader = BinanceUSDM_TestnetTrader()
+    hedge_om = hedge_from_env()  # HEDGE_EXCHANGE set: both legs go out together, else perp only
+    pairs = PairedExecutor(trader.orders, hedge_om) if hedge_om else None
     book   = PaperBook()
     risk   = RiskState(RiskConfig(
         max_notional=2000.0, max_runtime_minutes=180,
@@ -104,14 +138,18 @@ def main():
     last_llm_ts = 0.0
     cached_decision = {"intent": "HOLD", "asset": "ETH/USDT", "confidence": 0.0, "rationale": "init"}
     vol = VolEstimator()
+    metrics = MetricsRefresher.for_exchange(trader.ex).start()  # basis/taker/OI off the tick path
+    llm_store = FeatureStore("llm", LLM_FEATURE_COLUMNS)
 
     # start ETH by default
     asset  = "ETH/USDT"
     symbol = map_asset_to_testnet_symbol(trader.ex, asset)
     trader.set_leverage(symbol, 1)
-    floor = est_min_notional(trader.ex, symbol)
+    floor = trader.rules.min_notional(symbol, 0.0)  # min-qty term joins once a book is in (step 2)
     notional = max(25.0, floor * 1.05)
     print(f"Using testnet symbol: {symbol}")
+    if pairs:
+        print(f"[info] hedge leg on {hedge_om.venue.id}")
     print(f"[info] using notional ≈ {notional:.2f} USDT (floor~{floor:.2f})")
 
     perp_side       = None
@@ -119,6 +157,9 @@ def main():
     last_status_ts  = 0.0
     last_tele_ts    = 0.0  # muted in code below, but keeping if you re-enable
     last_open_ts    = 0.0
+    pending_open    = None  # (future, side, action, hedge_symbol, ts_ms) while an open is working on the order manager
+    pos_hedge       = None  # hedge symbol of the open position; None = perp-only
+    pending_close   = None  # (future, side, ts_ms)
     end_time        = time.time() + 300  # extend/daemonize on VPS as you like
 
     while time.time() < end_time:
@@ -141,30 +182,32 @@ def main():
                 asset = "ETH/USDT"; bpsd_raw = bpsd_eth
 
         # switch symbol only when flat
-        if not book.pos.is_open:
+        if not book.pos.is_open and pending_open is None:
             new_symbol = map_asset_to_testnet_symbol(trader.ex, asset)
             if new_symbol != symbol:
                 symbol = new_symbol
                 trader.set_leverage(symbol, 1)
-                floor = est_min_notional(trader.ex, symbol)
-                notional = max(25.0, floor * 1.05)
                 vol.reset()  # reset vol after asset/symbol switch
-                print(f"[switch] symbol={symbol} (asset={asset}); notional≈{notional:.2f}")
+                print(f"[switch] symbol={symbol} (asset={asset})")
 
         # 2) order book
         try:
             ob = trader.ex.fetch_order_book(symbol, limit=25)
-            bids, asks = ob.get("bids", []), ob.get("asks", [])
+            snap = BookSnapshot.from_levels(symbol, ob.get("bids", []), ob.get("asks", []))
         except Exception:
             time.sleep(0.25)
             continue
-        if not (bids and asks):
+        if not snap.depth:
             time.sleep(0.25)
             continue
 
-        bid, ask = bids[0][0], asks[0][0]
+        bid, ask = snap.best_bid, snap.best_ask
         spread_bps = spread_bps_from_ob(bid, ask)
         vol.update((bid + ask) / 2.0)
+        if not book.pos.is_open and pending_open is None:
+            # size from the rule table and this book: no extra market lookup or book fetch
+            floor = trader.rules.min_notional(symbol, (bid + ask) / 2.0)
+            notional = max(25.0, floor * 1.05)
 
         # 3) paper accrual
         now = time.time()
@@ -183,14 +226,34 @@ def main():
         if halt:
             print(f"RISK HALT: {reason}")
             send_telegram(fmt_risk(reason, est_pnl))
+            if pending_open is not None:
+                fut, side, action, hedge_symbol, ts_ms = pending_open
+                real = fut.result()
+                log_real_outcome(real, symbol, action, side, ts_ms, 1200)
+                if settle_open(real, pairs, symbol, hedge_symbol, side):
+                    perp_side = "short" if side == "sell" else "long"
+                    pos_hedge = hedge_symbol
+                    book.open_delta_neutral(symbol, notional_usdt=notional)
+                pending_open = None
+            if pending_close is not None:
+                fut, side, ts_ms = pending_close
+                log_real_outcome(fut.result(), symbol, 2, side, ts_ms, 1200)
             if book.pos.is_open:
                 side = "buy" if perp_side == "short" else "sell"
-                trader.execute_action(2, symbol, side, notional, deadline_ms=1200, reduce_only=True)
-                book.close(); perp_side = None
+                ts_ms = int(time.time() * 1000)
+                if pos_hedge:
+                    real = trader.submit_pair(pairs, 2, symbol, pos_hedge, side, notional, deadline_ms=1200,
+                                              reduce_only=True, book=snap).result()
+                else:
+                    real = trader.execute_action(2, symbol, side, notional, deadline_ms=1200, reduce_only=True,
+                                                 book=snap)
+                log_real_outcome(real, symbol, 2, side, ts_ms, 1200)
+                book.close(); perp_side = None; pos_hedge = None
             break
 
         # 5) FEATURES (the new part)
-        feats = compute_features(trader.ex, symbol, asset, bids, asks, vol)
+        feats = compute_features(trader.ex, symbol, asset, snap, vol, metrics=metrics)
+        llm_store.append(symbol, snap.ts_ms, feats)
 
         # 6) LLM decision
         do_llm = (now - last_llm_ts) >= LLM_PERIOD_S
@@ -236,54 +299,95 @@ def main():
             intent = "OPEN_SHORT" if bpsd_raw > 0 else "OPEN_LONG"
             debug_print_llm("override_to_rule", {"intent": intent, "bpsd_raw": bpsd_raw})
 
-        with SessionLocal() as s:
-            log_signal(s, symbol, intent, bpsd_raw); s.commit()
+        log_signal(symbol, intent, bpsd_raw)
 
-        # 7) act
-        if intent in ("OPEN_SHORT","OPEN_LONG") and not book.pos.is_open:
-            side = "sell" if intent == "OPEN_SHORT" else "buy"
-            action, ts_ms, _ = bandit.decide_and_execute(
-                {"bids":bids,"asks":asks,"latency_ms":0}, symbol, side=side, deadline_ms=1200
-            )
-            if action is None or action == 3:
-                action = 2
-            real = trader.execute_action(action, symbol, side, notional, deadline_ms=1200, reduce_only=False)
-            if real.get("price"):
+        # 7) act: orders work on the trader's order manager; the loop keeps ticking
+        # and books the result once the future resolves
+        if pending_open is not None and pending_open[0].done():
+            fut, side, action, hedge_symbol, ts_ms = pending_open
+            pending_open = None
+            real = fut.result()
+            log_real_outcome(real, symbol, action, side, ts_ms, 1200)
+            if settle_open(real, pairs, symbol, hedge_symbol, side):
                 perp_side = "short" if side == "sell" else "long"
+                pos_hedge = hedge_symbol
                 book.open_delta_neutral(symbol, notional_usdt=notional)
-                print(f"OPEN {perp_side} ({asset}): bpsd={bpsd_raw:.2f}, action={action}, status={real['status']}")
+                print(f"OPEN {perp_side} ({asset}): bpsd={bpsd_raw:.2f}, action={action}, status={real['status']}"
+                      + f", book_age={real.get('snapshot_age_ms')} ms"
+                      + (f", legging={real['legging_ms']:.0f} ms" if real.get("legging_ms") is not None else ""))
                 send_telegram(fmt_open(bpsd_raw, action, 0.0))
                 last_open_ts = time.time()
 
-        elif intent == "CLOSE" and book.pos.is_open:
-            side = "buy" if perp_side == "short" else "sell"
-            real = trader.execute_action(2, symbol, side, notional, deadline_ms=1200, reduce_only=True)
+        if pending_close is not None and pending_close[0].done():
+            fut, side, ts_ms = pending_close
+            pending_close = None
+            real = fut.result()
+            log_real_outcome(real, symbol, 2, side, ts_ms, 1200)
+            if real.get("status") == "unhedged":
+                # one leg closed, the other did not: keep the alert loud, the position needs a hand
+                send_telegram(f"UNHEDGED close on {symbol}/{pos_hedge}: perp {real['perp_filled']}, "
+                              f"hedge {real['hedge_filled']} closed")
             if real.get("price"):
                 print(f"CLOSE {perp_side} (reduce-only {side}) | |bpsd|→{abs(bpsd_raw):.2f}")
                 send_telegram(fmt_close(bpsd_raw, 2, 0.0))
-                book.close(); perp_side = None
+                book.close(); perp_side = None; pos_hedge = None
+
+        if pending_open is not None or pending_close is not None:
+            pass  # one order in flight at a time
+        elif intent in ("OPEN_SHORT","OPEN_LONG") and not book.pos.is_open:
+            side = "sell" if intent == "OPEN_SHORT" else "buy"
+            action, ts_ms, _ = bandit.decide_and_execute(snap, symbol, side=side, deadline_ms=1200)
+            if action is None or action == 3:
+                action = 2
+            ts_ms = ts_ms or int(time.time() * 1000)
+            hedge_symbol = hedge_symbol_for(hedge_om.venue, trader.ex, symbol) if pairs else None
+            if pairs and hedge_symbol is None:
+                print(f"[warn] no hedge instrument for {symbol} on {hedge_om.venue.id}; opening perp-only")
+            if hedge_symbol:
+                fut = trader.submit_pair(pairs, action, symbol, hedge_symbol, side, notional, deadline_ms=1200,
+                                         book=snap)
+            else:
+                fut = trader.submit_action(action, symbol, side, notional, deadline_ms=1200, reduce_only=False,
+                                           book=snap)
+            pending_open = (fut, side, action, hedge_symbol, ts_ms)
+
+        elif intent == "CLOSE" and book.pos.is_open:
+            side = "buy" if perp_side == "short" else "sell"
+            if pos_hedge:
+                fut = trader.submit_pair(pairs, 2, symbol, pos_hedge, side, notional, deadline_ms=1200,
+                                         reduce_only=True, book=snap)
+            else:
+                fut = trader.submit_action(2, symbol, side, notional, deadline_ms=1200, reduce_only=True, book=snap)
+            pending_close = (fut, side, int(time.time() * 1000))
 
         # 8) status + persist once per second (telegram heartbeat muted)
         if now - last_status_ts >= 1.0:
             print(
                 f"status: open={book.pos.is_open}, accrued={book.pos.accrued_funding_bps:.4f} bps, "
                 f"est_pnl={book.realized_pnl_usdt():.6f} USDT, bpsd={bpsd_raw:.2f}, "
-                f"side={perp_side}, asset={asset}, symbol={symbol}, llm={'on' if llm.available() else 'off'}"
+                f"side={perp_side}, asset={asset}, symbol={symbol}, llm={'on' if llm.available() else 'off'}, "
+                f"db_queue={get_writer().queue_depth()}"
+            )
+            log_funding(
+                asset,
+                (r8h_btc if asset=='BTC/USDT' else r8h_eth),
+                funding_per_day_from_8h(r8h_btc if asset=='BTC/USDT' else r8h_eth),
+                bpsd_raw
             )
-            with SessionLocal() as s:
-                log_funding(
-                    s, asset,
-                    (r8h_btc if asset=='BTC/USDT' else r8h_eth),
-                    funding_per_day_from_8h(r8h_btc if asset=='BTC/USDT' else r8h_eth),
-                    bpsd_raw
-                )
-                log_position(s, symbol, book.pos.is_open, book.pos.notional_usdt,
-                             book.pos.accrued_funding_bps, book.realized_pnl_usdt())
-                s.commit()
+            log_position(symbol, book.pos.is_open, book.pos.notional_usdt,
+                         book.pos.accrued_funding_bps, book.realized_pnl_usdt())
             last_status_ts = now
 
         time.sleep(0.25)
 
+    for pending in (pending_open, pending_close):
+        if pending is not None:
+            pending[0].result()  # let in-flight orders finish before shutting the manager down
+    trader.close()
+    if hedge_om:
+        hedge_om.stop()
+    metrics.stop()
+    bandit.save_checkpoint()
     print("\n=== SUMMARY ===")
     print(
         f"open={book.pos.is_open}, accrued={book.pos.accrued_funding_bps:.3f} bps, "
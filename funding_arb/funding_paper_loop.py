@@ -1,10 +1,10 @@
 import time
+from funding_arb.data.book import BookSnapshot
 from funding_arb.data.exchanges import BinanceUSDM_Public
 from funding_arb.data.funding import FundingFeed, funding_per_day_from_8h
 from funding_arb.strategy.funding_signal import FundingSignal, SignalConfig
 from funding_arb.exec.bandit_exec import BanditExecutor
 from funding_arb.paper.positions import PaperBook
-from funding_arb.db import SessionLocal
 from funding_arb.loggers import log_funding, log_signal, log_position
 from funding_arb.risk.guards import RiskConfig, RiskState
 
@@ -39,27 +39,23 @@ def main():
         bpsd = net_bps_day(f_day)
 
         # log funding tick
-        with SessionLocal() as s:
-            log_funding(s, symbol, rate8h, f_day, bpsd)
-            s.commit()
+        log_funding(symbol, rate8h, f_day, bpsd)
 
         # 2) decide open/close
         decision, _ = signal.decide(bpsd)
 
         # log signal
-        with SessionLocal() as s:
-            log_signal(s, symbol, decision, bpsd)
-            s.commit()
+        log_signal(symbol, decision, bpsd)
 
         # 3) get current LOB & let bandit pick execution (paper)
         # risk: record API outcome (success if we have both sides populated)
         try:
             lob = lob_ex.fetch_lob(symbol, depth=5)
             now_ms = int(time.time() * 1000)
-            ok = bool(lob["bids"] and lob["asks"])
+            ok = lob.depth > 0
             risk.record_api(ok=ok, ts_ms=now_ms)
         except Exception:
-            lob = {"bids": [], "asks": [], "latency_ms": 0}
+            lob = BookSnapshot.empty(symbol)
             now_ms = int(time.time() * 1000)
             risk.record_api(ok=False, ts_ms=now_ms)
 
@@ -113,16 +109,13 @@ def main():
                 f"accrued={book.pos.accrued_funding_bps:.4f} bps, "
                 f"est_pnl={book.realized_pnl_usdt():.6f} USDT"
             )
-            with SessionLocal() as s:
-                log_position(
-                    s,
-                    symbol,
-                    book.pos.is_open,
-                    book.pos.notional_usdt,
-                    book.pos.accrued_funding_bps,
-                    book.realized_pnl_usdt(),
-                )
-                s.commit()
+            log_position(
+                symbol,
+                book.pos.is_open,
+                book.pos.notional_usdt,
+                book.pos.accrued_funding_bps,
+                book.realized_pnl_usdt(),
+            )
             last_status_ts = now
 
         time.sleep(0.25)
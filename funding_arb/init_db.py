@@ -1,5 +1,7 @@
 from .db import engine, Base
 from . import models  # noqa: F401 (import side-effect registers models with Base)
+from .migrations import migrate_all
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    migrate_all(engine)
+    Base.metadata.create_all(bind=engine)
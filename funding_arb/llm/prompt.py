@@ -11,9 +11,10 @@ def build_messages(ctx: dict):
           mid_px, spread_bps, imbalance_top,
           depth10_bid_usdt, depth10_ask_usdt, depth_imb10,
           depth50_bid_usdt, depth50_ask_usdt,
-          vol_1m_ann,
-          basis_bps, mark_px, index_px,
-          taker_buy_sell_ratio_5m?, oi_change_pct_5m?, oi_sum?
+          microprice, weighted_mid5, imbalance_top5, book_slope_bid, book_slope_ask,
+          vol_1m_ann, vol_5m_ann, vol_1h_ann,
+          basis_bps, mark_px, index_px, basis_age_s?,
+          taker_buy_sell_ratio_5m?, oi_change_pct_5m?, oi_sum?, stats_age_s?
         )
     Output JSON (strict):
       {"intent": "OPEN_SHORT|OPEN_LONG|CLOSE|HOLD",
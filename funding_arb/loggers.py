@@ -1,9 +1,12 @@
 import time
-from sqlalchemy.orm import Session
 from funding_arb.models import FundingTick, SignalTick, PositionSnap
+from funding_arb.writer import get_writer
 
-def log_funding(session: Session, symbol: str, rate8h: float, rate_day: float, bps_day_net: float):
-    session.add(FundingTick(
+# All loggers enqueue onto the background writer (funding_arb.writer); nothing
+# here touches the database on the calling thread.
+
+def log_funding(symbol: str, rate8h: float, rate_day: float, bps_day_net: float):
+    get_writer().submit(FundingTick.__table__, dict(
         ts_ms=int(time.time()*1000),
         symbol=symbol,
         rate_8h=rate8h,
@@ -11,20 +14,20 @@ def log_funding(session: Session, symbol: str, rate8h: float, rate_day: float, b
         bps_day_net=bps_day_net,
     ))
 
-def log_signal(session: Session, symbol: str, decision: str, bps_day_net: float):
-    session.add(SignalTick(
+def log_signal(symbol: str, decision: str, bps_day_net: float):
+    get_writer().submit(SignalTick.__table__, dict(
         ts_ms=int(time.time()*1000),
         symbol=symbol,
         decision=decision,
         bps_day_net=bps_day_net,
     ))
 
-def log_position(session: Session, symbol: str, is_open: bool, notional: float, accrued_bps: float, est_pnl: float):
-    session.add(PositionSnap(
+def log_position(symbol: str, is_open: bool, notional: float, accrued_bps: float, est_pnl: float):
+    get_writer().submit(PositionSnap.__table__, dict(
         ts_ms=int(time.time()*1000),
         symbol=symbol,
         is_open=1 if is_open else 0,
         notional_usdt=notional,
         accrued_bps=accrued_bps,
         est_pnl_usdt=est_pnl,
-    ))
\ No newline at end of file
+    ))
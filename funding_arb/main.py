@@ -1,27 +1,43 @@
+import asyncio
+import os
 import time
-from .data.exchanges import BinanceUSDM_Public
-from .db import SessionLocal
+from .data.collector import AsyncLOBCollector
 from .init_db import init_db
 from .persist import save_lob
+from .writer import get_writer
+
+SYMBOLS = [s.strip() for s in os.getenv("LOB_SYMBOLS", "BTC/USDT").split(",") if s.strip()]
+REPORT_EVERY_S = 5.0
+
+async def _run(symbols, interval_s, depth):
+    collector = AsyncLOBCollector(symbols, interval_s=interval_s, depth=depth)
+    last_report = time.time()
+    try:
+        await collector.start()
+        while True:
+            lob = await collector.queue.get()
+            print(f"{lob.symbol} bid={lob.best_bid} ask={lob.best_ask} latency={lob.latency_ms}ms")
+            save_lob(lob)  # write-behind: enqueue only
+            if time.time() - last_report >= REPORT_EVERY_S:
+                print(f"[collector] queue={collector.queue.qsize()} writer={get_writer().stats()}")
+                for line in collector.report():
+                    print(f"[collector] {line}")
+                last_report = time.time()
+    finally:
+        await collector.close()
+        get_writer().flush()
 
 def run():
     print("MAIN MODULE LOADED")
     init_db()
-    ex = BinanceUSDM_Public()
-    symbol = "BTC/USDT"
     interval_s = 0.25  # 250 ms
     depth = 5
 
-    print("Streaming LOB every 250 ms (Ctrl+C to stop)...")
-    while True:
-        lob = ex.fetch_lob(symbol, depth=depth)
-        print(f"{symbol} bids[0]={lob['bids'][0] if lob['bids'] else None} "
-              f"asks[0]={lob['asks'][0] if lob['asks'] else None} "
-              f"latency={lob['latency_ms']}ms")
-        with SessionLocal() as s:
-            save_lob(s, symbol, lob["bids"], lob["asks"], lob["latency_ms"])
-            s.commit()
-        time.sleep(interval_s)
+    print(f"Streaming LOB every 250 ms for {', '.join(SYMBOLS)} (Ctrl+C to stop)...")
+    try:
+        asyncio.run(_run(SYMBOLS, interval_s, depth))
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    run()
@@ -0,0 +1,209 @@
+# funding_arb/microstructure.py
+"""
+One-pass order-book statistics shared by features.compute_features and
+ml.features.FeatureBuilder. One live book (1-D lists or arrays, e.g. a
+BookSnapshot) is walked in plain Python up to LIST_PREFIX levels; a history
+of books ((n, depth) arrays, NaN padded) is vectorized: each side is
+multiplied and cumulatively summed once, and every threshold / level is a
+lookup into those cumulative arrays.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+from operator import mul, neg
+from typing import Sequence
+
+import numpy as np
+
+from funding_arb.data.book import BookSnapshot
+
+LIST_PREFIX = 64  # single book up to this depth: plain Python floats (NumPy call overhead dominates)
+_NAN = float("nan")
+
+
+@dataclass(slots=True)
+class BookStats:
+    """
+    One book: floats, and lists for the per-level / per-threshold fields.
+    A batch: (n,) arrays, and (n, k) for those fields.
+    """
+    mid: np.ndarray
+    spread_bps: np.ndarray      # (ask - bid) / mid * 1e4, unclamped
+    microprice: np.ndarray      # top-of-book, size-weighted toward the thinner side
+    weighted_mid: np.ndarray    # mean of bid and ask VWAP over the top `levels[-1]` levels
+    imbalance: np.ndarray       # (bid_sz - ask_sz) / (bid_sz + ask_sz) summed over top k, per k in `levels`
+    depth_bid: np.ndarray       # bid notional with px >= mid * (1 - bps/1e4), per threshold
+    depth_ask: np.ndarray       # ask notional with px <= mid * (1 + bps/1e4), per threshold
+    slope_bid: np.ndarray       # bid size per bps of distance from mid over the top `levels[-1]` levels
+    slope_ask: np.ndarray
+
+
+def _cum(a: np.ndarray) -> np.ndarray:
+    """Running sum with a leading zero, so cum[..., k] is the sum of the first k levels."""
+    out = np.zeros(a.shape[:-1] + (a.shape[-1] + 1,))
+    np.cumsum(a, axis=-1, out=out[..., 1:])
+    return out
+
+
+def _div(a: float, b: float) -> float:
+    return a / b if b else (float("nan") if a == a else a)
+
+
+def _priced(px: list) -> int:
+    """Levels before the NaN padding (bisect needs a NaN-free range)."""
+    n = len(px)
+    while n and px[n - 1] != px[n - 1]:
+        n -= 1
+    return n
+
+
+def _book_stats_list(bid_px: list, bid_sz: list, ask_px: list, ask_sz: list, bps: list, levels: list) -> BookStats:
+    """One short book as Python lists: band edges by bisect, then only the prefix sums that are read."""
+    nb, na = len(bid_px), len(ask_px)
+    bid0, bsz0 = (bid_px[0], bid_sz[0]) if nb else (_NAN, 0.0)
+    ask0, asz0 = (ask_px[0], ask_sz[0]) if na else (_NAN, 0.0)
+    mid = (bid0 + ask0) / 2.0
+    if bps and mid > 0:
+        hb, ha = _priced(bid_px), _priced(ask_px)
+        ib = [bisect_right(bid_px, -mid * (1 - x / 1e4), 0, hb, key=neg) for x in bps]
+        ia = [bisect_right(ask_px, mid * (1 + x / 1e4), 0, ha) for x in bps]
+    else:
+        ib = ia = [0] * len(bps)
+    # running sums added left to right (accumulate), over just the prefix a level or band reads
+    top = max(levels)
+    kb, ka = min(levels[-1], nb), min(levels[-1], na)
+    cb_sz = list(accumulate(bid_sz[:top], initial=0.0))
+    ca_sz = list(accumulate(ask_sz[:top], initial=0.0))
+    cb_nt = list(accumulate(map(mul, bid_px[:max([kb, *ib])], bid_sz), initial=0.0))
+    ca_nt = list(accumulate(map(mul, ask_px[:max([ka, *ia])], ask_sz), initial=0.0))
+
+    imbalance = []
+    for k in levels:
+        b, a = cb_sz[min(k, nb)], ca_sz[min(k, na)]
+        imbalance.append(0.0 if b + a == 0 else (b - a) / (b + a))
+    sb, nt_b, sa, nt_a = cb_sz[kb], cb_nt[kb], ca_sz[ka], ca_nt[ka]
+    return BookStats(
+        mid=mid, spread_bps=_div(ask0 - bid0, mid) * 1e4,
+        microprice=_div(bid0 * asz0 + ask0 * bsz0, bsz0 + asz0),
+        weighted_mid=((_div(nt_b, sb) if kb else _NAN) + (_div(nt_a, sa) if ka else _NAN)) / 2.0,
+        imbalance=imbalance, depth_bid=[cb_nt[i] for i in ib], depth_ask=[ca_nt[i] for i in ia],
+        slope_bid=_div(sb, _div(mid - bid_px[kb - 1], mid) * 1e4) if kb else _NAN,
+        slope_ask=_div(sa, _div(ask_px[ka - 1] - mid, mid) * 1e4) if ka else _NAN)
+
+
+def _book_stats_1d(bid_px, bid_sz, ask_px, ask_sz, bps: list, levels) -> BookStats:
+    """One deep book (more than LIST_PREFIX levels): NumPy band search and prefix sums."""
+    nb, na = len(bid_px), len(ask_px)
+    nan = _NAN
+    bid0 = float(bid_px[0]) if nb else nan
+    ask0 = float(ask_px[0]) if na else nan
+    bsz0 = float(bid_sz[0]) if nb else 0.0
+    asz0 = float(ask_sz[0]) if na else 0.0
+    mid = (bid0 + ask0) / 2.0
+    spread_bps = _div(ask0 - bid0, mid) * 1e4
+    microprice = _div(bid0 * asz0 + ask0 * bsz0, bsz0 + asz0)
+
+    # levels inside each band (sorted sides, so a count); only that prefix is summed
+    kb, ka = min(levels[-1], nb), min(levels[-1], na)
+    top = max(levels)
+    if bps and mid > 0:
+        ib = np.searchsorted(-bid_px, [-mid * (1 - x / 1e4) for x in bps], side="right").tolist()
+        ia = np.searchsorted(ask_px, [mid * (1 + x / 1e4) for x in bps], side="right").tolist()
+    else:
+        ib = ia = [0] * len(bps)
+    pb, pa = max([min(top, nb), *ib]), max([min(top, na), *ia])
+    # rows: bid size, bid notional, ask size, ask notional (zero-padded past each side's prefix)
+    w = np.zeros((4, max(pb, pa) + 1))
+    w[0, 1:pb + 1] = bid_sz[:pb]
+    np.multiply(bid_px[:pb], bid_sz[:pb], out=w[1, 1:pb + 1])
+    w[2, 1:pa + 1] = ask_sz[:pa]
+    np.multiply(ask_px[:pa], ask_sz[:pa], out=w[3, 1:pa + 1])
+    # read back only the entries used, in one take (a whole deep row as Python floats costs more than the sums)
+    m, nl, nt = w.shape[1], len(levels), len(ib)
+    at = [*(min(k, nb) for k in levels), *(2 * m + min(k, na) for k in levels), kb, m + kb, 2 * m + ka, 3 * m + ka,
+          *(m + i for i in ib), *(3 * m + i for i in ia)]
+    got = np.cumsum(w, axis=1).take(at).tolist()
+    cb_sz, ca_sz, (sb, nt_b, sa, nt_a) = got[:nl], got[nl:2 * nl], got[2 * nl:2 * nl + 4]
+    depth_bid, depth_ask = got[2 * nl + 4:2 * nl + 4 + nt], got[2 * nl + 4 + nt:]
+
+    imbalance = []
+    for b, a in zip(cb_sz, ca_sz):
+        imbalance.append(0.0 if b + a == 0 else (b - a) / (b + a))
+
+    weighted_mid = ((_div(nt_b, sb) if kb else nan) + (_div(nt_a, sa) if ka else nan)) / 2.0
+    slope_bid = _div(sb, _div(mid - float(bid_px[kb - 1]), mid) * 1e4) if kb else nan
+    slope_ask = _div(sa, _div(float(ask_px[ka - 1]) - mid, mid) * 1e4) if ka else nan
+
+    return BookStats(mid=mid, spread_bps=spread_bps, microprice=microprice, weighted_mid=weighted_mid,
+                     imbalance=imbalance, depth_bid=depth_bid, depth_ask=depth_ask,
+                     slope_bid=slope_bid, slope_ask=slope_ask)
+
+
+def book_stats(bid_px, bid_sz, ask_px, ask_sz, bps: Sequence[float] = (10.0, 50.0),
+               levels: Sequence[int] = (1, 5)) -> BookStats:
+    """
+    bid_px descending, ask_px ascending, either 1-D (one book: lists or arrays)
+    or (n, depth) arrays.
+    Empty or NaN-padded levels are fine: they never pass a threshold and NaN
+    sizes propagate into the level sums the same way a plain Python sum would.
+    Cumulative sums run left to right, so depth/imbalance match a sequential loop bit for bit.
+    """
+    levels = [int(k) for k in levels]
+    if getattr(bid_px, "ndim", 1) == 1 and max(len(bid_px), len(ask_px)) <= LIST_PREFIX:
+        # one live book: a plain-Python walk; NumPy call overhead would dominate
+        cols = [x.tolist() if isinstance(x, np.ndarray) else x for x in (bid_px, bid_sz, ask_px, ask_sz)]
+        return _book_stats_list(*cols, [float(x) for x in bps], levels)
+    bid_px, bid_sz = np.asarray(bid_px, dtype=np.float64), np.asarray(bid_sz, dtype=np.float64)
+    ask_px, ask_sz = np.asarray(ask_px, dtype=np.float64), np.asarray(ask_sz, dtype=np.float64)
+    if bid_px.ndim == 1:
+        return _book_stats_1d(bid_px, bid_sz, ask_px, ask_sz, [float(x) for x in bps], levels)
+    bps = np.asarray(bps, dtype=np.float64)
+
+    n, nb, na = bid_px.shape[0], bid_px.shape[1], ask_px.shape[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bid0 = bid_px[:, 0] if nb else np.full(n, np.nan)
+        ask0 = ask_px[:, 0] if na else np.full(n, np.nan)
+        bsz0 = bid_sz[:, 0] if nb else np.zeros(n)
+        asz0 = ask_sz[:, 0] if na else np.zeros(n)
+        mid = (bid0 + ask0) / 2.0
+        spread_bps = (ask0 - bid0) / mid * 1e4
+        microprice = (bid0 * asz0 + ask0 * bsz0) / (bsz0 + asz0)
+
+        # depth within each bps band: levels inside the band (sorted sides, so a count)
+        bid_cut = mid[:, None] * (1 - bps / 1e4)
+        ask_cut = mid[:, None] * (1 + bps / 1e4)
+        ib = (bid_px[:, None, :] >= bid_cut[:, :, None]).sum(axis=-1)
+        ia = (ask_px[:, None, :] <= ask_cut[:, :, None]).sum(axis=-1)
+
+        # cumulative sums over just the prefix any level / band reaches, then lookups
+        kb, ka = min(levels[-1], nb), min(levels[-1], na)
+        top = max(levels)
+        pb, pa = max(min(top, nb), int(ib.max(initial=0))), max(min(top, na), int(ia.max(initial=0)))
+        cb_sz, cb_nt = _cum(bid_sz[:, :pb]), _cum(bid_px[:, :pb] * bid_sz[:, :pb])
+        ca_sz, ca_nt = _cum(ask_sz[:, :pa]), _cum(ask_px[:, :pa] * ask_sz[:, :pa])
+
+        sb = np.stack([cb_sz[:, min(k, nb)] for k in levels], axis=-1)
+        sa = np.stack([ca_sz[:, min(k, na)] for k in levels], axis=-1)
+        denom = sb + sa
+        imbalance = np.where(denom == 0, 0.0, (sb - sa) / denom)
+
+        weighted_mid = (cb_nt[:, kb] / cb_sz[:, kb] + ca_nt[:, ka] / ca_sz[:, ka]) / 2.0
+        far_b = bid_px[:, kb - 1] if kb else bid0
+        far_a = ask_px[:, ka - 1] if ka else ask0
+        slope_bid = cb_sz[:, kb] / ((mid - far_b) / mid * 1e4)
+        slope_ask = ca_sz[:, ka] / ((far_a - mid) / mid * 1e4)
+
+        pos = mid[:, None] > 0
+        depth_bid = np.where(pos, np.take_along_axis(cb_nt, ib, axis=1), 0.0)
+        depth_ask = np.where(pos, np.take_along_axis(ca_nt, ia, axis=1), 0.0)
+
+    return BookStats(mid=mid, spread_bps=spread_bps, microprice=microprice, weighted_mid=weighted_mid,
+                     imbalance=imbalance, depth_bid=depth_bid, depth_ask=depth_ask,
+                     slope_bid=slope_bid, slope_ask=slope_ask)
+
+
+def snapshot_stats(book: BookSnapshot, bps: Sequence[float] = (10.0, 50.0),
+                   levels: Sequence[int] = (1, 5)) -> BookStats:
+    if max(book.bids.shape[1], book.asks.shape[1]) <= LIST_PREFIX:
+        return _book_stats_list(*book.bids.tolist(), *book.asks.tolist(), bps, levels)
+    return book_stats(book.bid_px, book.bid_sz, book.ask_px, book.ask_sz, bps, levels)
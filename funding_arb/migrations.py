@@ -0,0 +1,155 @@
+# funding_arb/migrations.py
+"""
+In-place schema upgrades for an existing funding_arb.db. Each step is idempotent.
+    python -m funding_arb.migrations
+"""
+import json
+
+import numpy as np
+from sqlalchemy import inspect, insert
+
+from .db import engine as default_engine
+from .models import BanditShadow, ExecOutcome, FeatureRow, FundingTick, LOBSnapshot, PositionSnap, SignalTick
+from .persist import pack_side
+
+BATCH = 5000
+
+
+def _columns(conn, table: str) -> set:
+    insp = inspect(conn)
+    if not insp.has_table(table):
+        return set()
+    return {c["name"] for c in insp.get_columns(table)}
+
+
+def migrate_lob_json_to_blob(engine=default_engine) -> int:
+    """
+    lob_snapshots: four JSON list columns -> fixed-depth float64 blobs per side.
+    Returns the number of rows converted (0 if already migrated).
+    """
+    with engine.begin() as conn:
+        if "bid_px" not in _columns(conn, "lob_snapshots"):
+            return 0
+        for ix in inspect(conn).get_indexes("lob_snapshots"):
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{ix["name"]}"')
+        conn.exec_driver_sql("ALTER TABLE lob_snapshots RENAME TO lob_snapshots_json")
+        LOBSnapshot.__table__.create(conn)
+
+        n = 0
+        res = conn.exec_driver_sql(
+            "SELECT ts_ms, symbol, bid_px, bid_sz, ask_px, ask_sz, latency_ms "
+            "FROM lob_snapshots_json ORDER BY id"
+        )
+        while True:
+            chunk = res.fetchmany(BATCH)
+            if not chunk:
+                break
+            rows = []
+            for ts_ms, symbol, bp, bs, ap, az, latency_ms in chunk:
+                bids = np.array([json.loads(bp), json.loads(bs)], dtype=np.float64).reshape(2, -1)
+                asks = np.array([json.loads(ap), json.loads(az)], dtype=np.float64).reshape(2, -1)
+                depth = max(bids.shape[1], asks.shape[1])
+                rows.append(dict(ts_ms=ts_ms, symbol=symbol, depth=depth,
+                                 bids=pack_side(bids, depth), asks=pack_side(asks, depth),
+                                 latency_ms=latency_ms))
+            conn.execute(insert(LOBSnapshot.__table__), rows)
+            n += len(rows)
+        conn.exec_driver_sql("DROP TABLE lob_snapshots_json")
+    return n
+
+
+def migrate_symbol_ts_indexes(engine=default_engine) -> int:
+    """
+    Tick tables: replace the single-column symbol index with a composite
+    (symbol, ts_ms) index (the ts_ms index stays for cross-symbol scans).
+    Returns the number of composite indexes created.
+    """
+    n = 0
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        for model in (LOBSnapshot, ExecOutcome, BanditShadow, FundingTick, SignalTick, PositionSnap):
+            name = model.__tablename__
+            if not insp.has_table(name):
+                continue
+            existing = {ix["name"] for ix in insp.get_indexes(name)}
+            for ix in model.__table__.indexes:
+                if ix.name not in existing:
+                    ix.create(conn)
+                    n += 1
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "ix_{name}_symbol"')
+        if n and conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+    return n
+
+
+def _add_columns(engine, models, names) -> int:
+    """ALTER TABLE ... ADD COLUMN for each of `names` a model's existing table lacks."""
+    n = 0
+    with engine.begin() as conn:
+        for model in models:
+            existing = _columns(conn, model.__tablename__)
+            if not existing:
+                continue  # create_all makes it with the new columns
+            for name in names:
+                if name not in existing:
+                    col = model.__table__.c[name]
+                    conn.exec_driver_sql(f'ALTER TABLE {model.__tablename__} ADD COLUMN "{name}" '
+                                         f'{col.type.compile(dialect=conn.dialect)}')
+                    n += 1
+    return n
+
+
+def migrate_decision_columns(engine=default_engine) -> int:
+    """
+    exec_outcomes / bandit_shadow: nullable `context` and `propensity` columns
+    for offline policy evaluation. Returns the number of columns added.
+    """
+    return _add_columns(engine, (ExecOutcome, BanditShadow), ("context", "propensity"))
+
+
+def migrate_snapshot_age_column(engine=default_engine) -> int:
+    """exec_outcomes: nullable `snapshot_age_ms` (book age at order time). Returns 1 if added."""
+    return _add_columns(engine, (ExecOutcome,), ("snapshot_age_ms",))
+
+
+def migrate_unique_feature_rows(engine=default_engine) -> int:
+    """
+    feature_rows: drop duplicate (symbol, version, ts_ms) rows, keeping the
+    first, and make that index unique. Returns the number of rows removed.
+    """
+    ix = next(iter(FeatureRow.__table__.indexes))
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        if not insp.has_table("feature_rows"):
+            return 0
+        if any(i["name"] == ix.name and i["unique"] for i in insp.get_indexes("feature_rows")):
+            return 0
+        n = conn.exec_driver_sql(
+            "DELETE FROM feature_rows WHERE id NOT IN "
+            "(SELECT MIN(id) FROM feature_rows GROUP BY symbol, version, ts_ms)"
+        ).rowcount
+        conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{ix.name}"')
+        ix.create(conn)
+    return n
+
+
+def migrate_all(engine=default_engine) -> dict:
+    return {
+        "lob_json_to_blob": migrate_lob_json_to_blob(engine),
+        "symbol_ts_indexes": migrate_symbol_ts_indexes(engine),
+        "decision_columns": migrate_decision_columns(engine),
+        "snapshot_age_column": migrate_snapshot_age_column(engine),
+        "unique_feature_rows": migrate_unique_feature_rows(engine),
+    }
+
+
+def main():
+    for step, n in migrate_all().items():
+        print(f"{step}: {n}")
+    if default_engine.dialect.name == "sqlite":
+        with default_engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,341 @@
+import os
+
 import numpy as np
 
 class LinTS:
     """
     Linear Thompson Sampling bandit.
-    Actions are ints (e.g., 0..3). Feature vector x must be (d, 1).
+    Actions are ints (e.g., 0..3). Feature vector x must be (d, 1) (or (d,)).
     Reward = -execution_cost_bps (higher is better).
+
+    Per action the posterior is kept ready to sample, stacked over actions:
+    A (K, d, d), b (K, d), A_inv = A^-1, mu = A_inv b and a square-root
+    factor R with R R^T = A_inv. `update` is rank-1 (Sherman-Morrison for
+    A_inv, Potter for R), so a decision is O(K d^2) with no inversions or
+    decompositions; A is refactored every REFACTOR_EVERY updates per action
+    to wash out rounding drift.
     """
-    def __init__(self, d: int, actions: list[int], sigma2: float = 1.0, ridge: float = 1.0):
+    REFACTOR_EVERY = 1000
+
+    def __init__(self, d: int, actions: list[int], sigma2: float = 1.0, ridge: float = 1.0,
+                 seed: int | None = None):
         self.d = d
-        self.actions = actions
+        self.actions = list(actions)
         self.sigma2 = sigma2
-        self.A = {a: ridge * np.eye(d) for a in actions}
-        self.b = {a: np.zeros((d, 1)) for a in actions}
+        self.rng = np.random.default_rng(seed)
+        self._index = {a: i for i, a in enumerate(self.actions)}
+        k = len(self.actions)
+        self.A = np.tile(ridge * np.eye(d), (k, 1, 1))
+        self.b = np.zeros((k, d))
+        self.A_inv = np.tile(np.eye(d) / ridge, (k, 1, 1))
+        self.R = np.tile(np.eye(d) / np.sqrt(ridge), (k, 1, 1))
+        self.mu = np.zeros((k, d))
+        self.n_updates = np.zeros(k, dtype=np.int64)
 
-    def _sample_theta(self, a: int):
-        A_inv = np.linalg.inv(self.A[a])
-        mu = A_inv @ self.b[a]
-        cov = self.sigma2 * A_inv
-        return np.random.multivariate_normal(mu.ravel(), cov).reshape(-1, 1)
+    def sample_theta(self) -> np.ndarray:
+        """One posterior draw per action, (K, d): mu + sqrt(sigma2) R z."""
+        z = self.rng.standard_normal(self.mu.shape)
+        return self.mu + np.sqrt(self.sigma2) * np.einsum("kij,kj->ki", self.R, z)
 
     def choose(self, x: np.ndarray) -> int:
-        scores = {a: float(self._sample_theta(a).T @ x) for a in self.actions}
-        return max(scores, key=scores.get)
+        scores = self.sample_theta() @ np.ravel(x)
+        return self.actions[int(np.argmax(scores))]
+
+    def score_dist(self, X: np.ndarray):
+        """
+        Per-row, per-action score x^T theta ~ N(m, s^2) under the posterior:
+        m = x^T mu, s = sqrt(sigma2) |R^T x|. X is (d,) / (d, 1) or (n, d); returns (n, K) each.
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.d)
+        m = X @ self.mu.T
+        s = np.sqrt(self.sigma2) * np.linalg.norm(np.einsum("kij,ni->nkj", self.R, X), axis=-1)
+        return m, s
+
+    def action_probs(self, X: np.ndarray, n_samples: int = 1000) -> np.ndarray:
+        """
+        Monte Carlo P(choose picks each action | x): the propensity logged for
+        offline evaluation. (K,) for one context, (n, K) for a batch.
+        """
+        single = np.ndim(X) == 1 or np.shape(X) == (self.d, 1)
+        m, s = self.score_dist(X)
+        draws = m[:, None, :] + s[:, None, :] * self.rng.standard_normal((len(m), n_samples, m.shape[1]))
+        win = draws.argmax(axis=-1)
+        probs = (win[..., None] == np.arange(m.shape[1])).mean(axis=1)
+        return probs[0] if single else probs
 
     def update(self, a: int, x: np.ndarray, reward: float):
-        self.A[a] += x @ x.T
-        self.b[a] += reward * x
\ No newline at end of file
+        i = self._index[a]
+        x = np.ravel(x).astype(np.float64)
+        self.A[i] += np.outer(x, x)
+        self.b[i] += reward * x
+        self.n_updates[i] += 1
+        if self.n_updates[i] % self.REFACTOR_EVERY == 0:
+            self._refactor(i)
+            return
+
+        # Sherman-Morrison: (A + x x^T)^-1 = A_inv - (A_inv x)(A_inv x)^T / (1 + x^T A_inv x)
+        R = self.R[i]
+        w = R.T @ x
+        u = R @ w                      # A_inv x
+        s = float(w @ w)               # x^T A_inv x
+        self.A_inv[i] -= np.outer(u, u) / (1.0 + s)
+        # Potter: R' = R (I - g w w^T) keeps R' R'^T equal to the updated A_inv
+        if s > 0:
+            g = (1.0 - 1.0 / np.sqrt(1.0 + s)) / s
+            R -= g * np.outer(u, w)
+        self.mu[i] = self.A_inv[i] @ self.b[i]
+
+    def update_batch(self, actions, X: np.ndarray, rewards):
+        """
+        Many (action, x, reward) rows at once, e.g. a warm start from stored
+        outcomes: A += X^T X and b += X^T r per action, then one refactor.
+        Same posterior as calling update row by row (up to rounding).
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.d)
+        rewards = np.asarray(rewards, dtype=np.float64).reshape(-1)
+        actions = np.asarray(actions).reshape(-1)
+        for a, i in self._index.items():
+            m = actions == a
+            if not m.any():
+                continue
+            Xa = X[m]
+            self.A[i] += Xa.T @ Xa
+            self.b[i] += Xa.T @ rewards[m]
+            self.n_updates[i] += int(m.sum())
+            self._refactor(i)
+
+    def save(self, path: str):
+        """Checkpoint A/b (the factors are rebuilt on load); atomic via rename."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, A=self.A, b=self.b, actions=np.asarray(self.actions), sigma2=self.sigma2,
+                     n_updates=self.n_updates)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, seed: int | None = None) -> "LinTS":
+        with np.load(path) as z:
+            A, b, actions = z["A"], z["b"], z["actions"].tolist()
+            bandit = cls(A.shape[-1], actions, sigma2=float(z["sigma2"]), seed=seed)
+            bandit.n_updates = z["n_updates"].astype(np.int64)
+        bandit.A, bandit.b = A.astype(np.float64), b.astype(np.float64)
+        for i in range(len(actions)):
+            bandit._refactor(i)
+        return bandit
+
+    def _refactor(self, i: int):
+        """A_inv and R from scratch: A = L L^T gives A_inv = L^-T L^-1, so R = L^-T."""
+        L = np.linalg.cholesky(self.A[i])
+        L_inv = np.linalg.solve(L, np.eye(self.d))
+        self.R[i] = L_inv.T
+        self.A_inv[i] = L_inv.T @ L_inv
+        self.mu[i] = self.A_inv[i] @ self.b[i]
+
+
+class BanditBank:
+    """
+    LinTS for many symbols at once: per (symbol, action) the same posterior as
+    LinTS, stacked as A (S, K, d, d), b (S, K, d), the factor R (R R^T = A^-1)
+    and mu. `choose` scores a batch of (symbol, context) rows with one draw
+    per row and action; `update` applies one rank-1 step per row, vectorized
+    over the batch (A^-1 itself is never formed).
+
+    Partial pooling: the prior mean of theta[s, k] is share * mu_pool[k],
+    where mu_pool is the ridge fit over every symbol's data for action k.
+    share=0 gives independent per-symbol bandits; share=1 shrinks each symbol
+    toward the pooled fit until its own data outweighs the prior (ridge).
+    A and b hold the symbol's own data only, so share can change at any time.
+    """
+    REFACTOR_EVERY = 1000
+
+    def __init__(self, d: int, actions: list[int], symbols: list[str] = (), sigma2: float = 1.0,
+                 ridge: float = 1.0, share: float = 0.0, seed: int | None = None):
+        self.d = d
+        self.actions = list(actions)
+        self.sigma2 = sigma2
+        self.ridge = ridge
+        self.share = share
+        self.rng = np.random.default_rng(seed)
+        self._actions = np.asarray(self.actions)
+        if np.any(np.diff(self._actions) <= 0):
+            raise ValueError("BanditBank actions must be sorted and distinct")
+        k = len(self.actions)
+        self.symbols: list[str] = []
+        self._index: dict[str, int] = {}
+        self.A = np.zeros((0, k, d, d))
+        self.b = np.zeros((0, k, d))
+        self.R = np.zeros((0, k, d, d))
+        self.mu = np.zeros((0, k, d))           # A^-1 b: own-data part of the posterior mean
+        self.n_updates = np.zeros((0, k), dtype=np.int64)
+        # pooled statistics over all symbols, per action
+        self.pool_A = np.tile(ridge * np.eye(d), (k, 1, 1))
+        self.pool_b = np.zeros((k, d))
+        self.mu_pool = np.zeros((k, d))
+        self.add_symbols(symbols)
+
+    def add_symbols(self, symbols) -> np.ndarray:
+        """Register new symbols with the prior; returns the row index of every symbol given."""
+        new = [s for s in dict.fromkeys(symbols) if s not in self._index]
+        if new:
+            m, k, d = len(new), len(self.actions), self.d
+            eye = np.broadcast_to(np.eye(d), (m, k, d, d))
+            self.A = np.concatenate([self.A, self.ridge * eye])
+            self.b = np.concatenate([self.b, np.zeros((m, k, d))])
+            self.R = np.concatenate([self.R, eye / np.sqrt(self.ridge)])
+            self.mu = np.concatenate([self.mu, np.zeros((m, k, d))])
+            self.n_updates = np.concatenate([self.n_updates, np.zeros((m, k), dtype=np.int64)])
+            for s in new:
+                self._index[s] = len(self.symbols)
+                self.symbols.append(s)
+        return np.array([self._index[s] for s in symbols], dtype=np.intp)
+
+    def _rows(self, symbols):
+        """Bank rows for `symbols` (names, or rows already); slice(None) when they are all the bank's symbols in order."""
+        if isinstance(symbols, (np.ndarray, slice)):
+            return symbols
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        if symbols == self.symbols:
+            return slice(None)
+        try:
+            return np.array([self._index[s] for s in symbols], dtype=np.intp)
+        except KeyError:
+            return self.add_symbols(symbols)
+
+    def _mean(self, rows: np.ndarray, X: np.ndarray, w: np.ndarray) -> np.ndarray:
+        """x^T mu per row and action, (n, K); w = R^T x from the caller."""
+        m = np.einsum("nki,ni->nk", self.mu[rows], X)
+        if self.share:
+            # pooled prior mean: x^T A^-1 (ridge * share * mu_pool) = (R^T x) . (R^T mu_pool) * ridge * share
+            v = (self.mu_pool[:, None, :] @ self.R[rows])[..., 0, :]      # (n, K, d)
+            m += (self.ridge * self.share) * np.einsum("nkj,nkj->nk", w, v)
+        return m
+
+    def _w(self, rows: np.ndarray, X: np.ndarray) -> np.ndarray:
+        """R^T x per row and action, (n, K, d)."""
+        return (X[:, None, None, :] @ self.R[rows])[:, :, 0, :]
+
+    def score_dist(self, symbols, X: np.ndarray):
+        """Score x^T theta ~ N(m, s^2) per row and action; (n, K) each. symbols may be bank row indices."""
+        rows = self._rows(symbols)
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.d)
+        w = self._w(rows, X)
+        return self._mean(rows, X, w), np.sqrt(self.sigma2) * np.linalg.norm(w, axis=-1)
+
+    def choose(self, symbols, X: np.ndarray) -> np.ndarray:
+        """One Thompson decision per row: symbols (n,), X (n, d) -> actions (n,)."""
+        rows = self._rows(symbols)
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.d)
+        # x^T theta for theta = mu + sqrt(sigma2) R z is N(x^T mu, sigma2 |R^T x|^2): draw the score directly
+        m, s = self.score_dist(rows, X)
+        scores = m + s * self.rng.standard_normal(m.shape)
+        return self._actions[scores.argmax(axis=1)]
+
+    def action_probs(self, symbols, X: np.ndarray, n_samples: int = 1000) -> np.ndarray:
+        """Monte Carlo P(choose picks each action), (n, K)."""
+        m, s = self.score_dist(symbols, X)
+        draws = m[:, None, :] + s[:, None, :] * self.rng.standard_normal((len(m), n_samples, m.shape[1]))
+        win = draws.argmax(axis=-1)
+        return (win[..., None] == np.arange(m.shape[1])).mean(axis=1)
+
+    def update(self, symbols, actions, X: np.ndarray, rewards):
+        """
+        One (symbol, action, x, reward) per row. Rows hitting distinct
+        (symbol, action) pairs - the usual one decision per symbol per tick -
+        get a batched Sherman-Morrison / Potter step; pairs hit several times
+        in one call accumulate A, b and are refactored instead.
+        """
+        rows = self._rows(symbols)
+        if isinstance(rows, slice):
+            rows = np.arange(len(self.symbols))
+        acts = np.searchsorted(self._actions, np.ravel(actions))
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.d)
+        r = np.asarray(rewards, dtype=np.float64).reshape(-1)
+        if not len(rows):
+            return
+        k = len(self.actions)
+        outer = X[:, :, None] * X[:, None, :]
+        rx = r[:, None] * X
+        onehot = (acts[None, :] == np.arange(k)[:, None]).astype(np.float64)   # (K, n)
+        self.pool_A += (onehot @ outer.reshape(len(X), -1)).reshape(self.pool_A.shape)
+        self.pool_b += onehot @ rx
+        self.mu_pool = np.linalg.solve(self.pool_A, self.pool_b[..., None])[..., 0]
+
+        key = rows * k + acts
+        uniq, counts = np.unique(key, return_counts=True)
+        order = np.argsort(key, kind="stable")                    # rows grouped in uniq order
+        if len(uniq) < len(key):
+            # some pair repeats: sum its rows, then refactor it below
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            outer, rx = np.add.reduceat(outer[order], starts), np.add.reduceat(rx[order], starts)
+            first = order[starts]
+        else:
+            outer, rx, first = outer[order], rx[order], order
+        s_u, k_u = uniq // k, uniq % k
+        self.A[s_u, k_u] += outer
+        self.b[s_u, k_u] += rx
+        self.n_updates[s_u, k_u] += counts
+
+        once = counts == 1
+        s_i, k_i, x, r1 = s_u[once], k_u[once], X[first[once]], r[first[once]]
+        Rk = self.R[s_i, k_i]
+        w = (x[:, None, :] @ Rk)[:, 0, :]                         # R^T x
+        u = (Rk @ w[:, :, None])[..., 0]                          # A^-1 x
+        s = np.einsum("ni,ni->n", w, w)                           # x^T A^-1 x
+        # Potter for R; the mean needs only u: mu' = mu + u (r - x^T mu) / (1 + s)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            g = np.where(s > 0, (1.0 - 1.0 / np.sqrt(1.0 + s)) / s, 0.0)
+        Rk -= (g[:, None] * u)[:, :, None] * w[:, None, :]
+        self.R[s_i, k_i] = Rk
+        mu = self.mu[s_i, k_i]
+        self.mu[s_i, k_i] = mu + u * ((r1 - np.einsum("ni,ni->n", x, mu)) / (1.0 + s))[:, None]
+
+        n_after = self.n_updates[s_u, k_u]
+        redo = ~once | (n_after // self.REFACTOR_EVERY > (n_after - counts) // self.REFACTOR_EVERY)
+        if redo.any():
+            self._refactor(s_u[redo], k_u[redo])
+
+    def _refactor(self, s_i: np.ndarray, k_i: np.ndarray):
+        """R = L^-T from a batched Cholesky A[s_i, k_i] = L L^T, and mu = R R^T b."""
+        L = np.linalg.cholesky(self.A[s_i, k_i])
+        R = np.linalg.solve(L, np.broadcast_to(np.eye(self.d), L.shape)).transpose(0, 2, 1)
+        self.R[s_i, k_i] = R
+        self.mu[s_i, k_i] = (R @ (self.b[s_i, k_i][:, None, :] @ R).transpose(0, 2, 1))[..., 0]
+
+    def bandit(self, symbol: str) -> LinTS:
+        """A standalone LinTS with this symbol's posterior (pooled prior mean folded into b)."""
+        i = self._index[symbol] if symbol in self._index else int(self.add_symbols([symbol])[0])
+        out = LinTS(self.d, self.actions, sigma2=self.sigma2, ridge=self.ridge)
+        out.A, out.R = self.A[i].copy(), self.R[i].copy()
+        out.A_inv = out.R @ out.R.transpose(0, 2, 1)
+        out.b = self.b[i] + (self.ridge * self.share) * self.mu_pool
+        out.mu = (out.A_inv @ out.b[..., None])[..., 0]
+        out.n_updates = self.n_updates[i].copy()
+        return out
+
+    def save(self, path: str):
+        """Checkpoint A/b per symbol; factors and pooled fit are rebuilt on load. Atomic via rename."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, A=self.A, b=self.b, actions=np.asarray(self.actions), symbols=np.asarray(self.symbols, dtype=str),
+                     sigma2=self.sigma2, ridge=self.ridge, share=self.share, n_updates=self.n_updates)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, seed: int | None = None) -> "BanditBank":
+        with np.load(path) as z:
+            A, b = z["A"].astype(np.float64), z["b"].astype(np.float64)
+            bank = cls(A.shape[-1], z["actions"].tolist(), symbols=z["symbols"].tolist(), sigma2=float(z["sigma2"]),
+                       ridge=float(z["ridge"]), share=float(z["share"]), seed=seed)
+            bank.n_updates = z["n_updates"].astype(np.int64)
+        bank.A, bank.b = A, b
+        eye = np.eye(bank.d)
+        bank.pool_A = bank.ridge * eye + (A - bank.ridge * eye).sum(axis=0)
+        bank.pool_b = b.sum(axis=0)
+        if len(bank.symbols):
+            s_i, k_i = np.indices(A.shape[:2]).reshape(2, -1)
+            bank._refactor(s_i, k_i)
+        bank.mu_pool = np.linalg.solve(bank.pool_A, bank.pool_b[..., None])[..., 0]
+        return bank
@@ -1,7 +1,12 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 import math
 from collections import deque
 
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from funding_arb.microstructure import BookStats, book_stats
+
 @dataclass
 class ExecFeatures:
     spread_bp: float
@@ -13,14 +18,36 @@ class ExecFeatures:
     time_of_day_sin: float
     time_of_day_cos: float
 
+FEATURE_DTYPE = np.dtype([(f.name, np.int64 if f.type is int else np.float64) for f in fields(ExecFeatures)])
+EXEC_FEATURE_COLUMNS = FEATURE_DTYPE.names
+# bandit context = features / scale (spread, returns and vol proxy in tens of bps)
+CONTEXT_SCALE = np.array([10.0, 10.0, 10.0, 10.0, 1.0, 1.0, 1.0, 1.0])
+
+def exec_context(feats) -> np.ndarray:
+    """
+    Bandit context vector. ExecFeatures -> (d, 1); a compute_batch structured
+    array or an (n, d) array in EXEC_FEATURE_COLUMNS order -> (n, d).
+    """
+    if isinstance(feats, ExecFeatures):
+        x = np.array([getattr(feats, c) for c in EXEC_FEATURE_COLUMNS], dtype=float)
+        return (x / CONTEXT_SCALE).reshape(-1, 1)
+    if getattr(feats, "dtype", None) is not None and feats.dtype.names:
+        feats = np.column_stack([feats[c].astype(np.float64) for c in EXEC_FEATURE_COLUMNS])
+    return np.asarray(feats, dtype=np.float64).reshape(-1, len(EXEC_FEATURE_COLUMNS)) / CONTEXT_SCALE
+
 class FeatureBuilder:
     """
     Builds live features from a stream of (ts_ms, bid_px[], ask_px[], bid_sz[], ask_sz[]).
     Keep minimal state in-memory.
+    compute_batch produces the same rows for a whole history at once.
     """
+    HISTORY = 50      # ~12.5s at 250ms
+    VOL_WINDOW = 20   # mids in the vol proxy
+    IMB_LEVELS = 5
+
     def __init__(self):
-        self.mids = deque(maxlen=50)   # ~12.5s at 250ms
-        self.times = deque(maxlen=50)
+        self.mids = deque(maxlen=self.HISTORY)
+        self.times = deque(maxlen=self.HISTORY)
 
     @staticmethod
     def _mid(bid_px0, ask_px0):
@@ -38,18 +65,40 @@ class FeatureBuilder:
         ang = 2 * math.pi * (sec / 86400.0)
         return math.sin(ang), math.cos(ang)
 
-    def push_and_compute(self, ts_ms, bid_px, ask_px, bid_sz, ask_sz, last_action:int=0):
-        # expect arrays; guard if empty
-        if not bid_px or not ask_px:
+    def push_book(self, book, last_action: int = 0, ts_ms=None, stats: BookStats = None):
+        """BookSnapshot entry point: reads the price/size rows in place."""
+        return self.push_and_compute(book.ts_ms if ts_ms is None else ts_ms,
+                                     book.bid_px, book.ask_px, book.bid_sz, book.ask_sz,
+                                     last_action=last_action, stats=stats)
+
+    def push_and_compute(self, ts_ms, bid_px, ask_px, bid_sz, ask_sz, last_action:int=0,
+                         stats: BookStats = None):
+        """
+        `stats`: microstructure.book_stats already computed for this book with
+        IMB_LEVELS as the last of its `levels` (skips the second pass over it).
+        Without it spread and the top-IMB_LEVELS sums are taken here directly:
+        two numbers do not pay for the full kernel on one book.
+        """
+        # expect lists or 1-D arrays; guard if empty
+        if len(bid_px) == 0 or len(ask_px) == 0:
             return None
 
-        mid = self._mid(bid_px[0], ask_px[0])
+        mid = self._mid(float(bid_px[0]), float(ask_px[0]))
         self.mids.append(mid)
         self.times.append(ts_ms)
 
-        # spread in bps
-        spread = max(ask_px[0] - bid_px[0], 0.0)
-        spread_bp = (spread / mid) * 1e4 if mid else 0.0
+        if stats is None:
+            # spread in bps; sizes added left to right like compute_batch's cumulative sums
+            spread_bp = max((float(ask_px[0]) - float(bid_px[0])) / mid * 1e4, 0.0) if mid else 0.0
+            sum_b = sum_a = 0.0
+            for q in bid_sz[:self.IMB_LEVELS]:
+                sum_b += q
+            for q in ask_sz[:self.IMB_LEVELS]:
+                sum_a += q
+            imb = 0.0 if sum_b + sum_a == 0 else float((sum_b - sum_a) / (sum_b + sum_a))
+        else:
+            spread_bp = max(stats.spread_bps, 0.0) if mid else 0.0
+            imb = float(stats.imbalance[-1])
 
         # compute returns approx at 1s and 5s back
         def value_at(delta_s):
@@ -69,20 +118,14 @@ class FeatureBuilder:
         r5 = self._ret(mid, mid_5s) if mid_5s else 0.0
 
         # simple vol proxy over last ~5s: std of last 20 mids / mid
-        window = list(self.mids)[-20:]
+        window = list(self.mids)[-self.VOL_WINDOW:]
         if len(window) >= 2:
             mu = sum(window) / len(window)
-            var = sum((x - mu) ** 2 for x in window) / (len(window) - 1)
-            vol_proxy = (var ** 0.5) / mid if mid else 0.0
+            var = sum((x - mu) * (x - mu) for x in window) / (len(window) - 1)
+            vol_proxy = math.sqrt(var) / mid if mid else 0.0
         else:
             vol_proxy = 0.0
 
-        # depth imbalance top-5
-        sum_b = sum(bid_sz[:5]) if bid_sz else 0.0
-        sum_a = sum(ask_sz[:5]) if ask_sz else 0.0
-        denom = (sum_b + sum_a) or 1.0
-        imb = (sum_b - sum_a) / denom
-
         s, c = self._time_of_day(ts_ms)
         return ExecFeatures(
             spread_bp=spread_bp,
@@ -93,4 +136,73 @@ class FeatureBuilder:
             last_action=last_action,
             time_of_day_sin=s,
             time_of_day_cos=c,
-        )
\ No newline at end of file
+        )
+
+    def compute_batch(self, ts_ms, bid_px, ask_px, bid_sz, ask_sz, last_action=0, as_frame: bool = False):
+        """
+        Vectorized push_and_compute over a history, as if every row were pushed
+        into a fresh builder in order (streaming state is left untouched).
+        ts_ms: (n,) ascending; bid_px/ask_px/bid_sz/ask_sz: (n, depth), e.g.
+        persist.load_lob_arrays / query.fetch_range output; last_action: scalar or (n,).
+        Returns a structured array with ExecFeatures fields (DataFrame with as_frame),
+        bit-identical to the streaming rows: sums are accumulated column by column
+        in the same order as the per-tick Python code.
+        """
+        ts = np.asarray(ts_ms, dtype=np.int64)
+        bid_px, ask_px = np.asarray(bid_px, dtype=np.float64), np.asarray(ask_px, dtype=np.float64)
+        bid_sz, ask_sz = np.asarray(bid_sz, dtype=np.float64), np.asarray(ask_sz, dtype=np.float64)
+        n = len(ts)
+        out = np.zeros(n, dtype=FEATURE_DTYPE)
+        if n == 0 or bid_px.shape[1] == 0 or ask_px.shape[1] == 0:
+            return self._batch_result(out[:0], as_frame)
+
+        st = book_stats(bid_px, bid_sz, ask_px, ask_sz, bps=(), levels=(self.IMB_LEVELS,))
+        mid = st.mid
+        idx = np.arange(n)
+        lo = np.maximum(idx - (self.HISTORY - 1), 0)  # oldest row still in the deque
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["spread_bp"] = np.where(mid != 0, np.maximum(st.spread_bps, 0.0), 0.0)
+
+            # 1s/5s lookback: latest row in the deque with time <= target, else its oldest row
+            for name, delta_ms in (("mid_return_1s", 1000), ("mid_return_5s", 5000)):
+                j = np.maximum(np.searchsorted(ts, ts - delta_ms, side="right") - 1, lo)
+                then = mid[j]
+                r = np.where(then != 0, (mid - then) / then, 0.0)
+                r[idx < 1] = 0.0  # fewer than two points
+                out[name] = r * 1e4
+
+            # sample std of the last VOL_WINDOW mids (fewer while warming up)
+            w = self.VOL_WINDOW
+            win = sliding_window_view(np.concatenate([np.zeros(w - 1), mid]), w)
+            cnt = np.minimum(idx + 1, w).astype(np.float64)
+            first = w - cnt  # window column of the oldest valid mid
+            acc = np.zeros(n)
+            for k in range(w):
+                acc += np.where(k >= first, win[:, k], 0.0)
+            mu = acc / cnt
+            acc = np.zeros(n)
+            for k in range(w):
+                dev = win[:, k] - mu
+                acc += np.where(k >= first, dev * dev, 0.0)
+            std = np.sqrt(acc / (cnt - 1))
+            vol = np.where(mid != 0, std / mid, 0.0)
+            vol[cnt < 2] = 0.0
+            out["vol_proxy_5s"] = vol * 1e4
+
+            out["depth_imb_top5"] = st.imbalance[:, -1]
+
+        out["last_action"] = last_action
+        # math.sin/cos on the distinct seconds keeps the streaming path's exact values
+        sec, inv = np.unique((ts // 1000) % 86400, return_inverse=True)
+        ang = [2 * math.pi * (x / 86400.0) for x in sec.tolist()]
+        out["time_of_day_sin"] = np.array([math.sin(a) for a in ang])[inv]
+        out["time_of_day_cos"] = np.array([math.cos(a) for a in ang])[inv]
+        return self._batch_result(out, as_frame)
+
+    @staticmethod
+    def _batch_result(out, as_frame: bool):
+        if as_frame:
+            import pandas as pd
+            return pd.DataFrame(out)
+        return out
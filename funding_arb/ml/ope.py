@@ -0,0 +1,283 @@
+# funding_arb/ml/ope.py
+"""
+Offline policy evaluation of execution policies from logged decisions.
+Rows need the decision-time context and the logger's propensity (written by
+outcome_log since the context/propensity columns exist). A candidate policy is
+an (n, K) matrix of action probabilities on the logged contexts; its mean
+reward (reward = -realized_cost_bps) is estimated by
+  IPS    mean(rho r)                              rho = pi(a|x) / p(a|x)
+  SNIPS  sum(rho r) / sum(rho)
+  DR     mean(sum_k pi_k q_k + rho (r - q_a))     q: per-action ridge reward model, cross-fitted
+with percentile bootstrap intervals. Everything is array math over the whole
+log; the bootstrap Poisson-resamples BOOT_GROUPS random groups of rows (exactly
+the row bootstrap when there are fewer rows than groups).
+
+Sources: exec (exec_outcomes as logged by BanditExecutor / exec_demo) and
+shadow (bandit_shadow: the executed action is always the baseline, so only
+policies that agree with it are identified -- see `support`).
+    python -m funding_arb.ml.ope [exec|shadow] [n_boot]
+"""
+import sys
+import time
+from typing import Dict, Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+
+from funding_arb.db import read_engine as default_read_engine
+from funding_arb.ml.bandit import LinTS
+from funding_arb.models import BanditShadow, ExecOutcome
+
+ACTIONS = (0, 1, 2, 3)
+ACTION_NAMES = {0: "maker_inside", 1: "post_only_edge", 2: "taker_now", 3: "wait"}
+BASELINE_ACTION = 2
+PROPENSITY_FLOOR = 1e-3   # logged propensities are clipped up to this (Monte Carlo estimates can be ~0)
+BOOT_GROUPS = 4096
+HERMITE_NODES = 16      # |error| <~2e-4 on P(a), well under the MC noise of logged propensities
+
+_F8 = np.dtype("<f8")
+
+
+def load_logged(source: str = "exec", symbol: Optional[str] = None, t0: Optional[int] = None,
+                t1: Optional[int] = None, engine=default_read_engine) -> dict:
+    """
+    Logged decisions with a context, ordered by ts_ms:
+    {ts_ms (n,), X (n, d), action (n,), propensity (n,), reward (n,)}.
+    exec: the action taken and its logged propensity. shadow: the baseline
+    action that was executed (propensity 1); the bandit's own suggestion and
+    its propensity are under action_bandit / propensity_bandit.
+    """
+    if source == "exec":
+        t = ExecOutcome.__table__
+        cols = [t.c.ts_ms, t.c.action, t.c.propensity, t.c.realized_cost_bps, t.c.context]
+        q = select(*cols).where(t.c.context.is_not(None), t.c.propensity.is_not(None))
+    elif source == "shadow":
+        t = BanditShadow.__table__
+        cols = [t.c.ts_ms, t.c.action_baseline, t.c.action_bandit, t.c.propensity, t.c.realized_cost_bps,
+                t.c.context]
+        q = select(*cols).where(t.c.context.is_not(None))
+    else:
+        raise ValueError(f"unknown source {source!r}")
+    if symbol is not None:
+        q = q.where(t.c.symbol == symbol)
+    if t0 is not None:
+        q = q.where(t.c.ts_ms >= t0)
+    if t1 is not None:
+        q = q.where(t.c.ts_ms < t1)
+    with engine.connect() as conn:
+        rows = conn.execute(q.order_by(t.c.ts_ms)).all()
+
+    n = len(rows)
+    blob = b"".join(r.context for r in rows)
+    out = dict(
+        ts_ms=np.fromiter((r.ts_ms for r in rows), dtype=np.int64, count=n),
+        X=np.frombuffer(blob, dtype=_F8).reshape(n, -1) if n else np.empty((0, 0)),
+        reward=-np.fromiter((r.realized_cost_bps for r in rows), dtype=np.float64, count=n),
+    )
+    if source == "exec":
+        out["action"] = np.fromiter((r.action for r in rows), dtype=np.int64, count=n)
+        out["propensity"] = np.fromiter((r.propensity for r in rows), dtype=np.float64, count=n)
+    else:
+        out["action"] = np.fromiter((r.action_baseline for r in rows), dtype=np.int64, count=n)
+        out["propensity"] = np.ones(n)
+        out["action_bandit"] = np.fromiter((r.action_bandit for r in rows), dtype=np.int64, count=n)
+        out["propensity_bandit"] = np.array([np.nan if r.propensity is None else r.propensity for r in rows])
+    return out
+
+
+# ---------- policies: (n, K) action probabilities ----------
+def constant_policy(n: int, action: int, actions: Sequence[int] = ACTIONS) -> np.ndarray:
+    pi = np.zeros((n, len(actions)))
+    pi[:, list(actions).index(action)] = 1.0
+    return pi
+
+
+def greedy_policy(bandit: LinTS, X: np.ndarray) -> np.ndarray:
+    """Posterior-mean argmax (what LinTS converges to)."""
+    m, _ = bandit.score_dist(X)
+    pi = np.zeros_like(m)
+    pi[np.arange(len(m)), m.argmax(axis=1)] = 1.0
+    return pi
+
+
+def _norm_cdf(z: np.ndarray) -> np.ndarray:
+    # Abramowitz & Stegun 7.1.26 erfc (|error| < 1.5e-7); NumPy has no erf
+    x = np.abs(z) * np.float32(1.0 / np.sqrt(2.0))
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    half_erfc = 0.5 * poly * np.exp(-x * x)
+    return np.where(z >= 0, 1.0 - half_erfc, half_erfc)
+
+
+def thompson_policy(bandit: LinTS, X: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """
+    P(choose picks each action | x) for LinTS: scores are independent normals
+    N(m_k, s_k^2), so P(a) = E_t~N(m_a, s_a^2)[prod_{k != a} Phi((t - m_k) / s_k)],
+    integrated with HERMITE_NODES Gauss-Hermite nodes in float32.
+    Deterministic, unlike LinTS.action_probs.
+    """
+    u, w = np.polynomial.hermite.hermgauss(HERMITE_NODES)
+    u, w = (np.sqrt(2.0) * u).astype(np.float32), w / np.sqrt(np.pi)
+    K = len(bandit.actions)
+    others = np.array([[k for k in range(K) if k != a] for a in range(K)])    # (K, K-1)
+    out = []
+    for s0 in range(0, len(X), chunk):
+        m, s = bandit.score_dist(X[s0:s0 + chunk])
+        m, s = m.astype(np.float32), np.maximum(s, 1e-12).astype(np.float32)
+        t = m[:, :, None] + s[:, :, None] * u                                     # (n, K, H) nodes per action
+        mo, so = m[:, others], s[:, others]                                       # (n, K, K-1) competitors
+        cdf = _norm_cdf((t[:, :, :, None] - mo[:, :, None, :]) / so[:, :, None, :])  # (n, K, H, K-1)
+        p = cdf.prod(axis=-1).astype(np.float64) @ w
+        out.append(p / p.sum(axis=1, keepdims=True))
+    return np.concatenate(out) if out else np.empty((0, len(bandit.actions)))
+
+
+# ---------- reward model ----------
+def fit_reward_model(X: np.ndarray, action: np.ndarray, reward: np.ndarray,
+                     actions: Sequence[int] = ACTIONS, ridge: float = 1.0) -> np.ndarray:
+    """Per-action ridge regression on [x, 1]: (K, d + 1) weights (zeros for unseen actions)."""
+    Z = np.column_stack([X, np.ones(len(X))])
+    W = np.zeros((len(actions), Z.shape[1]))
+    for i, a in enumerate(actions):
+        m = action == a
+        if m.any():
+            Za = Z[m]
+            W[i] = np.linalg.solve(Za.T @ Za + ridge * np.eye(Z.shape[1]), Za.T @ reward[m])
+    return W
+
+
+def predict_rewards(W: np.ndarray, X: np.ndarray) -> np.ndarray:
+    return np.column_stack([X, np.ones(len(X))]) @ W.T
+
+
+def cross_fit_rewards(X, action, reward, actions: Sequence[int] = ACTIONS, folds: int = 2,
+                      ridge: float = 1.0, seed: int = 0) -> np.ndarray:
+    """(n, K) reward predictions, each row from a model fitted on the other folds."""
+    fold = np.random.default_rng(seed).integers(folds, size=len(X))
+    q = np.zeros((len(X), len(actions)))
+    for f in range(folds):
+        test = fold == f
+        W = fit_reward_model(X[~test], action[~test], reward[~test], actions, ridge)
+        q[test] = predict_rewards(W, X[test])
+    return q
+
+
+# ---------- estimators ----------
+def _group_sums(a: np.ndarray, groups: int, rng) -> np.ndarray:
+    if len(a) <= groups:
+        return a
+    perm = rng.permutation(len(a))
+    edges = np.linspace(0, len(a), groups + 1).astype(np.int64)[:-1]
+    return np.add.reduceat(a[perm], edges, axis=0)
+
+
+def evaluate(logged: Mapping[str, np.ndarray], policies: Mapping[str, np.ndarray],
+             actions: Sequence[int] = ACTIONS, q_hat: Optional[np.ndarray] = None,
+             baseline: Optional[str] = None, n_boot: int = 1000, alpha: float = 0.05,
+             seed: int = 0) -> Dict[str, dict]:
+    """
+    IPS / SNIPS / DR point estimates and (1 - alpha) bootstrap intervals of each
+    policy's mean reward. With `baseline` (a key of `policies`) also the DR
+    difference policy - baseline on the same bootstrap draws. `support` is the
+    mean probability the policy puts on the logged action; `ess` the effective
+    sample size sum(rho)^2 / sum(rho^2).
+    """
+    a_idx = np.searchsorted(np.asarray(actions), logged["action"])
+    r = logged["reward"]
+    p = np.maximum(logged["propensity"], PROPENSITY_FLOOR)
+    n = len(r)
+    if q_hat is None:
+        q_hat = cross_fit_rewards(logged["X"], logged["action"], r, actions, seed=seed)
+    q_a = q_hat[np.arange(n), a_idx]
+
+    names = list(policies)
+    num, den = [], []
+    for name in names:
+        pi = policies[name]
+        rho = pi[np.arange(n), a_idx] / p
+        num += [rho * r, rho * r, (pi * q_hat).sum(axis=1) + rho * (r - q_a)]
+        den += [np.ones(n), rho, np.ones(n)]
+    num, den = np.column_stack(num), np.column_stack(den)   # (n, 3 * policies)
+
+    rng = np.random.default_rng(seed)
+    g_num, g_den = _group_sums(np.column_stack([num, den]), BOOT_GROUPS, rng).T.reshape(2, num.shape[1], -1)
+    w = rng.poisson(1.0, (n_boot, g_num.shape[1])).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):  # SNIPS is NaN for a policy with no support
+        point = num.sum(axis=0) / den.sum(axis=0)
+        boot = (w @ g_num.T) / (w @ g_den.T)                 # (n_boot, 3 * policies)
+    lo, hi = np.percentile(boot, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+
+    out = {}
+    for j, name in enumerate(names):
+        pi = policies[name]
+        rho = pi[np.arange(n), a_idx] / p
+        res = {"n": n, "support": float(pi[np.arange(n), a_idx].mean()) if n else 0.0,
+               "ess": float(rho.sum() ** 2 / (rho * rho).sum()) if rho.any() else 0.0}
+        for k, est in enumerate(("ips", "snips", "dr")):
+            c = 3 * j + k
+            res[est] = float(point[c])
+            res[f"{est}_ci"] = (float(lo[c]), float(hi[c]))
+        if baseline is not None and name != baseline:
+            b = 3 * names.index(baseline) + 2
+            diff = boot[:, 3 * j + 2] - boot[:, b]
+            res["dr_vs_baseline"] = float(point[3 * j + 2] - point[b])
+            res["dr_vs_baseline_ci"] = tuple(float(x) for x in np.percentile(diff, [100 * alpha / 2, 100 * (1 - alpha / 2)]))
+        out[name] = res
+    return out
+
+
+def candidate_policies(logged: Mapping[str, np.ndarray], train_frac: float = 0.5,
+                       actions: Sequence[int] = ACTIONS):
+    """
+    Split by time: LinTS fitted (update_batch) on the first `train_frac` of the
+    log; returns (eval slice, {name: pi}) with every constant action, the LinTS
+    Thompson policy and its greedy version, evaluated on the rest.
+    """
+    n_train = int(len(logged["reward"]) * train_frac)
+    train = {k: v[:n_train] for k, v in logged.items()}
+    test = {k: v[n_train:] for k, v in logged.items()}
+    d = logged["X"].shape[1]
+    bandit = LinTS(d=d, actions=list(actions))
+    if n_train:
+        bandit.update_batch(train["action"], train["X"], train["reward"])
+    n = len(test["reward"])
+    policies = {ACTION_NAMES.get(a, str(a)): constant_policy(n, a, actions) for a in actions}
+    policies["linTS"] = thompson_policy(bandit, test["X"])
+    policies["linTS_greedy"] = greedy_policy(bandit, test["X"])
+    return test, policies
+
+
+def report(source: str = "exec", n_boot: int = 1000, engine=default_read_engine) -> Optional[dict]:
+    """Load, evaluate the candidate policies against taker_now and print a cost table (bps, lower = better)."""
+    t0 = time.perf_counter()
+    logged = load_logged(source, engine=engine)
+    n = len(logged["reward"])
+    if n < 20:
+        print(f"OPE ({source}): {n} rows with logged context/propensity; need at least 20.")
+        return None
+    t1 = time.perf_counter()
+    test, policies = candidate_policies(logged)
+    res = evaluate(test, policies, baseline=ACTION_NAMES[BASELINE_ACTION], n_boot=n_boot)
+    t2 = time.perf_counter()
+
+    print(f"OPE ({source}): {n} logged decisions, {len(test['reward'])} evaluated "
+          f"(load {t1 - t0:.2f}s, fit+evaluate {t2 - t1:.2f}s); estimated cost bps [95% CI]")
+    print(f"{'policy':>15} {'IPS':>22} {'SNIPS':>22} {'DR':>22} {'DR - taker_now':>22} {'support':>8} {'ESS':>8}")
+    fmt = lambda v, ci: f"{-v:7.3f} [{-ci[1]:6.2f},{-ci[0]:6.2f}]"
+    for name, r in res.items():
+        diff = fmt(r["dr_vs_baseline"], r["dr_vs_baseline_ci"]) if "dr_vs_baseline" in r else ""
+        print(f"{name:>15} {fmt(r['ips'], r['ips_ci']):>22} {fmt(r['snips'], r['snips_ci']):>22} "
+              f"{fmt(r['dr'], r['dr_ci']):>22} {diff:>22} {r['support']:8.3f} {r['ess']:8.0f}")
+    if source == "shadow":
+        print("shadow logs always execute taker_now: estimates for other actions rest on the reward model only.")
+    return res
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "exec"
+    n_boot = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    report(source, n_boot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# funding_arb/ml/warm_start.py
+"""
+Bandit checkpoints and warm start. `restore_bandit` is what the executors call
+on startup: the latest checkpoint if it matches (d, actions), otherwise a fresh
+LinTS replayed from stored outcomes in one batched update:
+  exec    exec_outcomes, reward = -realized_cost_bps of the action taken
+  shadow  bandit_shadow, the shadow loop's update (baseline cost credited to action_bandit)
+`restore_bank` does the same for a BanditBank (one posterior per symbol).
+Contexts come from the "exec" feature store where BanditExecutor logged them,
+else are rebuilt from lob_snapshots with FeatureBuilder.compute_batch.
+    python -m funding_arb.ml.warm_start [exec|shadow]
+"""
+import os
+import sys
+import time
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from funding_arb.db import read_engine as default_read_engine
+from funding_arb.exec.baseline import POST_ONLY_REPRICED_MS
+from funding_arb.feature_store import align, load_features
+from funding_arb.ml.bandit import BanditBank, LinTS
+from funding_arb.ml.features import EXEC_FEATURE_COLUMNS, FeatureBuilder, exec_context
+from funding_arb.models import BanditShadow, ExecOutcome
+from funding_arb.query import fetch_range, to_columns
+
+BANDIT_CKPT_DIR   = os.getenv("BANDIT_CKPT_DIR", "./checkpoints")
+BANDIT_CKPT_EVERY = int(os.getenv("BANDIT_CKPT_EVERY", 50))    # updates between checkpoints
+WARM_MAX_AGE_MS   = int(os.getenv("WARM_MAX_AGE_MS", 2000))    # context must be this close before the outcome
+
+SOURCES = {"exec": (ExecOutcome, "action"), "shadow": (BanditShadow, "action_bandit")}
+SHADOW_BASELINE_ACTION = 2  # the shadow loop always executes taker_now
+LOB_LOOKBACK_MS = 60_000    # history before the first outcome for the 1s/5s returns and vol proxy
+
+_LAST_ACTION = EXEC_FEATURE_COLUMNS.index("last_action")
+
+
+def checkpoint_path(name: str) -> str:
+    return os.path.join(BANDIT_CKPT_DIR, f"bandit_{name}.npz")
+
+
+def load_outcomes(source: str, engine=default_read_engine) -> dict:
+    """
+    {ts_ms, symbol, action, realized_cost_bps} columns, ordered by symbol then time.
+    exec: post_only_edge rows from before POST_ONLY_REPRICED_MS are left out (simulated
+    at the opposite touch, so their cost has the wrong sign).
+    """
+    model, action_col = SOURCES[source]
+    t = model.__table__
+    q = (select(t.c.ts_ms, t.c.symbol, t.c[action_col].label("action"), t.c.realized_cost_bps)
+         .order_by(t.c.symbol, t.c.ts_ms))
+    if source == "exec":
+        q = q.where(~((t.c.action == 1) & (t.c.ts_ms < POST_ONLY_REPRICED_MS)))
+    with engine.connect() as conn:
+        rows = conn.execute(q).all()
+    return to_columns(q.selected_columns, rows)
+
+
+def _contexts(symbol: str, ts_ms: np.ndarray, last_action: np.ndarray, engine, max_age_ms: int) -> np.ndarray:
+    """(n, d) bandit contexts for one symbol's outcomes; NaN rows where nothing is recent enough."""
+    X = np.full((len(ts_ms), len(EXEC_FEATURE_COLUMNS)), np.nan)
+    try:
+        fts, F, _ = load_features("exec", symbol, int(ts_ms[0]) - max_age_ms, int(ts_ms[-1]) + 1,
+                                  columns=EXEC_FEATURE_COLUMNS, engine=engine)
+        X = align(ts_ms, fts, F, max_age_ms)
+    except KeyError:
+        pass  # nothing logged to the feature store yet
+
+    miss = np.isnan(X).any(axis=1)
+    if miss.any():
+        t_miss = ts_ms[miss]
+        lob = fetch_range("lob_snapshots", symbol, int(t_miss[0]) - LOB_LOOKBACK_MS, int(t_miss[-1]) + 1,
+                          engine=engine)
+        if lob:
+            F = FeatureBuilder().compute_batch(lob["ts_ms"], lob["bid_px"], lob["ask_px"], lob["bid_sz"], lob["ask_sz"])
+            F = np.column_stack([F[c].astype(np.float64) for c in EXEC_FEATURE_COLUMNS])
+            rebuilt = align(t_miss, lob["ts_ms"][:len(F)], F, max_age_ms)
+            rebuilt[:, _LAST_ACTION] = last_action[miss]
+            X[miss] = rebuilt
+    return exec_context(X)
+
+
+def replay_rows(source: str = "exec", actions: Sequence[int] = (0, 1, 2, 3), engine=default_read_engine,
+                max_age_ms: int = WARM_MAX_AGE_MS):
+    """Stored outcomes as bandit updates: (symbols, actions, X, rewards), rows without a context dropped."""
+    out = load_outcomes(source, engine)
+    syms, Xs, acts, rewards = [], [], [], []
+    for symbol in np.unique(out["symbol"]).tolist():
+        m = out["symbol"] == symbol
+        ts, act = out["ts_ms"][m], out["action"][m]
+        # what the live loop had as last_action when it made each decision
+        if source == "exec":
+            prev = np.concatenate([[0], act[:-1]])
+        else:
+            prev = np.concatenate([[0], np.full(len(act) - 1, SHADOW_BASELINE_ACTION)])
+        X = _contexts(symbol, ts, prev, engine, max_age_ms)
+        ok = ~np.isnan(X).any(axis=1) & np.isin(act, actions)
+        syms.append(out["symbol"][m][ok])
+        Xs.append(X[ok])
+        acts.append(act[ok])
+        rewards.append(-out["realized_cost_bps"][m][ok])
+    if not Xs:
+        return np.array([], dtype=object), np.array([], dtype=np.int64), np.zeros((0, len(EXEC_FEATURE_COLUMNS))), np.array([])
+    return np.concatenate(syms), np.concatenate(acts), np.concatenate(Xs), np.concatenate(rewards)
+
+
+def warm_start(bandit, source: str = "exec", engine=default_read_engine,
+               max_age_ms: int = WARM_MAX_AGE_MS) -> int:
+    """
+    Replay stored outcomes into `bandit` in one batched update; returns rows
+    used. A LinTS gets every symbol's outcomes, a BanditBank each symbol its own.
+    """
+    syms, acts, X, rewards = replay_rows(source, bandit.actions, engine, max_age_ms)
+    if len(X):
+        if isinstance(bandit, BanditBank):
+            bandit.update(syms.tolist(), acts, X, rewards)
+        else:
+            bandit.update_batch(acts, X, rewards)
+    return len(X)
+
+
+def restore_bandit(name: str, source: str, d: int = 8, actions: Sequence[int] = (0, 1, 2, 3),
+                   seed: int | None = None, warm: bool = True, engine=default_read_engine) -> LinTS:
+    """Checkpoint `name` if present and compatible, else a fresh LinTS warm-started from `source`."""
+    path = checkpoint_path(name)
+    if os.path.exists(path):
+        try:
+            bandit = LinTS.load(path, seed=seed)
+            if bandit.d == d and bandit.actions == list(actions):
+                print(f"[bandit] {name}: loaded {path} ({int(bandit.n_updates.sum())} updates)")
+                return bandit
+            print(f"[bandit] {name}: {path} has d={bandit.d} actions={bandit.actions}; ignoring it")
+        except (OSError, ValueError, KeyError, np.linalg.LinAlgError) as e:
+            print(f"[bandit] {name}: unreadable checkpoint {path}: {e}")
+
+    bandit = LinTS(d=d, actions=list(actions), seed=seed)
+    if warm:
+        t0 = time.perf_counter()
+        try:
+            n = warm_start(bandit, source, engine)
+        except SQLAlchemyError as e:
+            print(f"[bandit] {name}: warm start from {source} failed: {e}")
+            return bandit
+        print(f"[bandit] {name}: warm start from {source}: {n} outcomes in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    return bandit
+
+
+def restore_bank(name: str, source: str, d: int = 8, actions: Sequence[int] = (0, 1, 2, 3),
+                 share: float = 0.0, seed: int | None = None, warm: bool = True,
+                 engine=default_read_engine) -> BanditBank:
+    """restore_bandit for a BanditBank; symbols seen in `source` come back with their own posteriors."""
+    path = checkpoint_path(name)
+    if os.path.exists(path):
+        try:
+            bank = BanditBank.load(path, seed=seed)
+            if bank.d == d and bank.actions == list(actions):
+                bank.share = share
+                print(f"[bandit] {name}: loaded {path} ({len(bank.symbols)} symbols, {int(bank.n_updates.sum())} updates)")
+                return bank
+            print(f"[bandit] {name}: {path} has d={bank.d} actions={bank.actions}; ignoring it")
+        except (OSError, ValueError, KeyError, np.linalg.LinAlgError) as e:
+            print(f"[bandit] {name}: unreadable checkpoint {path}: {e}")
+
+    bank = BanditBank(d=d, actions=list(actions), share=share, seed=seed)
+    if warm:
+        t0 = time.perf_counter()
+        try:
+            n = warm_start(bank, source, engine)
+        except SQLAlchemyError as e:
+            print(f"[bandit] {name}: warm start from {source} failed: {e}")
+            return bank
+        print(f"[bandit] {name}: warm start from {source}: {n} outcomes, {len(bank.symbols)} symbols "
+              f"in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    return bank
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "exec"
+    if source not in SOURCES:
+        raise SystemExit(f"source must be one of {sorted(SOURCES)}")
+    bandit = LinTS(d=8, actions=[0, 1, 2, 3])
+    t0 = time.perf_counter()
+    n = warm_start(bandit, source)
+    t1 = time.perf_counter()
+    path = checkpoint_path(source)
+    bandit.save(path)
+    t2 = time.perf_counter()
+    LinTS.load(path)
+    t3 = time.perf_counter()
+    print(f"{source}: replayed {n} outcomes in {(t1 - t0) * 1e3:.1f} ms; per-action updates {bandit.n_updates.tolist()}")
+    print(f"checkpoint {path}: save {(t2 - t1) * 1e3:.2f} ms, load {(t3 - t2) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
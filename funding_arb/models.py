@@ -1,5 +1,7 @@
+from typing import Optional
+
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Integer, Float, String, BigInteger
+from sqlalchemy import Integer, Float, String, BigInteger, LargeBinary, Index
 from sqlalchemy import JSON as SA_JSON
 from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
 from .db import Base
@@ -9,21 +11,23 @@ JSONType = SA_JSON().with_variant(SQLITE_JSON, "sqlite")
 
 class LOBSnapshot(Base):
     __tablename__ = "lob_snapshots"
+    __table_args__ = (Index("ix_lob_snapshots_symbol_ts", "symbol", "ts_ms"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     ts_ms: Mapped[int] = mapped_column(BigInteger, index=True)
-    symbol: Mapped[str] = mapped_column(String(32), index=True)
-    bid_px: Mapped[dict] = mapped_column(JSONType)
-    bid_sz: Mapped[dict] = mapped_column(JSONType)
-    ask_px: Mapped[dict] = mapped_column(JSONType)
-    ask_sz: Mapped[dict] = mapped_column(JSONType)
+    symbol: Mapped[str] = mapped_column(String(32))
+    depth: Mapped[int] = mapped_column(Integer)
+    # each side: little-endian float64 [px_0..px_{depth-1}, sz_0..sz_{depth-1}] (see persist.pack_side)
+    bids: Mapped[bytes] = mapped_column(LargeBinary)
+    asks: Mapped[bytes] = mapped_column(LargeBinary)
     latency_ms: Mapped[int] = mapped_column(Integer)
 
 class ExecOutcome(Base):
     __tablename__ = "exec_outcomes"
+    __table_args__ = (Index("ix_exec_outcomes_symbol_ts", "symbol", "ts_ms"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     ts_ms: Mapped[int] = mapped_column(BigInteger, index=True)
-    symbol: Mapped[str] = mapped_column(String(32), index=True)
+    symbol: Mapped[str] = mapped_column(String(32))
     action: Mapped[int] = mapped_column(Integer)  # 0 maker_inside, 1 post_only_edge, 2 taker_now, 3 wait
     side: Mapped[str] = mapped_column(String(4))  # "buy" or "sell"
     fill_px: Mapped[float] = mapped_column(Float)
@@ -32,42 +36,104 @@ class ExecOutcome(Base):
     fee_bps: Mapped[float] = mapped_column(Float)
     partial_fill: Mapped[int] = mapped_column(Integer)  # 0/1
     time_to_fill_ms: Mapped[int] = mapped_column(Integer)
+    # decision-time logging for offline policy evaluation (NULL on older rows / non-bandit callers)
+    context: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)  # float64 bandit context
+    propensity: Mapped[Optional[float]] = mapped_column(Float, nullable=True)     # P(action | context) of the logger
+    snapshot_age_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # book age when the order went out
 
 class BanditShadow(Base):
     __tablename__ = "bandit_shadow"
+    __table_args__ = (Index("ix_bandit_shadow_symbol_ts", "symbol", "ts_ms"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     ts_ms: Mapped[int] = mapped_column(BigInteger, index=True)
-    symbol: Mapped[str] = mapped_column(String(32), index=True)
+    symbol: Mapped[str] = mapped_column(String(32))
     action_bandit: Mapped[int] = mapped_column(Integer)
     action_baseline: Mapped[int] = mapped_column(Integer)
     realized_cost_bps: Mapped[float] = mapped_column(Float)  # from baseline execution
+    context: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)  # float64 bandit context
+    propensity: Mapped[Optional[float]] = mapped_column(Float, nullable=True)     # LinTS P(action_bandit | context)
+
+class PairedExecution(Base):
+    """One two-leg open/close from exec.paired: per-leg fills and the naked window between them."""
+    __tablename__ = "paired_executions"
+    __table_args__ = (Index("ix_paired_executions_symbol_ts", "symbol", "ts_ms"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ts_ms: Mapped[int] = mapped_column(BigInteger, index=True)
+    symbol: Mapped[str] = mapped_column(String(32))             # perp leg
+    hedge_symbol: Mapped[str] = mapped_column(String(32))
+    side: Mapped[str] = mapped_column(String(4))                # perp leg side
+    qty: Mapped[float] = mapped_column(Float)                   # base units per leg
+    status: Mapped[str] = mapped_column(String(24))             # paired / paired_topup_{leg} / unhedged / failed
+    perp_px: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    hedge_px: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    perp_slip_bps: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    hedge_slip_bps: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    perp_fill_ms: Mapped[int] = mapped_column(Integer)
+    hedge_fill_ms: Mapped[int] = mapped_column(Integer)
+    legging_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # NULL when left unhedged
+    topup_qty: Mapped[float] = mapped_column(Float)
+    residual_qty: Mapped[float] = mapped_column(Float)          # perp minus hedge base after the top-up
 
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import Integer, Float, String, BigInteger
 
 class FundingTick(Base):
     __tablename__ = "funding_ticks"
+    __table_args__ = (Index("ix_funding_ticks_symbol_ts", "symbol", "ts_ms"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     ts_ms: Mapped[int] = mapped_column(BigInteger, index=True)
-    symbol: Mapped[str] = mapped_column(String(32), index=True)
+    symbol: Mapped[str] = mapped_column(String(32))
     rate_8h: Mapped[float] = mapped_column(Float)
     rate_day: Mapped[float] = mapped_column(Float)
     bps_day_net: Mapped[float] = mapped_column(Float)
 
 class SignalTick(Base):
     __tablename__ = "signal_ticks"
+    __table_args__ = (Index("ix_signal_ticks_symbol_ts", "symbol", "ts_ms"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     ts_ms: Mapped[int] = mapped_column(BigInteger, index=True)
-    symbol: Mapped[str] = mapped_column(String(32), index=True)
+    symbol: Mapped[str] = mapped_column(String(32))
     decision: Mapped[str] = mapped_column(String(16))
     bps_day_net: Mapped[float] = mapped_column(Float)
 
 class PositionSnap(Base):
     __tablename__ = "position_snaps"
+    __table_args__ = (Index("ix_position_snaps_symbol_ts", "symbol", "ts_ms"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     ts_ms: Mapped[int] = mapped_column(BigInteger, index=True)
-    symbol: Mapped[str] = mapped_column(String(32), index=True)
+    symbol: Mapped[str] = mapped_column(String(32))
     is_open: Mapped[int] = mapped_column(Integer)          # 0/1
     notional_usdt: Mapped[float] = mapped_column(Float)
     accrued_bps: Mapped[float] = mapped_column(Float)
-    est_pnl_usdt: Mapped[float] = mapped_column(Float)
\ No newline at end of file
+    est_pnl_usdt: Mapped[float] = mapped_column(Float)
+class ArchiveFile(Base):
+    """Catalog of compacted day files written by archive.compact (one per table/symbol/day)."""
+    __tablename__ = "archive_files"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    table_name: Mapped[str] = mapped_column(String(32), index=True)
+    symbol: Mapped[str] = mapped_column(String(32), index=True)
+    day: Mapped[str] = mapped_column(String(10))           # UTC, YYYY-MM-DD
+    ts_min: Mapped[int] = mapped_column(BigInteger, index=True)
+    ts_max: Mapped[int] = mapped_column(BigInteger)
+    rows: Mapped[int] = mapped_column(Integer)
+    path: Mapped[str] = mapped_column(String(255))          # relative to ARCHIVE_DIR
+    created_ms: Mapped[int] = mapped_column(BigInteger)
+
+class FeatureSetDef(Base):
+    """One feature-set version: its name and ordered column list (see feature_store)."""
+    __tablename__ = "feature_sets"
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(64), index=True)
+    columns: Mapped[list] = mapped_column(JSONType)
+    created_ms: Mapped[int] = mapped_column(BigInteger)
+
+class FeatureRow(Base):
+    """Features for one tick: little-endian float64 in FeatureSetDef.columns order, NaN = missing."""
+    __tablename__ = "feature_rows"
+    # unique: a re-run backfill is ignored by the writer instead of doubling rows
+    __table_args__ = (Index("ix_feature_rows_symbol_version_ts", "symbol", "version", "ts_ms", unique=True),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ts_ms: Mapped[int] = mapped_column(BigInteger)
+    symbol: Mapped[str] = mapped_column(String(32))
+    version: Mapped[int] = mapped_column(Integer)
+    vec: Mapped[bytes] = mapped_column(LargeBinary)
@@ -1,15 +1,77 @@
-from sqlalchemy.orm import Session
-from time import time
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from .data.book import BookSnapshot
 from .models import LOBSnapshot
+from .writer import get_writer
+
+_F8 = np.dtype("<f8")
+
+def pack_side(side: np.ndarray, depth: int) -> bytes:
+    """(2, n) px/sz array -> fixed-depth blob (NaN padded / truncated to `depth`)."""
+    n = side.shape[1]
+    if n == depth:
+        return side.astype(_F8, copy=False).tobytes()
+    out = np.full((2, depth), np.nan, dtype=_F8)
+    k = min(n, depth)
+    out[:, :k] = side[:, :k]
+    return out.tobytes()
+
+def unpack_side(blob: bytes) -> np.ndarray:
+    """Blob -> read-only (2, depth) view over the bytes (no copy)."""
+    return np.frombuffer(blob, dtype=_F8).reshape(2, -1)
+
+def lob_row(book: BookSnapshot, depth: Optional[int] = None) -> dict:
+    depth = depth or max(book.bids.shape[1], book.asks.shape[1])
+    return dict(ts_ms=book.ts_ms, symbol=book.symbol, depth=depth,
+                bids=pack_side(book.bids, depth), asks=pack_side(book.asks, depth),
+                latency_ms=book.latency_ms)
+
+def save_lob(book: BookSnapshot, depth: Optional[int] = None) -> bool:
+    """Enqueue onto the background writer; False if dropped under backpressure."""
+    return get_writer().submit(LOBSnapshot.__table__, lob_row(book, depth))
+
+def _stack(blobs, depth: int) -> np.ndarray:
+    """Blobs -> (n, 2, depth) float64; one frombuffer when every row has that depth."""
+    width = 2 * depth * _F8.itemsize
+    if all(len(b) == width for b in blobs):
+        return np.frombuffer(b"".join(blobs), dtype=_F8).reshape(len(blobs), 2, depth)
+    out = np.full((len(blobs), 2, depth), np.nan)
+    for i, b in enumerate(blobs):
+        side = unpack_side(b)
+        k = min(side.shape[1], depth)
+        out[i, :, :k] = side[:, :k]
+    return out
+
+def lob_columns(rows) -> dict:
+    """(ts_ms, latency_ms, depth, bids, asks) rows -> NumPy columns (see load_lob_arrays)."""
+    depth = max((r.depth for r in rows), default=0)
+    bids = _stack([r.bids for r in rows], depth)
+    asks = _stack([r.asks for r in rows], depth)
+    return {
+        "ts_ms": np.fromiter((r.ts_ms for r in rows), dtype=np.int64, count=len(rows)),
+        "latency_ms": np.fromiter((r.latency_ms for r in rows), dtype=np.int64, count=len(rows)),
+        "bid_px": bids[:, 0], "bid_sz": bids[:, 1],
+        "ask_px": asks[:, 0], "ask_sz": asks[:, 1],
+    }
 
-def save_lob(session: Session, symbol: str, bids, asks, latency_ms: int):
-    ts_ms = int(time() * 1000)
-    bid_px = [px for px, _ in bids]
-    bid_sz = [sz for _, sz in bids]
-    ask_px = [px for px, _ in asks]
-    ask_sz = [sz for _, sz in asks]
-    row = LOBSnapshot(ts_ms=ts_ms, symbol=symbol,
-                      bid_px=bid_px, bid_sz=bid_sz,
-                      ask_px=ask_px, ask_sz=ask_sz,
-                      latency_ms=latency_ms)
-    session.add(row)
\ No newline at end of file
+def load_lob_arrays(conn, symbol: Optional[str] = None, t0: Optional[int] = None,
+                    t1: Optional[int] = None, limit: Optional[int] = None) -> dict:
+    """
+    lob_snapshots rows as NumPy columns, ordered by ts_ms:
+      ts_ms, latency_ms: (n,)   bid_px, bid_sz, ask_px, ask_sz: (n, depth), NaN padded
+    `conn` is a SQLAlchemy Connection or Session.
+    """
+    t = LOBSnapshot.__table__
+    q = select(t.c.ts_ms, t.c.latency_ms, t.c.depth, t.c.bids, t.c.asks).order_by(t.c.ts_ms)
+    if symbol is not None:
+        q = q.where(t.c.symbol == symbol)
+    if t0 is not None:
+        q = q.where(t.c.ts_ms >= t0)
+    if t1 is not None:
+        q = q.where(t.c.ts_ms < t1)
+    if limit is not None:
+        q = q.limit(limit)
+    return lob_columns(conn.execute(q).all())
@@ -0,0 +1,125 @@
+# funding_arb/query.py
+"""
+Time-range reads over the tick tables, served by the (symbol, ts_ms) indexes.
+    for chunk in query_range("funding_ticks", "BTC/USDT", t0, t1):
+        chunk["ts_ms"], chunk["bps_day_net"], ...
+"""
+from typing import Iterator, Optional, Sequence, Union
+
+import numpy as np
+from sqlalchemy import BigInteger, Float, Integer, LargeBinary, Table, select
+
+from .db import Base, read_engine as default_read_engine
+from .models import LOBSnapshot
+from .persist import lob_columns
+
+QUERY_CHUNK_ROWS = 100_000
+
+
+def _table(table: Union[str, Table, type]) -> Table:
+    if isinstance(table, str):
+        return Base.metadata.tables[table]
+    return getattr(table, "__table__", table)
+
+
+def _dtype(col):
+    if isinstance(col.type, (Integer, BigInteger)):
+        return np.float64 if col.nullable and not col.primary_key else np.int64   # NULL -> NaN
+    if isinstance(col.type, Float):
+        return np.float64
+    if isinstance(col.type, LargeBinary):
+        return object
+    return str
+
+
+def _column(values: list, dtype) -> np.ndarray:
+    if dtype is object:
+        out = np.empty(len(values), dtype=object)   # bytes / None as-is, never split or stringified
+        out[:] = values
+        return out
+    return np.array(values, dtype=dtype)
+
+
+def to_columns(cols, rows) -> dict:
+    """
+    Result rows -> {name: 1-D array}; ints -> int64 (nullable ints -> float64,
+    NULL = NaN), floats -> float64, blobs -> object (bytes or None), strings -> unicode.
+    """
+    return {c.name: _column([r[i] for r in rows], _dtype(c)) for i, c in enumerate(cols)}
+
+
+def range_select(table: Union[str, Table, type], symbol: str, t0: Optional[int] = None,
+                 t1: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+                 limit: Optional[int] = None):
+    """
+    SELECT for one symbol with t0 <= ts_ms < t1, ordered by ts_ms. `columns`
+    defaults to everything but id/symbol (lob_snapshots: the blob columns).
+    """
+    t = _table(table)
+    if t is LOBSnapshot.__table__:
+        cols = [t.c.ts_ms, t.c.latency_ms, t.c.depth, t.c.bids, t.c.asks]
+    elif columns is not None:
+        cols = [t.c[name] for name in columns]
+    else:
+        cols = [c for c in t.c if c.name not in ("id", "symbol")]
+    q = select(*cols).where(t.c.symbol == symbol).order_by(t.c.ts_ms)
+    if t0 is not None:
+        q = q.where(t.c.ts_ms >= t0)
+    if t1 is not None:
+        q = q.where(t.c.ts_ms < t1)
+    if limit is not None:
+        q = q.limit(limit)
+    return q
+
+
+def query_range(table: Union[str, Table, type], symbol: str, t0: Optional[int] = None,
+                t1: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+                chunk_rows: int = QUERY_CHUNK_ROWS, limit: Optional[int] = None,
+                as_frame: bool = False, engine=default_read_engine) -> Iterator:
+    """
+    Yield chunks of at most `chunk_rows` rows as {column: ndarray}, or pandas
+    DataFrames with `as_frame=True`. lob_snapshots chunks use the
+    persist.load_lob_arrays layout (2-D px/sz columns; not available as frames).
+    """
+    q = range_select(table, symbol, t0, t1, columns, limit)
+    lob = _table(table) is LOBSnapshot.__table__
+    if lob and as_frame:
+        raise ValueError("lob_snapshots chunks are 2-D; use as_frame=False")
+    cols = list(q.selected_columns)
+    with engine.connect() as conn:
+        res = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(q)
+        for rows in res.partitions(chunk_rows):
+            chunk = lob_columns(rows) if lob else to_columns(cols, rows)
+            if as_frame:
+                import pandas as pd
+                chunk = pd.DataFrame(chunk)
+            yield chunk
+
+
+def concat_columns(parts) -> dict:
+    """Concatenate column dicts (2-D lob columns NaN-padded to the widest depth), sorted by ts_ms."""
+    parts = [p for p in parts if len(p["ts_ms"])]
+    if not parts:
+        return {}
+    if len(parts) == 1:
+        return parts[0]
+    out = {}
+    for k in parts[0]:
+        arrs = [p[k] for p in parts]
+        if arrs[0].ndim == 2:
+            w = max(a.shape[1] for a in arrs)
+            arrs = [a if a.shape[1] == w else
+                    np.pad(a, ((0, 0), (0, w - a.shape[1])), constant_values=np.nan) for a in arrs]
+        out[k] = np.concatenate(arrs)
+    order = np.argsort(out["ts_ms"], kind="stable")
+    return {k: v[order] for k, v in out.items()}
+
+
+def fetch_range(table: Union[str, Table, type], symbol: str, t0: Optional[int] = None,
+                t1: Optional[int] = None, **kw):
+    """query_range gathered into one column dict (or DataFrame); {} if no rows."""
+    chunks = list(query_range(table, symbol, t0, t1, **kw))
+    if kw.get("as_frame"):
+        import pandas as pd
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    return concat_columns(chunks)
@@ -0,0 +1,178 @@
+# funding_arb/writer.py
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import Table, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .db import engine as default_engine
+
+# knobs (env-overridable)
+WRITER_BATCH_ROWS  = int(os.getenv("WRITER_BATCH_ROWS", 500))        # flush when this many rows are pending
+WRITER_FLUSH_S     = float(os.getenv("WRITER_FLUSH_S", 1.0))        # ...or when the oldest pending row is this old
+WRITER_MAX_QUEUE   = int(os.getenv("WRITER_MAX_QUEUE", 20000))      # bounded queue
+WRITER_PUT_TIMEOUT = float(os.getenv("WRITER_PUT_TIMEOUT_S", 0.05)) # max time a producer blocks when full
+
+_FLUSH = object()
+_STOP = object()
+
+
+def _insert(table: Table, dialect: str):
+    """INSERT, skipping rows that collide on a unique index (e.g. a re-run feature backfill)."""
+    if not any(ix.unique for ix in table.indexes):
+        return insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+class BatchWriter:
+    """
+    Write-behind persistence. Producers `submit(table, row)` from the trading
+    thread; a background thread groups rows per table and inserts them with one
+    Core executemany per table in a single transaction.
+    - size/time trigger: WRITER_BATCH_ROWS or WRITER_FLUSH_S
+    - backpressure: the queue is bounded; a full queue blocks the producer for
+      at most WRITER_PUT_TIMEOUT, then the row is dropped and counted
+    - a failed batch is retried per table, then per row, so only the rows the
+      database rejects are dropped (counted in `errors` and logged)
+    """
+    def __init__(self, engine=default_engine, batch_rows: int = WRITER_BATCH_ROWS,
+                 flush_s: float = WRITER_FLUSH_S, max_queue: int = WRITER_MAX_QUEUE,
+                 put_timeout_s: float = WRITER_PUT_TIMEOUT):
+        self.engine = engine
+        self.batch_rows = batch_rows
+        self.flush_s = flush_s
+        self.put_timeout_s = put_timeout_s
+        self.q: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.flushes = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- producer side ----------
+    def submit(self, table: Table, row: dict) -> bool:
+        if self._closed:
+            return False
+        try:
+            self.q.put((table, row), timeout=self.put_timeout_s)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def queue_depth(self) -> int:
+        return self.q.qsize()
+
+    def stats(self) -> dict:
+        return {"queue": self.q.qsize(), "written": self.written, "dropped": self.dropped,
+                "errors": self.errors, "flushes": self.flushes}
+
+    def flush(self, timeout: Optional[float] = None):
+        """Block until everything submitted so far is on disk (no-op once closed: close() drained it)."""
+        if self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self.q.put((_FLUSH, done))
+        end = None if timeout is None else time.time() + timeout
+        # a close() racing this call can stop the thread before it reaches the marker
+        while not done.wait(0.1):
+            if not self._thread.is_alive() or (end is not None and time.time() >= end):
+                return
+
+    def close(self, timeout: Optional[float] = 10.0):
+        if self._closed:
+            return
+        self._closed = True
+        self.q.put((_STOP, None))
+        self._thread.join(timeout)
+
+    # ---------- writer thread ----------
+    def _write(self, pending: Dict[Table, List[dict]]):
+        if not pending:
+            return
+        try:
+            with self.engine.begin() as conn:
+                for table, rows in pending.items():
+                    conn.execute(_insert(table, conn.dialect.name), rows)
+            self.written += sum(len(rows) for rows in pending.values())
+        except Exception:
+            # one bad table / row must not take the rest of the batch with it
+            for table, rows in pending.items():
+                self._write_table(table, rows)
+        self.flushes += 1
+        pending.clear()
+
+    def _write_table(self, table: Table, rows: List[dict]):
+        """Retry path: the table on its own, then row by row; whatever still fails is counted and logged."""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(_insert(table, conn.dialect.name), rows)
+            self.written += len(rows)
+            return
+        except Exception:
+            pass
+        bad, err = 0, None
+        for row in rows:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(_insert(table, conn.dialect.name), row)
+                self.written += 1
+            except Exception as e:
+                bad, err = bad + 1, e
+        if bad:
+            self.errors += bad
+            print(f"[writer] dropped {bad}/{len(rows)} {table.name} rows: {err}")
+
+    def _run(self):
+        pending: Dict[Table, List[dict]] = defaultdict(list)
+        n_pending = 0
+        oldest = 0.0
+        while True:
+            wait = self.flush_s - (time.time() - oldest) if n_pending else None
+            try:
+                table, row = self.q.get(timeout=max(wait, 0.0) if wait is not None else None)
+            except queue.Empty:
+                table, row = None, None
+
+            if table is _STOP:
+                self._write(pending)
+                return
+            if table is _FLUSH:
+                self._write(pending)
+                n_pending = 0
+                row.set()
+                continue
+            if table is not None:
+                if not n_pending:
+                    oldest = time.time()
+                pending[table].append(row)
+                n_pending += 1
+
+            if n_pending and (n_pending >= self.batch_rows or time.time() - oldest >= self.flush_s):
+                self._write(pending)
+                n_pending = 0
+
+
+_writer: Optional[BatchWriter] = None
+_lock = threading.Lock()
+
+
+def get_writer() -> BatchWriter:
+    """Process-wide writer, started on first use and flushed at interpreter exit."""
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = BatchWriter()
+            atexit.register(_writer.close)
+    return _writer